@@ -0,0 +1,122 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from storage import StorageBackend
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+ASYNC_WORKERS = 8  # Requests in flight across all sites; each site still sends one at a time
+
+
+class AsyncSite:
+    # Per-spreadsheet state on the engine's loop. The lock is the site's
+    # write queue: asyncio.Lock wakes waiters in FIFO order, so calls for one
+    # sheet run in the order they were made while other sheets go ahead.
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.calls = 0
+
+
+class AsyncSheets:
+    # Serves many spreadsheets from one process. A single event loop thread
+    # schedules calls onto one shared GoogleDriveHandler, so every site
+    # shares its credentials, connection pool and quota governor, while the
+    # handler's per-spreadsheet caches (log mirrors, worksheet handles) keep
+    # sites apart. Calls for different sites overlap; total throughput grows
+    # with the number of sites until the pool or the quota runs out.
+    def __init__(self, handler, workers=ASYNC_WORKERS):
+        self.handler = handler
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sheets")
+        self.loop = asyncio.new_event_loop()
+        self.sites = {}
+        self.thread = threading.Thread(target=self.loop.run_forever, name="sheets-loop", daemon=True)
+        self.thread.start()
+        metrics.gauge("async_sites", lambda: len(self.sites), "Spreadsheets served by the async engine")
+
+    def site(self, spreadsheet_id):
+        # Only called on the loop thread
+        site = self.sites.get(spreadsheet_id)
+        if site is None:
+            site = self.sites[spreadsheet_id] = AsyncSite()
+        return site
+
+    async def call(self, spreadsheet_id, method, *args, **kwargs):
+        site = self.site(spreadsheet_id)
+        queued_at = time.perf_counter()
+        async with site.lock:
+            metrics.observe("async_site_wait_seconds", time.perf_counter() - queued_at)
+            site.calls += 1
+            func = functools.partial(getattr(self.handler, method), spreadsheet_id, *args, **kwargs)
+            return await self.loop.run_in_executor(self.executor, func)
+
+    async def gather(self, method, spreadsheet_ids, *args, **kwargs):
+        # The same call on many sites at once: {spreadsheet_id: result or exception}
+        results = await asyncio.gather(
+            *(self.call(spreadsheet_id, method, *args, **kwargs) for spreadsheet_id in spreadsheet_ids),
+            return_exceptions=True
+        )
+        return dict(zip(spreadsheet_ids, results))
+
+    def run(self, coroutine):
+        # Blocking bridge for threads outside the loop
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def backend(self):
+        return AsyncSheetsBackend(self)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.executor.shutdown()
+        self.loop.close()
+
+
+def _forward(method):
+    def call(self, spreadsheet_id, *args, **kwargs):
+        return self.engine.run(self.engine.call(spreadsheet_id, method, *args, **kwargs))
+    call.__name__ = method
+    return call
+
+
+class AsyncSheetsBackend(StorageBackend):
+    # Blocking StorageBackend over the engine, so SignInPage, the journal
+    # replayer and the command-line tools run unchanged. Any number of pages
+    # or threads can share one, each passing its own spreadsheet id.
+    def __init__(self, engine):
+        self.engine = engine
+
+    @property
+    def clock(self):
+        return self.engine.handler.clock
+
+    @clock.setter
+    def clock(self, clock):
+        self.engine.handler.clock = clock
+
+    def authenticate(self):
+        self.engine.handler.authenticate()  # Once for every site; later calls return at once
+
+    def schedule_index(self, spreadsheet_id):
+        return self.engine.handler.schedule_index(spreadsheet_id)  # A cached lookup; skips the site queue
+
+    def run_all(self, method, spreadsheet_ids, *args, **kwargs):
+        return self.engine.run(self.engine.gather(method, spreadsheet_ids, *args, **kwargs))
+
+    get_names_from_schedule = _forward("get_names_from_schedule")
+    roster_version = _forward("roster_version")
+    find_or_create_operator_log_row = _forward("find_or_create_operator_log_row")
+    update_operator_fields = _forward("update_operator_fields")
+    finalize_shift = _forward("finalize_shift")
+    active_shifts = _forward("active_shifts")
+    open_shifts = _forward("open_shifts")
+    apply_punches = _forward("apply_punches")
+    read_shifts = _forward("read_shifts")
+    archive_closed_shifts = _forward("archive_closed_shifts")
+    close_stale_shifts = _forward("close_stale_shifts")
+    write_table = _forward("write_table")
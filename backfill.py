@@ -0,0 +1,212 @@
+import argparse
+import bisect
+import csv
+import json
+import logging
+import sys
+from datetime import datetime, timedelta
+
+from shift_store import OFF, TRANSITIONS, shift_from_log
+from storage import (open_backend, parse_log_time, same_log_time, BACKENDS, CLOCK_FORMAT, LOG_COLUMNS,
+                     PUNCH_FIELDS, REVIEW_MARK, TIME_FORMAT)
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+BATCH_SIZE = 500  # Punches per apply_punches call; each is one append plus one batch_update on Sheets
+MAX_SHIFT = timedelta(hours=24)  # Later punches can't be told apart from the next day's, times are stored without dates
+
+
+def is_closed(row):
+    # A row flagged for review is still waiting for its real clock-out
+    return bool(row.get("time_out")) and row["time_out"] != REVIEW_MARK
+
+
+def logged_state(row):
+    # Where a shift in the log stands; a closed one takes no more punches
+    return OFF if is_closed(row) else shift_from_log(row)["state"]
+
+
+def parse_time(value):
+    # "MM/DD/YYYY HH:MM:SS" like the log, or ISO "YYYY-MM-DD HH:MM[:SS]"
+    value = (value or "").strip()
+    parsed = parse_log_time(value) if "/" in value else None
+    if parsed is None:
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return parsed.replace(microsecond=0, tzinfo=None)
+
+
+def read_punches(path):
+    # Yields (line number, {"operator", "action", "time"}) from a CSV with a
+    # header row or from JSONL, by file extension; "-" reads CSV from stdin
+    if path.endswith((".jsonl", ".json")):
+        with open(path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield number, {"error": f"unreadable JSON: {e}"}
+        return
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8", newline="")
+    try:
+        for number, record in enumerate(csv.DictReader(f), start=2):
+            yield number, record
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class Backfill:
+    # Checks a batch of paper punches against the roster and the log, then
+    # applies the new ones in time order. Each punch ends up in `entries` as
+    # (status, when, punch, note) with status "add", "skip" (already logged)
+    # or "error".
+    def __init__(self, backend, spreadsheet_id):
+        self.backend = backend
+        self.spreadsheet_id = spreadsheet_id
+        self.entries = []
+
+    def load(self, records):
+        roster = set(self.backend.get_names_from_schedule(self.spreadsheet_id))
+        by_operator = {}
+        for source, record in records:
+            if "error" in record:
+                self.entries.append(("error", None, None, f"{source}: {record['error']}"))
+                continue
+            operator = (record.get("operator") or "").strip()
+            action = (record.get("action") or "").strip()
+            when = parse_time(record.get("time"))
+            problem = None
+            if action not in PUNCH_FIELDS:
+                problem = f"unknown action {action!r}"
+            elif operator not in roster:
+                problem = f"{operator!r} is not on the schedule"
+            elif when is None:
+                problem = f"time {record.get('time')!r} needs a date, e.g. 01/31/2026 07:00:00"
+            if problem:
+                self.entries.append(("error", when, None, f"{source}: {problem}"))
+                continue
+            by_operator.setdefault(operator, []).append((when, source, action))
+        if by_operator:
+            self.check_sequences(by_operator)
+        self.entries.sort(key=lambda entry: (entry[0] != "error", entry[1] or datetime.min))
+
+    def check_sequences(self, by_operator):
+        # Walk each operator's punches through the shift state machine, one
+        # shift at a time. A clock-in starts a shift; punches before any
+        # clock-in belong to the logged shift that contains them. Each punch
+        # names its shift, so it lands on that shift's row even while the
+        # operator is clocked in today. Shifts already in the log are
+        # compared field by field.
+        days = [when.date() for punches in by_operator.values() for when, _, _ in punches]
+        logged = {
+            (row[0], parse_log_time(row[2])): dict(zip(LOG_COLUMNS, row))
+            for row in self.backend.read_shifts(self.spreadsheet_id, min(days) - MAX_SHIFT, max(days))
+            if row[0] and "/" in row[2]
+        }
+        for operator, punches in by_operator.items():
+            starts = sorted(started for name, started in logged if name == operator)
+            state = OFF
+            started = None
+            current = None  # The shift's row, if it is already in the log
+            for when, source, action in sorted(punches, key=lambda punch: punch[0]):
+                stored = when.strftime(TIME_FORMAT if action == "clock_in" else CLOCK_FORMAT)
+                punch = {"action": action, "operator": operator, "time": stored}
+                field = PUNCH_FIELDS[action]
+                if action == "clock_in":
+                    if state != OFF:
+                        self.entries.append(("error", when, punch, f"{source}: cannot clock_in while {state}, "
+                                                                   f"shift open since {started}"))
+                        continue
+                    started, current = when, logged.get((operator, when))
+                    punch["shift"] = stored
+                    if current is not None:
+                        self.entries.append(("skip", when, punch, f"{source}: already logged"))
+                        state = logged_state(current)
+                        continue
+                    self.entries.append(("add", when, punch, source))
+                    state = TRANSITIONS[(OFF, action)]
+                    continue
+                if started is None or not started <= when <= started + MAX_SHIFT:
+                    position = bisect.bisect_right(starts, when)
+                    if not position or when > starts[position - 1] + MAX_SHIFT:
+                        self.entries.append(("error", when, punch, f"{source}: no clock-in for this shift "
+                                                                   f"in the file or the log"))
+                        continue
+                    started = starts[position - 1]
+                    current = logged[(operator, started)]
+                    state = logged_state(current)
+                punch["shift"] = started.strftime(TIME_FORMAT)
+                if current is not None and same_log_time(current.get(field) or "", stored):
+                    self.entries.append(("skip", when, punch, f"{source}: already logged"))
+                    continue
+                if current is not None and is_closed(current):
+                    logged_value = current.get(field) or "nothing"
+                    self.entries.append(("error", when, punch, f"{source}: the logged shift has {logged_value} "
+                                                               f"for {field}; correct it in the sheet"))
+                    continue
+                next_state = TRANSITIONS.get((state, action))
+                if next_state is None:
+                    self.entries.append(("error", when, punch, f"{source}: cannot {action} while {state}, "
+                                                               f"shift open since {started}"))
+                    continue
+                self.entries.append(("add", when, punch, source))
+                state = next_state
+
+    def count(self, status):
+        return sum(1 for entry in self.entries if entry[0] == status)
+
+    def diff(self, out):
+        marks = {"add": "+", "skip": "=", "error": "!"}
+        for status, when, punch, note in self.entries:
+            if punch is None:
+                out.write(f"{marks[status]} {note}\n")
+            else:
+                out.write(f"{marks[status]} {when:%m/%d/%Y %H:%M:%S} {punch['action']:<11} {punch['operator']}  ({note})\n")
+
+    def apply(self, batch_size=BATCH_SIZE):
+        punches = [punch for status, _, punch, _ in self.entries if status == "add"]
+        written = 0
+        for start in range(0, len(punches), batch_size):
+            written += self.backend.apply_punches(self.spreadsheet_id, punches[start:start + batch_size])
+            log.info("Applied %d of %d punches", min(start + batch_size, len(punches)), len(punches))
+        return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill punches from paper sign-in sheets without the kiosk UI")
+    parser.add_argument("files", nargs="+", help="CSV (operator,action,time) or .jsonl files; '-' reads CSV from stdin")
+    parser.add_argument("--spreadsheet", default="1Nw9K1pKDbNihWuVhc-nhx7SjWnqKfNpXXSjt7OVOZtE")
+    parser.add_argument("--backend", choices=[kind for kind in BACKENDS if kind != "hub"], default="sheets")
+    parser.add_argument("--credentials", default="gsheet-credentials.json", help="service account file")
+    parser.add_argument("--dry-run", action="store_true", help="show what would be written and write nothing")
+    parser.add_argument("--skip-invalid", action="store_true", help="apply the valid punches even if some are not")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    backend = open_backend(args.backend, args.credentials)
+    backend.authenticate()
+    backfill = Backfill(backend, args.spreadsheet)
+    backfill.load((f"{path}:{number}", record) for path in args.files for number, record in read_punches(path))
+
+    errors = backfill.count("error")
+    if args.dry_run or errors:
+        backfill.diff(sys.stdout)
+    print(f"{backfill.count('add')} to add, {backfill.count('skip')} already logged, {errors} invalid")
+    if args.dry_run:
+        return 0
+    if errors and not args.skip_invalid:
+        print("Nothing written; fix the invalid punches or pass --skip-invalid")
+        return 1
+    written = backfill.apply()
+    print(f"Wrote {written} punches")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import json
+import logging
+import os
+import time
+
+from PyQt5.QtCore import QObject, QEvent, Qt, pyqtSignal
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+BADGE_KEY_GAP_MS = 50  # Scanners type far faster than people; slower keys start over
+BADGE_MIN_LENGTH = 4
+
+
+def load_badges(path):
+    # {badge code: operator name}
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {str(code).strip(): name for code, name in json.load(f).items()}
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable badge file %s: %s", path, e)
+        return {}
+
+
+class BadgeReader(QObject):
+    # Application-wide key filter for keyboard-wedge badge and barcode
+    # scanners. A burst of keys, each within BADGE_KEY_GAP_MS of the last and
+    # ended by Enter, is a scan; anything typed at human speed passes through.
+    scanned = pyqtSignal(str)
+
+    def __init__(self, parent=None, max_gap_ms=BADGE_KEY_GAP_MS, min_length=BADGE_MIN_LENGTH):
+        super().__init__(parent)
+        self.max_gap = max_gap_ms / 1000
+        self.min_length = min_length
+        self.buffer = ""
+        self.last_key_at = 0.0
+        self.last_event = None
+
+    def eventFilter(self, obj, event):
+        if event.type() != QEvent.KeyPress:
+            return False
+        # An unhandled key is offered to each parent widget in turn; count it once
+        key = (event.timestamp(), event.key(), event.text())
+        if key == self.last_event:
+            return False
+        self.last_event = key
+
+        now = time.monotonic()
+        if now - self.last_key_at > self.max_gap:
+            self.buffer = ""
+        self.last_key_at = now
+
+        if event.key() in (Qt.Key_Return, Qt.Key_Enter):
+            code, self.buffer = self.buffer, ""
+            if len(code) >= self.min_length:
+                self.scanned.emit(code)
+                return True
+            return False
+        if event.text().isprintable():
+            self.buffer += event.text()
+        return False
@@ -0,0 +1,189 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication, QMessageBox
+
+import signin
+from fake_sheets import FakeClient, RequestRecorder
+from googleAccess import GoogleDriveHandler
+from quota import QuotaGovernor
+from storage import TIME_FORMAT
+
+# Drives SignInPage headlessly against the recording fake and reports, per
+# kiosk action, the Sheets round trips, bytes moved and wall time. Exits
+# non-zero when an action goes over its round-trip budget.
+#
+#   python benchmark.py --rows 100 1000 100000 --latency-ms 80
+
+SPREADSHEET_ID = "benchmark"
+START = datetime(2026, 10, 14, 6, 58, 0)  # Mid-week, as the first shift starts arriving
+ROSTER = [f"Operator {i:03d}" for i in range(40)]
+OPERATOR = ROSTER[0]  # First in, so the 7AM separator goes in with the clock-in
+SECOND_OPERATOR = ROSTER[1]  # Clocks in after it and works the shift
+PIN = "1234"
+
+# Round trips each action may cost. Lower these as things get cheaper; a
+# change that needs more should have a good reason to raise them.
+REQUEST_BUDGET = {
+    "startup": 5,
+    "sign_in": 0,
+    "clock_in_separator": 4,  # Tail read, insert_row, merge_cells, append
+    "clock_in": 1,
+    "lunch_start": 1,
+    "lunch_end": 1,
+    "clock_out": 1,
+    "view_active": 0,
+}
+
+
+class BenchClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def history_rows(count, before):
+    # Closed shifts on the days leading up to `before`, with a shift
+    # separator every 20 rows like a real log
+    rows = []
+    day = before - timedelta(days=1)
+    while len(rows) < count:
+        if len(rows) % 20 == 0:
+            rows.append(["=== Shift starting at 7AM ==="])
+            day -= timedelta(days=1)
+            continue
+        name = ROSTER[len(rows) % len(ROSTER)]
+        time_in = day.replace(hour=7, minute=len(rows) % 10)
+        rows.append([name, "7:30:00", time_in.strftime(TIME_FORMAT), "15:00:00",
+                     "11:00:00", "11:30:00", "", str(len(rows) % 10)])
+    return rows
+
+
+def wait_idle(app, page):
+    # Until the worker queue is empty and every result signal is delivered
+    while True:
+        page.worker.jobs.join()
+        app.processEvents()
+        if page.worker.jobs.unfinished_tasks == 0:
+            return
+
+
+def sign_in(page, name=OPERATOR):
+    page.name_combo.setEditText(name)
+    page.pin_input.setText(PIN)
+    page.handle_signin()
+
+
+def run(app, rows, latency):
+    recorder = RequestRecorder(latency)
+    client = FakeClient(recorder=recorder)
+    client.add_kiosk_spreadsheet(SPREADSHEET_ID, ROSTER, history_rows(rows, START))
+    # Quota throttling would swamp the latencies being measured
+    governor = QuotaGovernor(requests_per_minute=60000, burst=1000)
+    handler = GoogleDriveHandler(None, governor=governor, client=client)
+    clock = BenchClock(START)
+    results = []
+
+    def measure(name, action, minutes=0):
+        # Nothing refreshes the mirror in between, so each action pays for
+        # whatever its own path reads
+        clock.now += timedelta(minutes=minutes)
+        mark = recorder.mark()
+        started = time.perf_counter()
+        action()
+        ui_done = time.perf_counter()
+        wait_idle(app, page)
+        finished = time.perf_counter()
+        count, size, methods = recorder.since(mark)
+        results.append({
+            "action": name,
+            "requests": count,
+            "bytes": size,
+            "ui_ms": (ui_done - started) * 1000,
+            "total_ms": (finished - started) * 1000,
+            "methods": methods,
+        })
+
+    page = None
+
+    def startup():
+        nonlocal page
+        page = signin.SignInPage("unused", SPREADSHEET_ID, drive_handler=handler, clock=clock)
+        page.pins[OPERATOR] = page.pins[SECOND_OPERATOR] = PIN
+
+    measure("startup", startup)
+    measure("sign_in", lambda: sign_in(page), minutes=1)
+    measure("clock_in_separator", lambda: page.update_shift_state("clock_in"))
+    clock.now += timedelta(minutes=6)
+    sign_in(page, SECOND_OPERATOR)
+    wait_idle(app, page)
+    measure("clock_in", lambda: page.update_shift_state("clock_in"))
+    measure("lunch_start", page.handle_lunch_button, minutes=240)
+    measure("lunch_end", page.handle_lunch_button, minutes=30)
+    measure("clock_out", lambda: page.update_shift_state("clock_out"), minutes=210)
+    measure("view_active", page.view_active_shifts)
+
+    page.worker.stop()
+    page.journal.close()
+    page.shifts.close()
+    page.deleteLater()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Round trips and latency per kiosk action")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000, 100000],
+                        help="log sizes to benchmark")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated latency per request")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    # Dialogs would block the headless run
+    QMessageBox.information = QMessageBox.warning = lambda *a, **k: QMessageBox.Ok
+
+    report = {}
+    # Anything printed along the way would break the JSON on stdout
+    quiet = contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext()
+    with quiet, tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)  # pins, the shift store and the journal stay out of the checkout
+        try:
+            for rows in args.rows:
+                report[rows] = run(app, rows, args.latency_ms / 1000)
+        finally:
+            os.chdir(cwd)
+
+    over_budget = []
+    for rows, results in report.items():
+        for result in results:
+            if result["requests"] > REQUEST_BUDGET[result["action"]]:
+                over_budget.append((rows, result["action"], result["requests"]))
+
+    if args.json:
+        print(json.dumps({"results": report, "over_budget": over_budget}, indent=2))
+    else:
+        for rows, results in report.items():
+            print(f"\n{rows} log rows, {args.latency_ms:g} ms per request")
+            print(f"{'action':<18} {'requests':>8} {'budget':>6} {'bytes':>10} {'ui ms':>8} {'total ms':>9}")
+            for result in results:
+                print(f"{result['action']:<18} {result['requests']:>8} {REQUEST_BUDGET[result['action']]:>6} "
+                      f"{result['bytes']:>10} {result['ui_ms']:>8.1f} {result['total_ms']:>9.1f}")
+        for rows, action, count in over_budget:
+            print(f"[FAIL] {action} made {count} requests at {rows} rows, budget is {REQUEST_BUDGET[action]}")
+
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+import logging
+from datetime import datetime
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QTimer
+from PyQt5.QtWidgets import QDialog, QHBoxLayout, QHeaderView, QLabel, QPushButton, QTableView, QVBoxLayout
+
+from kiosk_style import font
+from shift_store import AT_LUNCH
+from storage import parse_log_time
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+DASHBOARD_TICK_MS = 1000  # Elapsed times refresh this often while the dashboard is open
+DASHBOARD_ROW_HEIGHT = 48
+
+COLUMNS = ["Operator", "Status", "Time In", "On Shift", "Lunch", "Late"]
+OPERATOR, STATUS, TIME_IN, ON_SHIFT, LUNCH, LATE = range(len(COLUMNS))
+SORT_ROLE = Qt.UserRole
+
+
+def duration(seconds):
+    minutes = max(0, int(seconds)) // 60
+    return f"{minutes // 60}:{minutes % 60:02d}"
+
+
+def started_at(time_in, now):
+    # Time in as a datetime; time-only legacy values are taken as today
+    parsed = parse_log_time(time_in)
+    if parsed is not None and "/" not in time_in:
+        parsed = datetime.combine(now.date(), parsed.time())
+    return parsed
+
+
+class ActiveShiftsModel(QAbstractTableModel):
+    # Everyone on shift, fed by the ShiftStore: punches on this kiosk and
+    # reconciles from background syncs arrive as single-row changes, so no
+    # Sheets call is ever made to show it. Parsed times are cached per row;
+    # the clock tick only invalidates the two time-dependent columns.
+    def __init__(self, shifts, clock=datetime.now, late_for=None, parent=None):
+        super().__init__(parent)
+        self.clock = clock
+        self.late_for = late_for
+        self.rows = []     # [operator, shift, started, lunch_started, lunch_ended, late]
+        self.index_of = {}
+        now = self.clock()
+        for operator, shift in sorted(shifts.current().items()):
+            self.index_of[operator] = len(self.rows)
+            self.rows.append(self.make_row(operator, shift, now))
+        shifts.subscribe(self.shift_changed)
+
+    def make_row(self, operator, shift, now):
+        started = started_at(shift["time_in"], now) if shift["time_in"] else None
+        lunch_started = started_at(shift["lunch_start"], now) if shift["lunch_start"] else None
+        lunch_ended = started_at(shift["lunch_end"], now) if shift["lunch_end"] else None
+        late = None
+        if self.late_for is not None and shift["time_in"]:
+            try:
+                late = self.late_for(operator, shift["time_in"])
+            except ValueError:
+                log.debug("No lateness for %s, unreadable time in %r", operator, shift["time_in"])
+        return [operator, shift, started, lunch_started, lunch_ended, late]
+
+    def shift_changed(self, operator, shift):
+        row = self.index_of.get(operator)
+        if shift is None:
+            if row is not None:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.rows[row]
+                self.index_of = {values[0]: idx for idx, values in enumerate(self.rows)}
+                self.endRemoveRows()
+        elif row is None:
+            row = len(self.rows)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.rows.append(self.make_row(operator, shift, self.clock()))
+            self.index_of[operator] = row
+            self.endInsertRows()
+        else:
+            self.rows[row] = self.make_row(operator, shift, self.clock())
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(COLUMNS) - 1))
+
+    def tick(self):
+        if self.rows:
+            self.dataChanged.emit(self.index(0, ON_SHIFT), self.index(len(self.rows) - 1, LUNCH),
+                                  [Qt.DisplayRole, SORT_ROLE])
+
+    # --- QAbstractTableModel ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, SORT_ROLE):
+            return None
+        operator, shift, started, lunch_started, lunch_ended, late = self.rows[index.row()]
+        column = index.column()
+        at_lunch = shift["state"] == AT_LUNCH
+        if column == OPERATOR:
+            return operator
+        if column == STATUS:
+            return "At lunch" if at_lunch else "Working"
+        if column == TIME_IN:
+            if role == SORT_ROLE:
+                return started.timestamp() if started else 0.0
+            return started.strftime("%H:%M") if started else ""
+        if column == ON_SHIFT:
+            seconds = 0.0
+            if started is not None:
+                seconds = (self.clock() - started).total_seconds()
+                if lunch_started and lunch_ended:
+                    seconds -= (lunch_ended - lunch_started).total_seconds()
+            return seconds if role == SORT_ROLE else duration(seconds)
+        if column == LUNCH:
+            if at_lunch and lunch_started:
+                seconds = (self.clock() - lunch_started).total_seconds()
+                return seconds if role == SORT_ROLE else f"Out {duration(seconds)}"
+            if lunch_started and lunch_ended:
+                return 0.0 if role == SORT_ROLE else f"{lunch_started:%H:%M}-{lunch_ended:%H:%M}"
+            return -1.0 if role == SORT_ROLE else ""
+        if column == LATE:
+            if role == SORT_ROLE:
+                return late or 0
+            return f"{late} min" if late else ""
+        return None
+
+
+class ActiveShiftsDashboard(QDialog):
+    # Full-screen "Currently Clocked In" view. QTableView only paints the rows
+    # on screen, and the tick timer runs only while the dashboard is shown.
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Currently Clocked In")
+        self.model = model
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(model)
+        self.proxy.setSortRole(SORT_ROLE)
+        self.proxy.setDynamicSortFilter(True)
+
+        self.title = QLabel()
+        self.title.setFont(font(36, bold=True))
+        self.title.setAlignment(Qt.AlignCenter)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setFont(font(20))
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(TIME_IN, Qt.AscendingOrder)
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
+        self.table.setSelectionMode(QTableView.NoSelection)
+        self.table.setFocusPolicy(Qt.NoFocus)
+        self.table.verticalHeader().hide()
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(DASHBOARD_ROW_HEIGHT)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.horizontalHeader().setFont(font(20, bold=True))
+
+        close_button = QPushButton("Close")
+        close_button.setFont(font(24))
+        close_button.setProperty("role", "action")
+        close_button.setFixedHeight(70)
+        close_button.setMinimumWidth(250)
+        close_button.clicked.connect(self.accept)
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(close_button)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.title)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        for signal in (model.rowsInserted, model.rowsRemoved, model.modelReset):
+            signal.connect(self.update_title)
+        self.update_title()
+
+        self.tick_timer = QTimer(self)
+        self.tick_timer.timeout.connect(model.tick)
+
+    def update_title(self, *args):
+        self.title.setText(f"Currently Clocked In ({self.model.rowCount()})")
+
+    def showEvent(self, event):
+        self.model.tick()
+        self.tick_timer.start(DASHBOARD_TICK_MS)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.tick_timer.stop()
+        super().hideEvent(event)
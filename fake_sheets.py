@@ -0,0 +1,304 @@
+import itertools
+import json
+import threading
+import time
+
+import gspread
+from gspread.utils import a1_to_rowcol, rowcol_to_a1
+
+# In-memory stand-ins for gspread's Client, Spreadsheet and Worksheet. They
+# cover the calls GoogleDriveHandler makes and hand back the same shapes the
+# real API does, so the handler runs unchanged with no network or account.
+
+LOG_HEADER = ["Operator", "Total Time", "Time In", "Time Out", "Lunch Start", "Lunch End", "Total Lunch", "Late",
+              "Early Out", "Overtime"]
+WEEKDAY_HEADER = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+_sheet_ids = itertools.count(1)
+
+
+def _split_range(range_name):
+    # "log!A5:H" / "A5:H10" / "A1" -> (first row, first col, last row or None, last col or None)
+    range_name = range_name.split("!")[-1]
+    start, _, end = range_name.partition(":")
+    first_row, first_col = a1_to_rowcol(start)
+    if not end:
+        return first_row, first_col, first_row, first_col
+    if end[-1].isdigit():
+        last_row, last_col = a1_to_rowcol(end)
+        return first_row, first_col, last_row, last_col
+    last_col = a1_to_rowcol(end + "1")[1]
+    return first_row, first_col, None, last_col
+
+
+class FakeErrorResponse:
+    # Just enough of a requests.Response for gspread's APIError
+    def __init__(self, code, message):
+        self.status_code = code
+        self.text = json.dumps({"error": {"code": code, "message": message, "status": "INVALID_ARGUMENT"}})
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeCell:
+    def __init__(self, row, col, value):
+        self.row = row
+        self.col = col
+        self.value = value
+
+
+class FakeWorksheet:
+    # The grid is sized like the real one: a sheet grown by appends ends on
+    # its last row, and ranges that start past the grid are rejected with
+    # the same 400 the API sends.
+    def __init__(self, title, rows=None, spreadsheet=None, row_count=None, col_count=26):
+        self.id = next(_sheet_ids)
+        self.title = title
+        self.rows = [[str(cell) for cell in row] for row in rows or []]
+        self.row_count = max(row_count or 0, len(self.rows), 1)
+        self.col_count = col_count
+        self.merges = []
+        self.spreadsheet = spreadsheet
+
+    def _touch(self):
+        if self.spreadsheet is not None:
+            self.spreadsheet.revision += 1
+
+    def _check_grid(self, range_name, row):
+        if row > self.row_count:
+            raise gspread.exceptions.APIError(FakeErrorResponse(
+                400, f"Range ('{self.title}'!{range_name.split('!')[-1]}) exceeds grid limits. "
+                     f"Max rows: {self.row_count}, max columns: {self.col_count}"))
+
+    # --- Reads ---
+
+    def get_all_values(self):
+        width = max((len(row) for row in self.rows), default=0)
+        return [row + [""] * (width - len(row)) for row in self.rows]
+
+    def get(self, range_name):
+        first_row, first_col, last_row, last_col = _split_range(range_name)
+        self._check_grid(range_name, first_row)
+        last_row = len(self.rows) if last_row is None else min(last_row, len(self.rows))
+        values = []
+        for row in self.rows[first_row - 1:last_row]:
+            cells = row[first_col - 1:last_col]
+            while cells and cells[-1] == "":
+                cells.pop()
+            values.append(cells)
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def batch_get(self, ranges, **kwargs):
+        # One round trip for several ranges; any range past the grid fails it all
+        return [self.get(range_name) for range_name in ranges]
+
+    def col_values(self, col):
+        values = [row[col - 1] if len(row) >= col else "" for row in self.rows]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def cell(self, row, col):
+        values = self.rows[row - 1] if row <= len(self.rows) else []
+        return FakeCell(row, col, values[col - 1] if col <= len(values) else "")
+
+    # --- Writes ---
+
+    def _set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        cells.extend([""] * (col - len(cells)))
+        cells[col - 1] = "" if value is None else str(value)
+        self._touch()
+
+    def _last_row(self):
+        last = len(self.rows)
+        while last and not any(self.rows[last - 1]):
+            last -= 1
+        return last
+
+    def update_cell(self, row, col, value):
+        self._check_grid(rowcol_to_a1(row, col), row)
+        self._set(row, col, value)
+        return {"updatedRange": f"{self.title}!{rowcol_to_a1(row, col)}"}
+
+    def update(self, values, range_name="A1", **kwargs):
+        first_row, first_col = a1_to_rowcol(range_name.split("!")[-1].split(":")[0])
+        self._check_grid(range_name, first_row + max(len(values), 1) - 1)
+        for row_offset, row in enumerate(values):
+            for col_offset, value in enumerate(row):
+                self._set(first_row + row_offset, first_col + col_offset, value)
+        return {"updatedRows": len(values)}
+
+    def batch_update(self, data, **kwargs):
+        for entry in data:
+            self.update(entry["values"], entry["range"])
+        return {"totalUpdatedCells": sum(len(row) for entry in data for row in entry["values"])}
+
+    def append_rows(self, values, **kwargs):
+        # Like values.append: rows land after the last non-empty row
+        start = self._last_row() + 1
+        del self.rows[start - 1:]
+        self.rows.extend([str(cell) for cell in row] for row in values)
+        self._touch()
+        end = start + len(values) - 1
+        self.row_count = max(self.row_count, end)  # values.append adds rows to the grid as needed
+        width = max((len(row) for row in values), default=1)
+        last_col = rowcol_to_a1(1, width).rstrip("1")
+        return {"updates": {"updatedRange": f"{self.title}!A{start}:{last_col}{end}", "updatedRows": len(values)}}
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def insert_row(self, values, index=1, **kwargs):
+        self._check_grid(f"A{index}", index - 1)
+        self.rows.insert(index - 1, [str(cell) for cell in values])
+        self.row_count += 1
+        self._touch()
+
+    def merge_cells(self, name, merge_type="MERGE_ALL"):
+        self.merges.append(name)
+
+    def delete_rows(self, start_index, end_index=None):
+        self._delete(start_index - 1, end_index or start_index)
+
+    def _delete(self, start, end):
+        # Rows [start, end), 0-based like deleteDimension
+        del self.rows[start:end]
+        self.row_count = max(1, self.row_count - (min(end, self.row_count) - start))
+        self._touch()
+
+    def resize(self, rows=None, cols=None):
+        if rows is not None:
+            self.row_count = int(rows)
+            del self.rows[self.row_count:]
+        if cols is not None:
+            self.col_count = int(cols)
+        self._touch()
+
+    def clear(self):
+        self.rows = []
+        self._touch()
+
+
+class FakeSpreadsheet:
+    def __init__(self, spreadsheet_id, worksheets=None):
+        self.id = spreadsheet_id
+        self.title = spreadsheet_id
+        self.sheets = {}
+        for title, rows in (worksheets or {}).items():
+            self.sheets[title] = FakeWorksheet(title, rows, self)
+        self.revision = 0  # Bumped on every write, like Drive's modifiedTime
+
+    def worksheet(self, title):
+        if title not in self.sheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.sheets[title]
+
+    def worksheets(self):
+        return list(self.sheets.values())
+
+    def add_worksheet(self, title, rows=100, cols=26, index=None):
+        sheet = FakeWorksheet(title, spreadsheet=self, row_count=int(rows), col_count=int(cols))
+        self.sheets[title] = sheet
+        self.revision += 1
+        return sheet
+
+    def get_lastUpdateTime(self):
+        return f"revision-{self.revision}"
+
+    def batch_update(self, body):
+        for request in body.get("requests", []):
+            delete = request.get("deleteDimension")
+            if delete and delete["range"]["dimension"] == "ROWS":
+                sheet = next(sheet for sheet in self.sheets.values() if sheet.id == delete["range"]["sheetId"])
+                sheet._delete(delete["range"]["startIndex"], delete["range"]["endIndex"])
+        return {"replies": []}
+
+
+class RequestRecorder:
+    # Counts every call made on the fakes as one API round trip, with a rough
+    # payload size (arguments plus response, JSON encoded), and sleeps for the
+    # simulated network latency before answering.
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = []
+
+    def record(self, name, args, kwargs, result):
+        size = len(json.dumps([args, kwargs], default=str))
+        if not isinstance(result, (FakeSpreadsheet, FakeWorksheet)):
+            size += len(json.dumps(result, default=str))
+        with self.lock:
+            self.requests.append((name, size))
+
+    def mark(self):
+        with self.lock:
+            return len(self.requests)
+
+    def since(self, mark):
+        # (request count, bytes, {method: count}) for everything after mark
+        with self.lock:
+            requests = self.requests[mark:]
+        methods = {}
+        for name, _ in requests:
+            methods[name] = methods.get(name, 0) + 1
+        return len(requests), sum(size for _, size in requests), methods
+
+
+class Recorded:
+    def __init__(self, target, recorder):
+        self._target = target
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def call(*args, **kwargs):
+            if self._recorder.latency:
+                time.sleep(self._recorder.latency)
+            result = attr(*args, **kwargs)
+            self._recorder.record(f"{self._target.__class__.__name__}.{name}", args, kwargs, result)
+            if isinstance(result, (FakeSpreadsheet, FakeWorksheet)):
+                return Recorded(result, self._recorder)
+            if isinstance(result, list) and result and isinstance(result[0], FakeWorksheet):
+                return [Recorded(sheet, self._recorder) for sheet in result]
+            return result
+        return call
+
+
+class FakeClient:
+    def __init__(self, spreadsheets=None, recorder=None):
+        self.spreadsheets = dict(spreadsheets or {})
+        self.recorder = recorder
+
+    def add_kiosk_spreadsheet(self, spreadsheet_id, names, log_rows=None, schedule=None):
+        # Same layout as the real sheet: names in column B from row 11 up to
+        # the "YOUR NAME HERE" placeholder, one column per weekday after it
+        # with the day names in row 10, and a "log" tab with its header row.
+        # schedule is {name: {"Mon": "7:00-15:00", ...}}.
+        schedule = schedule or {}
+        availability = [[] for _ in range(9)] + [["", "Name"] + WEEKDAY_HEADER]
+        availability += [["", name] + [schedule.get(name, {}).get(day, "") for day in WEEKDAY_HEADER] for name in names]
+        availability.append(["", "YOUR NAME HERE"])
+        log = [list(LOG_HEADER)] + [list(row) for row in log_rows or []]
+        spreadsheet = FakeSpreadsheet(spreadsheet_id, {"Operator Availability vNew": availability, "log": log})
+        self.spreadsheets[spreadsheet_id] = spreadsheet
+        return spreadsheet
+
+    def open_by_key(self, key):
+        if key not in self.spreadsheets:
+            raise gspread.exceptions.SpreadsheetNotFound(key)
+        spreadsheet = self.spreadsheets[key]
+        if self.recorder is None:
+            return spreadsheet
+        if self.recorder.latency:
+            time.sleep(self.recorder.latency)
+        self.recorder.record("FakeClient.open_by_key", (key,), {}, spreadsheet)
+        return Recorded(spreadsheet, self.recorder)
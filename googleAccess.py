@@ -1,139 +1,768 @@
+import bisect
+import calendar
+import logging
+import threading
+from collections import OrderedDict
 import gspread
+from gspread.utils import a1_to_rowcol, rowcol_to_a1, ValueInputOption
+from google.auth.transport.requests import AuthorizedSession, Request
 from google.oauth2.service_account import Credentials
-from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from datetime import date, datetime, timedelta
 
-class GoogleDriveHandler:
-    def __init__(self, service_account_path):
+import metrics
+from quota import QuotaGovernor, BACKGROUND
+from schedule import AVAILABILITY_SHEET, ScheduleIndex, roster_from_grid
+from storage import StorageBackend, LOG_COLUMNS, SHIFT_ENDS, SWEEP_GRACE, log_date, parse_log_time, same_log_time
+
+LOG_RESYNC_SECONDS = 300  # Re-read today's rows for edits made in place at most this often
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)  # Refresh the access token this long before it expires
+HTTP_POOL_SIZE = 4
+ARCHIVE_PREFIX = "log-"
+PARTITION_CACHE = 3  # Archive partitions kept in memory for reports; the least recently read goes first
+LOG_LAST_COLUMN = rowcol_to_a1(1, len(LOG_COLUMNS))[:-1]  # "J"
+
+log = logging.getLogger(__name__)
+
+
+class LogMirror:
+    # Local copy of the "log" worksheet plus an operator -> open row index.
+    # Row numbers are 1-based, matching the sheet. Its age runs on the
+    # handler's clock, so simulations on a warped clock refresh on schedule.
+    # A stale mirror holds writes that may not have made it into the sheet.
+    def __init__(self, rows, clock=datetime.now):
+        self.rows = []
+        self.open_rows = {}
+        self.latest_rows = {}
+        self.last_separator_row = None
+        self.day_start = (None, None)
+        self.clock = clock
+        self.synced_at = clock()
+        self.stale = False
+        for row in rows:
+            self.append(row)
+
+    def age(self):
+        seconds = (self.clock() - self.synced_at).total_seconds()
+        return seconds if seconds >= 0 else float("inf")  # A clock set back counts as stale
+
+    def find_open_row(self, operator_name):
+        rows = self.open_rows.get(operator_name)
+        return rows[0] if rows else None
+
+    def find_latest_row(self, operator_name):
+        return self.latest_rows.get(operator_name)
+
+    def append(self, row):
+        row = [str(cell) for cell in row] + [""] * (len(LOG_COLUMNS) - len(row))
+        self.rows.append(row)
+        idx = len(self.rows)
+        if any("Shift starting" in cell for cell in row):
+            self.last_separator_row = idx
+            return idx
+        if row[0]:
+            self.latest_rows[row[0]] = idx
+        if self._is_open(row):
+            self.open_rows.setdefault(row[0], []).append(idx)
+        return idx
+
+    def get(self, idx, col):
+        return self.rows[idx - 1][col - 1]
+
+    def row_values(self, idx):
+        return dict(zip(LOG_COLUMNS, self.rows[idx - 1]))
+
+    def shift_rows(self):
+        # (operator, time in) -> row, for the rows whose time in carries a date
+        rows = {}
+        for idx, row in enumerate(self.rows[1:], start=2):
+            if row[0] and "/" in row[2]:
+                rows[(row[0], parse_log_time(row[2]))] = idx
+        return rows
+
+    def day_start_row(self, day):
+        # Watermark for time-only legacy rows, which carry no date: those
+        # after the last row dated before `day` count as today, as they
+        # always have. Walks back from the end only until such a row, and is
+        # cached until the day changes or the mirror is rebuilt. Dated rows
+        # are judged by their own date, so old shifts appended out of order
+        # (a backfill) can't hide today's.
+        cached_day, cached_row = self.day_start
+        if cached_day == day:
+            return cached_row
+        idx = len(self.rows)
+        while idx > 1:
+            row_date = log_date(self.rows[idx - 1][2])
+            if row_date is not None and row_date < day:
+                break
+            idx -= 1
+        self.day_start = (day, idx + 1 if idx > 1 else 2)
+        return self.day_start[1]
+
+    def replace_row(self, idx, values):
+        values = [str(cell) for cell in values] + [""] * (len(LOG_COLUMNS) - len(values))
+        for col, value in enumerate(values[:len(LOG_COLUMNS)], start=1):
+            if self.get(idx, col) != value:
+                self.set(idx, col, value)
+
+    def replace_tail(self, start, rows):
+        # Swap the rows from `start` on for a fresh read of them. Only the
+        # operators and separator that pointed past `start` and do not show
+        # up again walk back for their previous row.
+        length = start - 1
+        del self.rows[length:]
+        for operator in list(self.open_rows):
+            self.open_rows[operator] = [idx for idx in self.open_rows[operator] if idx <= length]
+            if not self.open_rows[operator]:
+                del self.open_rows[operator]
+        moved = {operator for operator, idx in self.latest_rows.items() if idx > length}
+        for operator in moved:
+            del self.latest_rows[operator]
+        separator_moved = self.last_separator_row is not None and self.last_separator_row > length
+        if separator_moved:
+            self.last_separator_row = None
+        for row in rows:
+            self.append(row)
+        moved -= set(self.latest_rows)
+        separator_moved = separator_moved and self.last_separator_row is None
+        idx = length
+        while (moved or separator_moved) and idx > 1:
+            row = self.rows[idx - 1]
+            if "Shift starting" in row[0]:
+                if separator_moved:
+                    self.last_separator_row = idx
+                    separator_moved = False
+            elif row[0] in moved:
+                self.latest_rows[row[0]] = idx
+                moved.discard(row[0])
+            idx -= 1
+
+    def set(self, idx, col, value):
+        row = self.rows[idx - 1]
+        was_open = self._is_open(row)
+        old_operator = row[0]
+        row[col - 1] = "" if value is None else str(value)
+        if was_open:
+            self.open_rows[old_operator].remove(idx)
+            if not self.open_rows[old_operator]:
+                del self.open_rows[old_operator]
+        if self._is_open(row):
+            bisect.insort(self.open_rows.setdefault(row[0], []), idx)
+        if row[0] and self.latest_rows.get(row[0], 0) < idx:
+            self.latest_rows[row[0]] = idx
+
+    @staticmethod
+    def _is_open(row):
+        return bool(row[0]) and row[3] == "" and "Shift starting" not in row[0]
+
+
+def appended_row_number(response):
+    # append_row returns the values.append response; its updatedRange tells
+    # us where the row actually landed (e.g. "log!A12:H12").
+    try:
+        updated_range = response["updates"]["updatedRange"]
+    except (TypeError, KeyError):
+        return None
+    return a1_to_rowcol(updated_range.split("!")[-1].split(":")[0])[0]
+
+
+def grid_exceeded(error):
+    # A range past the last row of the sheet's grid: "... exceeds grid limits"
+    return getattr(error, "code", None) == 400 and "exceeds grid limits" in str(error)
+
+
+def archive_title(day, period):
+    # "log-2026-10" for monthly partitions, "log-2026-W42" for ISO weeks
+    if period == "week":
+        year, week, _ = day.isocalendar()
+        return f"{ARCHIVE_PREFIX}{year}-W{week:02d}"
+    return f"{ARCHIVE_PREFIX}{day.year}-{day.month:02d}"
+
+
+def partition_span(title):
+    # First and last day covered by an archive worksheet, or None if the
+    # title is not an archive partition
+    if not title.startswith(ARCHIVE_PREFIX):
+        return None
+    name = title[len(ARCHIVE_PREFIX):]
+    try:
+        if "-W" in name:
+            year, week = name.split("-W")
+            start = date.fromisocalendar(int(year), int(week), 1)
+            return start, start + timedelta(days=6)
+        year, month = (int(part) for part in name.split("-"))
+        return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+    except ValueError:
+        return None
+
+
+class LogBatch:
+    # Collects every field change of one logical action against the mirror and
+    # sends them in at most two requests: one append for new rows and one
+    # batch_update for cells of rows that already exist in the sheet.
+    def __init__(self, handler, spreadsheet_id):
+        self.handler = handler
+        self.spreadsheet_id = spreadsheet_id
+        self.mirror = handler.get_log_mirror(spreadsheet_id)
+        self.first_new_row = len(self.mirror.rows) + 1
+        self.changes = {}
+
+    def row_for(self, operator_name):
+        row = self.mirror.find_open_row(operator_name)
+        if row is None:
+            row = self.mirror.append([operator_name])
+        return row
+
+    def get(self, row, field):
+        return self.mirror.get(row, LOG_COLUMNS.index(field) + 1)
+
+    def set(self, row, field, value):
+        col = LOG_COLUMNS.index(field) + 1
+        self.mirror.set(row, col, value)
+        if row < self.first_new_row:
+            self.changes[(row, col)] = value
+
+    def flush(self):
+        sheet = self.handler.get_log_sheet(self.spreadsheet_id)
+        new_rows = self.mirror.rows[self.first_new_row - 1:]
+        try:
+            if new_rows:
+                response = sheet.append_rows(new_rows, value_input_option=ValueInputOption.user_entered)
+                appended_at = appended_row_number(response)
+                if appended_at is not None and appended_at != self.first_new_row:
+                    # Another writer appended since our last read, so our rows
+                    # landed further down; read them back where they are
+                    self.mirror.replace_tail(self.first_new_row, [])
+                    self.mirror.stale = True
+            if self.changes:
+                sheet.batch_update(
+                    [{"range": rowcol_to_a1(row, col), "values": [[value]]}
+                     for (row, col), value in self.changes.items()],
+                    value_input_option=ValueInputOption.user_entered,
+                )
+        except Exception as e:
+            # The mirror already holds the new values; mark it so the next
+            # call re-reads what actually made it into the sheet.
+            if self.first_new_row <= len(self.mirror.rows):
+                self.mirror.replace_tail(self.first_new_row, [])
+            self.mirror.stale = True
+            self.handler.handle_sheet_error(self.spreadsheet_id, e)
+            raise
+        self.changes = {}
+        self.first_new_row = len(self.mirror.rows) + 1
+
+
+@metrics.instrument("storage_call_seconds", backend="sheets")
+class GoogleDriveHandler(StorageBackend):
+    def __init__(self, service_account_path, governor=None, client=None, pool_size=HTTP_POOL_SIZE):
         self.service_account_path = service_account_path
-        self.client = None
+        self.pool_size = pool_size
+        self.governor = governor or QuotaGovernor()
+        self.client = client
+        self.credentials = None
+        self.session = None
+        self.spreadsheets = {}
+        self.worksheets = {}
+        self.log_mirrors = {}
+        self.partition_rows = OrderedDict()
+        # Guards the handle and partition caches, which async_sheets shares
+        # across sites' threads; never held over a request
+        self.cache_lock = threading.Lock()
+        self.schedules = {}
 
     def authenticate(self):
+        if self.client is not None:
+            return  # Already handed a client, e.g. the offline fake
         self.scopes = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        credentials = Credentials.from_service_account_file(self.service_account_path, scopes=self.scopes)       
-        self.client = gspread.authorize(credentials)
+        self.credentials = Credentials.from_service_account_file(self.service_account_path, scopes=self.scopes)
+        # One keep-alive session for every request, token included
+        self.session = AuthorizedSession(self.credentials)
+        self.session.mount("https://", HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size))
+        self.refresh_token_if_needed()
+        self.client = gspread.authorize(self.credentials, session=self.session)
+
+    def refresh_token_if_needed(self):
+        # Refresh ahead of expiry so a punch never pays for a 401 and retry
+        if self.credentials is None:
+            return
+        expiry = self.credentials.expiry
+        if not self.credentials.token or expiry is None or expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN:
+            self.credentials.refresh(Request(self.session))
+
+    def get_spreadsheet(self, spreadsheet_id):
+        self.refresh_token_if_needed()
+        spreadsheet = self.spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            spreadsheet = self.governor.wrap(self.governor.call(self.client.open_by_key, spreadsheet_id))
+            with self.cache_lock:
+                self.spreadsheets[spreadsheet_id] = spreadsheet
+        return spreadsheet
+
+    def get_worksheet(self, spreadsheet_id, title):
+        sheet = self.worksheets.get((spreadsheet_id, title))
+        if sheet is None:
+            sheet = self.governor.wrap(self.get_spreadsheet(spreadsheet_id).worksheet(title))
+            with self.cache_lock:
+                self.worksheets[(spreadsheet_id, title)] = sheet
+        else:
+            self.refresh_token_if_needed()
+        return sheet
+
+    def invalidate_handles(self, spreadsheet_id):
+        with self.cache_lock:
+            self.spreadsheets.pop(spreadsheet_id, None)
+            for key in [key for key in self.worksheets if key[0] == spreadsheet_id]:
+                del self.worksheets[key]
+            for key in [key for key in self.partition_rows if key[0] == spreadsheet_id]:
+                del self.partition_rows[key]
+
+    def handle_sheet_error(self, spreadsheet_id, error):
+        # A renamed or deleted sheet shows up as not-found or a 400 on its range;
+        # reopen the handles on the next call. Network errors keep them.
+        stale = isinstance(error, (gspread.exceptions.WorksheetNotFound, gspread.exceptions.SpreadsheetNotFound))
+        if isinstance(error, gspread.exceptions.APIError) and getattr(error, "code", None) in (400, 404):
+            stale = True
+        if stale:
+            log.warning("Dropping cached sheet handles for %s: %s", spreadsheet_id, error)
+            self.invalidate_handles(spreadsheet_id)
 
     def get_names_from_schedule(self, spreadsheet_id):
-        spreadsheet = self.client.open_by_key(spreadsheet_id)
-        sheet = spreadsheet.worksheet("Operator Availability vNew")
-        names = []
-        values = sheet.col_values(2)[10:]  # Start from row 11 (zero-indexed)
-        for value in values:
-            if value.strip().upper() == "YOUR NAME HERE":
-                break
-            if value.strip():
-                names.append(value.strip())
-        return names
+        with self.governor.priority(BACKGROUND):
+            return self._get_names_from_schedule(spreadsheet_id)
+
+    def _get_names_from_schedule(self, spreadsheet_id):
+        # One read of the whole availability grid gives both the roster and
+        # the schedule index, so the index is rebuilt exactly when the
+        # roster is re-read, i.e. when the sheet has changed
+        try:
+            values = self.get_worksheet(spreadsheet_id, AVAILABILITY_SHEET).get_all_values()
+        except Exception as e:
+            self.handle_sheet_error(spreadsheet_id, e)
+            raise
+        self.schedules[spreadsheet_id] = ScheduleIndex.from_grid(values)
+        return roster_from_grid(values)
+
+    def schedule_index(self, spreadsheet_id):
+        return self.schedules.get(spreadsheet_id)
+
+    def roster_version(self, spreadsheet_id):
+        # Drive's modifiedTime; one small request instead of column B. Any
+        # edit bumps it, log writes included, so a change still needs the
+        # name digest to confirm.
+        with self.governor.priority(BACKGROUND):
+            try:
+                return self.get_spreadsheet(spreadsheet_id).get_lastUpdateTime()
+            except Exception as e:
+                self.handle_sheet_error(spreadsheet_id, e)
+                raise
 
     def get_log_sheet(self, spreadsheet_id):
-        spreadsheet = self.client.open_by_key(spreadsheet_id)
-        return spreadsheet.worksheet("log")
+        return self.get_worksheet(spreadsheet_id, "log")
 
-    def find_or_create_operator_log_row(self, spreadsheet_id, operator_name):
-        sheet = self.get_log_sheet(spreadsheet_id)
-        data = sheet.get_all_values()
+    def get_log_mirror(self, spreadsheet_id):
+        # Writes never wait on a download of the whole log once there is a
+        # mirror; one left stale by a failed write re-reads today's rows first
+        mirror = self.log_mirrors.get(spreadsheet_id)
+        if mirror is None:
+            mirror = self.resync_log(spreadsheet_id)
+        elif mirror.stale:
+            mirror = self.refresh_log(spreadsheet_id)
+        return mirror
 
-        # Search for operator with missing clock out
-        for idx, row in enumerate(data, start=1):
-            if row and row[0] == operator_name and row[3] == "":
-                return idx
+    def read_log_tail(self, spreadsheet_id):
+        # Fetch only the rows appended since the mirror last saw the sheet.
+        # The range starts on the last row the mirror already holds: a log
+        # grown by appends ends its grid on that row, and a range starting
+        # past the grid is a 400. The cached row_count can't be used to clamp
+        # it, since appends from any kiosk grow the grid without updating it.
+        mirror = self.get_log_mirror(spreadsheet_id)
+        start = max(len(mirror.rows), 1)
+        try:
+            values = self.get_log_sheet(spreadsheet_id).get(f"A{start}:{LOG_LAST_COLUMN}")
+        except gspread.exceptions.APIError as e:
+            if not grid_exceeded(e):
+                self.handle_sheet_error(spreadsheet_id, e)
+                raise
+            # The log is shorter than the mirror; rows were deleted elsewhere
+            return self.resync_log(spreadsheet_id)
+        except Exception as e:
+            self.handle_sheet_error(spreadsheet_id, e)
+            raise
+        if mirror.rows:
+            overlap = values[0] if values else []
+            if (overlap[0] if overlap else "") != mirror.rows[-1][0]:
+                # The rows the mirror knows moved, e.g. an archive run on another kiosk
+                return self.resync_log(spreadsheet_id)
+            values = values[1:]
+        for row in values:
+            mirror.append(row)
+        return mirror
 
-        # Operator not found, append a new row
-        sheet.append_row([operator_name] + [""] * 7)
-        return len(data) + 1
+    def refresh_log(self, spreadsheet_id, today=None):
+        # Re-read the rows other kiosks may have edited in place: today's,
+        # from the day watermark on, plus older rows still open, in one
+        # batch_get. The window starts on the row before the watermark; if
+        # that row no longer matches, rows moved and the log is read again.
+        mirror = self.log_mirrors.get(spreadsheet_id)
+        if mirror is None or not mirror.rows:
+            return self.resync_log(spreadsheet_id)
+        today = today or self.clock().date()
+        start = mirror.day_start_row(today)
+        older = sorted(idx for rows in mirror.open_rows.values() for idx in rows if idx < start - 1)
+        ranges = [f"A{start - 1}:{LOG_LAST_COLUMN}"] + [f"A{idx}:{LOG_LAST_COLUMN}{idx}" for idx in older]
+        try:
+            window, *rows = self.get_log_sheet(spreadsheet_id).batch_get(ranges)
+        except gspread.exceptions.APIError as e:
+            if not grid_exceeded(e):
+                self.handle_sheet_error(spreadsheet_id, e)
+                raise
+            return self.resync_log(spreadsheet_id)
+        except Exception as e:
+            self.handle_sheet_error(spreadsheet_id, e)
+            raise
+        overlap = list(window[0]) + [""] * len(LOG_COLUMNS) if window else [""] * len(LOG_COLUMNS)
+        known = mirror.rows[start - 2]
+        if overlap[0] != known[0] or not same_log_time(overlap[2], known[2]):
+            return self.resync_log(spreadsheet_id)
+        if start > 2:
+            mirror.replace_row(start - 1, overlap[:len(LOG_COLUMNS)])
+        for idx, values in zip(older, rows):
+            if not values or values[0][:1] != [mirror.get(idx, 1)]:
+                return self.resync_log(spreadsheet_id)
+            mirror.replace_row(idx, values[0])
+        mirror.replace_tail(start, list(window)[1:])
+        mirror.synced_at = self.clock()
+        mirror.stale = False
+        return mirror
 
-    def update_operator_log(self, spreadsheet_id, operator_name, field, value):
-        sheet = self.get_log_sheet(spreadsheet_id)
-        col_map = {
-            "operator": 1,
-            "total_time": 2,
-            "time_in": 3,
-            "time_out": 4,
-            "lunch_start": 5,
-            "lunch_end": 6,
-            "total_lunch": 7,
-            "late": 8
+    def active_shifts(self, spreadsheet_id, today=None):
+        with self.governor.priority(BACKGROUND):
+            return self._active_shifts(spreadsheet_id, today)
+
+    def _active_shifts(self, spreadsheet_id, today=None):
+        # Open rows from today's watermark on; cost follows the day's activity
+        today = today or self.clock().date()
+        mirror = self.log_mirrors.get(spreadsheet_id)
+        if mirror is None:
+            mirror = self.resync_log(spreadsheet_id)
+        elif mirror.stale or mirror.age() > LOG_RESYNC_SECONDS:
+            mirror = self.refresh_log(spreadsheet_id, today)
+        else:
+            mirror = self.read_log_tail(spreadsheet_id)
+        start = mirror.day_start_row(today)
+
+        active_shifts = {}
+        for operator, rows in mirror.open_rows.items():
+            for idx in rows:
+                row = mirror.rows[idx - 1]
+                time_in = row[2]
+                if not time_in:
+                    continue
+                if "/" in time_in:
+                    if log_date(time_in) != today:
+                        continue
+                elif idx < start:
+                    continue
+                active_shifts[operator] = {
+                    'row': idx,
+                    'time_in': time_in,
+                    'lunch_start': row[4] or None,
+                    'lunch_end': row[5] or None
+                }
+        return active_shifts
+
+    def open_shifts(self, spreadsheet_id):
+        with self.governor.priority(BACKGROUND):
+            mirror = self.resync_log(spreadsheet_id)
+        return {
+            operator: {'row': rows[0], **{field: mirror.get(rows[0], LOG_COLUMNS.index(field) + 1) or None
+                                          for field in ("time_in", "lunch_start", "lunch_end")}}
+            for operator, rows in mirror.open_rows.items()
         }
-        row = self.find_or_create_operator_log_row(spreadsheet_id, operator_name)
-        col = col_map[field]
-        print(f"[DEBUG] Updating {operator_name} at row {row}, col {col} with value '{value}'")
 
-        sheet.update_cell(row, col, value)
+    def resync_log(self, spreadsheet_id):
+        try:
+            mirror = LogMirror(self.get_log_sheet(spreadsheet_id).get_all_values(), self.clock)
+        except Exception as e:
+            self.handle_sheet_error(spreadsheet_id, e)
+            raise
+        self.log_mirrors[spreadsheet_id] = mirror
+        return mirror
+
+    def find_or_create_operator_log_row(self, spreadsheet_id, operator_name):
+        # Search for operator with missing clock out, append a new row if not found
+        batch = LogBatch(self, spreadsheet_id)
+        row = batch.row_for(operator_name)
+        batch.flush()
+        return row
+
+    def update_operator_log(self, spreadsheet_id, operator_name, field, value):
+        self.update_operator_fields(spreadsheet_id, operator_name, {field: value})
+
+    def update_operator_fields(self, spreadsheet_id, operator_name, fields):
+        batch = LogBatch(self, spreadsheet_id)
+        row = batch.row_for(operator_name)
+        log.debug("Updating %s at row %s with %s", operator_name, row, fields)
+        for field, value in fields.items():
+            batch.set(row, field, value)
+        batch.flush()
+        return row
 
     def insert_shift_separator_if_needed(self, spreadsheet_id):
-        sheet = self.get_log_sheet(spreadsheet_id)
-        now = datetime.now()
+        now = self.clock()
         current_hour = now.hour
 
-        data = sheet.get_all_values()
-        last_shift_row = None
-        for idx, row in enumerate(data):
-            if any("Shift starting" in cell for cell in row):
-                last_shift_row = idx
+        mirror = self.get_log_mirror(spreadsheet_id)
+        last_shift_row = mirror.last_separator_row
 
-        if (current_hour in [6, 15]) and (last_shift_row is None or idx - last_shift_row > 2):
+        if current_hour in [6, 15]:
+            # Rows from other kiosks decide whether the separator is already there
+            mirror = self.read_log_tail(spreadsheet_id)
+            last_shift_row = mirror.last_separator_row
+
+        if (current_hour in [6, 15]) and (last_shift_row is None or len(mirror.rows) - last_shift_row > 2):
+            sheet = self.get_log_sheet(spreadsheet_id)
             shift_time = "7AM" if current_hour == 6 else "3PM"
             new_row = [f"=== Shift starting at {shift_time} ==="]
-            sheet.insert_row(new_row, len(data) + 1)
-            sheet.merge_cells(f"A{len(data)+1}:H{len(data)+1}")
-
-    def calculate_total_time(self, time_in_str, time_out_str, lunch_start_str, lunch_end_str):
-        fmt = "%H:%M:%S"
-        time_in = datetime.strptime(time_in_str, fmt)
-        time_out = datetime.strptime(time_out_str, fmt)
-     
-
-        total_time = time_out - time_in
-
-        print(f"[DEBUG] Calculating total time:")
-        print(f"  Time In: {time_in_str}")
-        print(f"  Time Out: {time_out_str}")
-        print(f"  Lunch Start: {lunch_start_str}")
-        print(f"  Lunch End: {lunch_end_str}")
-
-        if lunch_start_str and lunch_end_str:
-            lunch_start = datetime.strptime(lunch_start_str, fmt)
-            lunch_end = datetime.strptime(lunch_end_str, fmt)
-            lunch_duration = lunch_end - lunch_start
-            total_time -= lunch_duration
-            return total_time, lunch_duration
-        return total_time, None
-
-    def calculate_late(self, time_in_str):
-        fmt = "%H:%M:%S"
-        time_in = datetime.strptime(time_in_str, fmt)
-        if time_in.hour < 15:
-            scheduled_time = time_in.replace(hour=7, minute=0, second=0)
-        else:
-            scheduled_time = time_in.replace(hour=15, minute=0, second=0)
-        late = (time_in - scheduled_time).total_seconds() / 60
-        return max(0, int(late))
+            next_row = len(mirror.rows) + 1
+            try:
+                sheet.insert_row(new_row, next_row)
+                sheet.merge_cells(f"A{next_row}:{LOG_LAST_COLUMN}{next_row}")
+            except Exception as e:
+                self.handle_sheet_error(spreadsheet_id, e)
+                raise
+            mirror.append(new_row)
+
+    def archive_closed_shifts(self, spreadsheet_id, period="month", today=None):
+        with self.governor.priority(BACKGROUND):
+            return self._archive_closed_shifts(spreadsheet_id, period, today)
+
+    def _archive_closed_shifts(self, spreadsheet_id, period="month", today=None):
+        # Move closed shifts from periods before the current one out of "log"
+        # into per-period worksheets. Rows are copied first and deleted from
+        # the log afterwards, so a failure in between leaves duplicates, never
+        # gaps. Deleting rows renumbers the log, so run this from one place
+        # per sheet (one kiosk or the hub) while no kiosk is punching.
+        today = today or self.clock().date()
+        mirror = self.resync_log(spreadsheet_id)
+        current = archive_title(today, period)
+
+        destinations = [None] * len(mirror.rows)
+        pending = []  # separators and blank rows go wherever the next shift goes
+        for idx in range(2, len(mirror.rows) + 1):
+            row = mirror.rows[idx - 1]
+            if not row[0] or "Shift starting" in row[0]:
+                pending.append(idx)
+                continue
+            row_date = log_date(row[2])
+            title = None
+            if row_date is not None and row[3] and archive_title(row_date, period) < current:
+                title = archive_title(row_date, period)
+            for held in pending + [idx]:
+                destinations[held - 1] = title
+            pending = []
+
+        archived = {}
+        for idx, title in enumerate(destinations, start=1):
+            if title is not None:
+                archived.setdefault(title, []).append(idx)
+        if not archived:
+            return 0
+
+        spreadsheet = self.get_spreadsheet(spreadsheet_id)
+        try:
+            for title, rows in sorted(archived.items()):
+                values = [mirror.rows[idx - 1][:len(LOG_COLUMNS)] for idx in rows]
+                sheet = self.get_archive_sheet(spreadsheet_id, title, header=mirror.rows[0][:len(LOG_COLUMNS)])
+                sheet.append_rows(values, value_input_option=ValueInputOption.user_entered)
+                with self.cache_lock:
+                    self.partition_rows.pop((spreadsheet_id, title), None)  # Read again if a report wants it
+                log.info("Archived %d rows to %s", len(values), title)
+
+            # Delete bottom-up in contiguous runs so earlier indexes stay valid
+            log_sheet = self.get_log_sheet(spreadsheet_id)
+            runs = []
+            for idx in sorted(idx for rows in archived.values() for idx in rows):
+                if runs and runs[-1][1] == idx - 1:
+                    runs[-1][1] = idx
+                else:
+                    runs.append([idx, idx])
+            spreadsheet.batch_update({"requests": [
+                {"deleteDimension": {"range": {
+                    "sheetId": log_sheet.id, "dimension": "ROWS", "startIndex": start - 1, "endIndex": end
+                }}}
+                for start, end in reversed(runs)
+            ]})
+        except Exception as e:
+            self.log_mirrors.pop(spreadsheet_id, None)
+            self.handle_sheet_error(spreadsheet_id, e)
+            raise
+
+        kept = [row for row, title in zip(mirror.rows, destinations) if title is None]
+        self.log_mirrors[spreadsheet_id] = LogMirror(kept, self.clock)
+        return len(mirror.rows) - len(kept)
 
-    def save_clock_in(self, spreadsheet_id, operator_name, clock_in_time):
-        self.insert_shift_separator_if_needed(spreadsheet_id)
-        self.update_operator_log(spreadsheet_id, operator_name, "time_in", clock_in_time)
+    def close_stale_shifts(self, spreadsheet_id, policy="close", now=None, grace=SWEEP_GRACE, ends=SHIFT_ENDS):
+        with self.governor.priority(BACKGROUND):
+            return self._close_stale_shifts(spreadsheet_id, policy, now, grace, ends)
 
-    def save_lunch_start(self, spreadsheet_id, operator_name, lunch_start_time):
-        self.update_operator_log(spreadsheet_id, operator_name, "lunch_start", lunch_start_time)
+    def _close_stale_shifts(self, spreadsheet_id, policy="close", now=None, grace=SWEEP_GRACE, ends=SHIFT_ENDS):
+        # One fresh read of today's and the open rows, so clock-outs from
+        # other kiosks count, and one batch_update for every forgotten row
+        now = now or self.clock()
+        self.refresh_log(spreadsheet_id, now.date())
+        batch = LogBatch(self, spreadsheet_id)
+        schedule = self.schedule_index(spreadsheet_id)
+        swept = 0
+        for operator_name, rows in list(batch.mirror.open_rows.items()):
+            for row in list(rows):
+                fields = self.sweep_fields(batch.mirror.row_values(row), operator_name, policy, now, grace, schedule,
+                                           ends)
+                if fields:
+                    for field, value in fields.items():
+                        batch.set(row, field, value)
+                    swept += 1
+        batch.flush()
+        return swept
 
-    def save_lunch_end(self, spreadsheet_id, operator_name, lunch_end_time):
-        self.update_operator_log(spreadsheet_id, operator_name, "lunch_end", lunch_end_time)
+    def get_archive_sheet(self, spreadsheet_id, title, header):
+        try:
+            return self.get_worksheet(spreadsheet_id, title)
+        except gspread.exceptions.WorksheetNotFound:
+            sheet = self.governor.wrap(
+                self.get_spreadsheet(spreadsheet_id).add_worksheet(title=title, rows=1, cols=len(LOG_COLUMNS))
+            )
+            sheet.update([header], "A1")
+            with self.cache_lock:
+                self.worksheets[(spreadsheet_id, title)] = sheet
+            return sheet
 
-    def save_clock_out(self, spreadsheet_id, operator_name, clock_out_time):
-        self.update_operator_log(spreadsheet_id, operator_name, "time_out", clock_out_time)
+    def write_table(self, spreadsheet_id, title, rows):
+        # Replace the contents of a report worksheet, creating it if needed
+        with self.governor.priority(BACKGROUND):
+            try:
+                try:
+                    sheet = self.get_worksheet(spreadsheet_id, title)
+                except gspread.exceptions.WorksheetNotFound:
+                    sheet = self.governor.wrap(self.get_spreadsheet(spreadsheet_id).add_worksheet(
+                        title=title, rows=max(len(rows), 1), cols=max(len(rows[0]) if rows else 1, 1)))
+                    with self.cache_lock:
+                        self.worksheets[(spreadsheet_id, title)] = sheet
+                sheet.clear()
+                # Writes past the grid are rejected, and a report can outgrow last run's
+                sheet.resize(rows=max(len(rows), 1), cols=max(max((len(row) for row in rows), default=1), 1))
+                sheet.update(rows, "A1")
+            except Exception as e:
+                self.handle_sheet_error(spreadsheet_id, e)
+                raise
+
+    def read_shifts(self, spreadsheet_id, start_date, end_date):
+        with self.governor.priority(BACKGROUND):
+            return self._read_shifts(spreadsheet_id, start_date, end_date)
+
+    def _read_shifts(self, spreadsheet_id, start_date, end_date):
+        # Log rows whose time in falls within [start_date, end_date], read from
+        # the hot log plus only the archive partitions that overlap the range.
+        # Closed partitions rarely change, so the last few read are kept.
+        rows = []
+        titles = [sheet.title for sheet in self.get_spreadsheet(spreadsheet_id).worksheets()]
+        for title in titles:
+            span = partition_span(title)
+            if span is None or span[1] < start_date or span[0] > end_date:
+                continue
+            key = (spreadsheet_id, title)
+            cached = self.partition_rows.get(key)
+            if cached is None:
+                cached = self.get_worksheet(spreadsheet_id, title).get_all_values()[1:]
+            with self.cache_lock:
+                self.partition_rows[key] = cached
+                self.partition_rows.move_to_end(key)
+                while len(self.partition_rows) > PARTITION_CACHE:
+                    self.partition_rows.popitem(last=False)
+            rows.extend(cached)
+        rows.extend(self.read_log_tail(spreadsheet_id).rows[1:])
+
+        shifts = []
+        for row in rows:
+            row_date = log_date(row[2] if len(row) > 2 else "")
+            if row_date is not None and start_date <= row_date <= end_date:
+                shifts.append(list(row) + [""] * (len(LOG_COLUMNS) - len(row)))
+        return shifts
+
+    def apply_punches(self, spreadsheet_id, punches):
+        # Applies punches in order with a single LogBatch flush. Returns the
+        # number of punches written; replays that are already present are skipped.
+        if any(punch["action"] == "clock_in" and not punch.get("shift") for punch in punches):
+            self.insert_shift_separator_if_needed(spreadsheet_id)
+        batch = LogBatch(self, spreadsheet_id)
+        schedule = self.schedule_index(spreadsheet_id)
+        shift_rows = None
+        written = 0
+        for punch in punches:
+            operator_name = punch["operator"]
+            if punch.get("shift"):
+                if shift_rows is None:
+                    shift_rows = batch.mirror.shift_rows()
+                written += self.apply_shift_punch(batch, shift_rows, punch, schedule)
+                continue
+            current = batch.mirror.find_open_row(operator_name) or batch.mirror.find_latest_row(operator_name)
+            if self.punch_applied(batch.mirror.row_values(current) if current else None, punch):
+                log.info("Skipping %s for %s at %s, already logged", punch["action"], operator_name, punch["time"])
+                continue
+            if punch["action"] == "clock_in":
+                self.supersede_open_rows(batch, operator_name, punch["time"])
+            elif batch.mirror.find_open_row(operator_name) is None:
+                self.log_orphan_punch(punch)
+                continue
+            row = batch.row_for(operator_name)
+            for field, value in self.punch_fields(batch.mirror.row_values(row), punch, schedule).items():
+                batch.set(row, field, value)
+            written += 1
+        batch.flush()
+        return written
+
+    def apply_shift_punch(self, batch, shift_rows, punch, schedule):
+        # A backfilled punch names its shift by the shift's dated time in and
+        # goes on that shift's own row, whatever the operator is doing now
+        key = (punch["operator"], parse_log_time(punch["shift"]))
+        row = shift_rows.get(key)
+        if punch["action"] == "clock_in":
+            if row is not None:
+                log.info("Skipping clock_in for %s at %s, already logged", punch["operator"], punch["time"])
+                return False
+            row = shift_rows[key] = batch.mirror.append([punch["operator"]])
+        elif row is None:
+            self.log_orphan_punch(punch)
+            return False
+        elif self.punch_applied(batch.mirror.row_values(row), punch):
+            log.info("Skipping %s for %s at %s, already logged", punch["action"], punch["operator"], punch["time"])
+            return False
+        for field, value in self.punch_fields(batch.mirror.row_values(row), punch, schedule).items():
+            batch.set(row, field, value)
+        return True
+
+    def supersede_open_rows(self, batch, operator_name, clock_in_time):
+        # Rows still open from an earlier shift are flagged, so the clock-in
+        # starts a row of its own. An open row with no time in yet is the one
+        # find_or_create_operator_log_row made for this clock-in; it is kept.
+        row = batch.mirror.find_open_row(operator_name)
+        while row is not None and batch.get(row, "time_in"):
+            for field, value in self.superseded_fields(batch.mirror.row_values(row), operator_name,
+                                                       clock_in_time).items():
+                batch.set(row, field, value)
+            row = batch.mirror.find_open_row(operator_name)
 
     def finalize_shift(self, spreadsheet_id, operator_name):
-        sheet = self.get_log_sheet(spreadsheet_id)
-        row = self.find_or_create_operator_log_row(spreadsheet_id, operator_name)
-        time_in = sheet.cell(row, 3).value
-        time_out = sheet.cell(row, 4).value
-        lunch_start = sheet.cell(row, 5).value
-        lunch_end = sheet.cell(row, 6).value
-
-        if time_in and time_out:
-            total_time, lunch_duration = self.calculate_total_time(time_in, time_out, lunch_start, lunch_end)
-            late = self.calculate_late(time_in)
-            self.update_operator_log(spreadsheet_id, operator_name, "total_time", str(total_time))
-            self.update_operator_log(spreadsheet_id, operator_name, "late", late)
-            print(f"[INFO] Finalized shift for {operator_name}")
-        else:
-            print(f"[WARNING] Incomplete shift, cannot finalize for {operator_name}")
+        batch = LogBatch(self, spreadsheet_id)
+        row = batch.mirror.find_open_row(operator_name) or batch.mirror.find_latest_row(operator_name)
+        if row is None:
+            log.warning("No log row found, cannot finalize for %s", operator_name)
+            return
+        self.finalize_row(batch, row, operator_name)
+        batch.flush()
+
+    def finalize_row(self, batch, row, operator_name):
+        # Derived fields come from the values already held in the mirror
+        schedule = self.schedule_index(batch.spreadsheet_id)
+        for field, value in self.finalized_fields(batch.mirror.row_values(row), operator_name, schedule).items():
+            batch.set(row, field, value)
@@ -0,0 +1,465 @@
+import argparse
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metrics
+from journal import PunchJournal, JournalReplayer
+from storage import StorageBackend, open_backend, overlay_punch, last_sweep_boundary, BACKENDS, SHIFT_ENDS, SWEEP_POLICIES
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+HUB_PORT = 8765
+HUB_HOST = "127.0.0.1"   # Interface to listen on; the site LAN address once kiosks connect from other machines
+HUB_TOKEN_ENV = "HUB_TOKEN"  # Shared secret kiosks send as "Authorization: Bearer <token>"
+HUB_JOURNAL_FILE = "hub_journal.jsonl"
+DRAIN_INTERVAL = 1.0     # Seconds between write batches to the sheet
+SCAN_INTERVAL = 60.0     # Seconds between log tail reads, for edits made in the sheet itself
+ROSTER_INTERVAL = 300.0  # Seconds between roster change checks
+LONG_POLL_SECONDS = 25   # How long /active holds a request open waiting for a change
+REQUEST_TIMEOUT = 10     # Seconds, for kiosk requests other than the long poll
+# Log edits a kiosk may ask the hub to make, with the row fields they take
+LOG_EDITS = {"find_or_create_operator_log_row": False, "update_operator_fields": True, "finalize_shift": False}
+
+
+class Site:
+    # Hub-side state for one spreadsheet
+    def __init__(self):
+        self.active_shifts = {}
+        self.version = 0
+        self.roster = None
+        self.roster_version = None
+        self.roster_digest = None
+        self.scanned_at = 0.0
+        self.roster_checked_at = 0.0
+        self.archived_on = None
+        self.swept_through = None
+
+
+class Hub:
+    # The only process that talks to Sheets. Kiosks hand it punches, which
+    # go to a durable journal and straight into the hub's active-shift view;
+    # one thread drains the journal to the sheet in batches, so writes are
+    # serialized and the Sheets request rate does not grow with kiosks.
+    # Kiosks long-poll /active for the view instead of scanning the log.
+    def __init__(self, backend, journal_path=HUB_JOURNAL_FILE, archive_period="month", sweep_policy="close",
+                 sweep_hours=SHIFT_ENDS):
+        self.backend = backend
+        self.journal = PunchJournal(journal_path)
+        self.replayer = JournalReplayer(self.journal, backend)
+        self.archive_period = archive_period
+        self.sweep_policy = sweep_policy
+        self.sweep_hours = tuple(sweep_hours)
+        self.sheets = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheets")
+        self.changed = threading.Condition()
+        self.sites = {}
+        self.stopping = threading.Event()
+        self.loop_thread = threading.Thread(target=self.run, name="hub", daemon=True)
+        metrics.gauge("hub_pending_punches", lambda: len(self.journal.pending_punches()),
+                      "Punches received from kiosks and not yet in the sheet")
+
+    def start(self):
+        self.sheets.submit(self.backend.authenticate).result()
+        for punch in self.journal.pending_punches():
+            self.site(punch["spreadsheet_id"])
+        self.loop_thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        self.loop_thread.join()
+        self.sheets.submit(self.drain).result()
+        self.sheets.shutdown()
+        self.journal.close()
+
+    def site(self, spreadsheet_id):
+        with self.changed:
+            site = self.sites.get(spreadsheet_id)
+            if site is None:
+                site = self.sites[spreadsheet_id] = Site()
+        return site
+
+    # --- Kiosk requests ---
+
+    def submit(self, punches):
+        new = self.journal.record_punches(punches)
+        with self.changed:
+            for punch in new:
+                site = self.site(punch["spreadsheet_id"])
+                overlay_punch(site.active_shifts, punch)
+                site.version += 1
+            self.changed.notify_all()
+        metrics.inc("hub_punches_total", len(new))
+        return len(new)
+
+    def wait_active(self, spreadsheet_id, since, timeout=LONG_POLL_SECONDS):
+        site = self.site(spreadsheet_id)
+        if site.version == 0:
+            self.refresh(spreadsheet_id)  # First kiosk for this sheet: read it now
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            while site.version <= since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.changed.wait(remaining)
+            return site.version, {operator: dict(info) for operator, info in site.active_shifts.items()}
+
+    def roster(self, spreadsheet_id):
+        site = self.site(spreadsheet_id)
+        if site.roster is None:
+            self.refresh_roster(spreadsheet_id)
+        return site.roster or []
+
+    def read_shifts(self, spreadsheet_id, start_date, end_date):
+        return self.sheets.submit(self.backend.read_shifts, spreadsheet_id, start_date, end_date).result()
+
+    def open_shifts(self, spreadsheet_id):
+        return self.sheets.submit(self._after_punches, self.backend.open_shifts, spreadsheet_id).result()
+
+    def edit_log(self, spreadsheet_id, method, operator_name, fields=None):
+        args = (fields,) if LOG_EDITS[method] else ()
+        result = self.sheets.submit(self._after_punches, getattr(self.backend, method), spreadsheet_id,
+                                    operator_name, *args).result()
+        self.refresh(spreadsheet_id)
+        return result
+
+    # --- Sheets side; everything below runs on the single sheets thread ---
+
+    def drain(self):
+        try:
+            return self.replayer.drain()
+        except Exception as e:
+            log.warning("Could not write to the sheet, %d punches waiting: %s",
+                        len(self.journal.pending_punches()), e)
+            return 0
+
+    def _after_punches(self, func, *args):
+        # Direct reads and edits of the log see every punch the hub accepted before them
+        self.drain()
+        if self.journal.pending_punches(1):
+            raise RuntimeError("punches are still waiting for the sheet")
+        return func(*args)
+
+    def _scan(self, spreadsheet_id):
+        site = self.site(spreadsheet_id)
+        site.scanned_at = time.monotonic()  # A failed read waits its turn too
+        self._publish(spreadsheet_id, self.backend.active_shifts(spreadsheet_id))
+
+    def _scan_all(self, spreadsheet_ids):
+        # Engines that serve many sites at once (async_sheets) read them all in parallel
+        for spreadsheet_id in spreadsheet_ids:
+            self.site(spreadsheet_id).scanned_at = time.monotonic()
+        for spreadsheet_id, result in self.backend.run_all("active_shifts", spreadsheet_ids).items():
+            if isinstance(result, Exception):
+                log.warning("Could not read active shifts for %s: %s", spreadsheet_id, result)
+            else:
+                self._publish(spreadsheet_id, result)
+
+    def _publish(self, spreadsheet_id, active_shifts):
+        site = self.site(spreadsheet_id)
+        with self.changed:
+            # Punches still in the hub journal are not in the sheet yet
+            for punch in self.journal.pending_punches():
+                if punch["spreadsheet_id"] == spreadsheet_id:
+                    overlay_punch(active_shifts, punch)
+            if active_shifts != site.active_shifts or site.version == 0:
+                site.active_shifts = active_shifts
+                site.version += 1
+                self.changed.notify_all()
+
+    def refresh(self, spreadsheet_id):
+        try:
+            self.sheets.submit(self._scan, spreadsheet_id).result()
+        except Exception as e:
+            log.warning("Could not read active shifts for %s: %s", spreadsheet_id, e)
+
+    def _refresh_roster(self, spreadsheet_id):
+        site = self.site(spreadsheet_id)
+        site.roster_checked_at = time.monotonic()
+        site.roster_version, site.roster_digest, names = self.backend.changed_roster(
+            spreadsheet_id, site.roster_version, site.roster_digest
+        )
+        if names is not None:
+            site.roster = names
+
+    def refresh_roster(self, spreadsheet_id):
+        try:
+            self.sheets.submit(self._refresh_roster, spreadsheet_id).result()
+        except Exception as e:
+            log.warning("Could not read the roster for %s: %s", spreadsheet_id, e)
+
+    def _archive_if_due(self, spreadsheet_id):
+        # Once a night, outside the shift windows
+        site = self.site(spreadsheet_id)
+        now = self.backend.clock()
+        if not self.archive_period or 6 <= now.hour < 21 or site.archived_on == now.date():
+            return
+        site.archived_on = now.date()
+        self.backend.archive_closed_shifts(spreadsheet_id, self.archive_period)
+
+    def _sweep_if_due(self, spreadsheet_id):
+        # Once per shift end, an hour after it, close the rows of operators who forgot to clock out
+        site = self.site(spreadsheet_id)
+        boundary = last_sweep_boundary(self.backend.clock(), self.sweep_hours)
+        if not self.sweep_policy or site.swept_through == boundary or self.journal.pending_punches(1):
+            return  # A clock-out still in the journal must land before its row is swept
+        site.swept_through = boundary
+        if self.backend.close_stale_shifts(spreadsheet_id, self.sweep_policy, ends=self.sweep_hours):
+            self._scan(spreadsheet_id)
+
+    def run(self):
+        while not self.stopping.wait(DRAIN_INTERVAL):
+            self.sheets.submit(self.drain).result()
+            now = time.monotonic()
+            with self.changed:
+                sites = list(self.sites.items())
+            due = [spreadsheet_id for spreadsheet_id, site in sites if now - site.scanned_at > SCAN_INTERVAL]
+            if len(due) > 1 and hasattr(self.backend, "run_all"):
+                try:
+                    self.sheets.submit(self._scan_all, due).result()
+                except Exception as e:
+                    log.warning("Could not read active shifts: %s", e)
+            else:
+                for spreadsheet_id in due:
+                    self.refresh(spreadsheet_id)
+            for spreadsheet_id, site in sites:
+                if site.roster is not None and now - site.roster_checked_at > ROSTER_INTERVAL:
+                    self.refresh_roster(spreadsheet_id)
+                try:
+                    self.sheets.submit(self._sweep_if_due, spreadsheet_id).result()
+                except Exception as e:
+                    log.warning("Sweeping open shifts in %s failed: %s", spreadsheet_id, e)
+                try:
+                    self.sheets.submit(self._archive_if_due, spreadsheet_id).result()
+                except Exception as e:
+                    log.warning("Archiving %s failed: %s", spreadsheet_id, e)
+
+
+class HubRequestHandler(BaseHTTPRequestHandler):
+    hub = None  # Set on the subclass HubServer creates, with the token
+    token = None
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def authorized(self):
+        if self.token is None:
+            return True
+        sent = self.headers.get("Authorization", "")
+        if hmac.compare_digest(sent.encode("utf-8"), f"Bearer {self.token}".encode("utf-8")):
+            return True
+        self.send_json(401, {"error": "missing or wrong token"})
+        return False
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        url = urllib.parse.urlparse(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            spreadsheet_id = query["spreadsheet_id"]
+            if url.path == "/active":
+                timeout = min(float(query.get("timeout", LONG_POLL_SECONDS)), LONG_POLL_SECONDS)
+                version, active_shifts = self.hub.wait_active(spreadsheet_id, int(query.get("since", -1)), timeout)
+                self.send_json(200, {"version": version, "active_shifts": active_shifts})
+            elif url.path == "/roster":
+                self.send_json(200, {"names": self.hub.roster(spreadsheet_id)})
+            elif url.path == "/shifts":
+                rows = self.hub.read_shifts(spreadsheet_id, date.fromisoformat(query["start"]),
+                                            date.fromisoformat(query["end"]))
+                self.send_json(200, {"rows": rows})
+            elif url.path == "/open":
+                self.send_json(200, {"open_shifts": self.hub.open_shifts(spreadsheet_id)})
+            else:
+                self.send_json(404, {"error": "not found"})
+        except (KeyError, ValueError) as e:
+            self.send_json(400, {"error": f"bad request: {e}"})
+        except Exception as e:
+            log.exception("GET %s failed", self.path)
+            self.send_json(502, {"error": str(e)})
+
+    def do_POST(self):
+        if not self.authorized():
+            return
+        path = urllib.parse.urlparse(self.path).path
+        if path not in ("/punches", "/log"):
+            self.send_json(404, {"error": "not found"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if path == "/log":
+                if body["method"] not in LOG_EDITS or not body["operator"]:
+                    raise ValueError(f"unknown log edit {body['method']!r}")
+                if LOG_EDITS[body["method"]] and not isinstance(body["fields"], dict):
+                    raise ValueError("fields must be an object")
+            else:
+                punches = body["punches"]
+                for punch in punches:
+                    if not all(punch.get(key) for key in ("id", "spreadsheet_id", "action", "operator", "time")):
+                        raise ValueError(f"incomplete punch {punch}")
+        except (KeyError, ValueError, TypeError) as e:
+            self.send_json(400, {"error": f"bad request: {e}"})
+            return
+        if path == "/punches":
+            self.send_json(200, {"accepted": self.hub.submit(punches)})
+            return
+        try:
+            result = self.hub.edit_log(body["spreadsheet_id"], body["method"], body["operator"], body.get("fields"))
+        except Exception as e:
+            log.exception("%s for %s failed", body["method"], body["operator"])
+            self.send_json(502, {"error": str(e)})
+            return
+        self.send_json(200, {"result": result})
+
+    def log_message(self, format, *args):
+        log.debug("%s - " + format, self.client_address[0], *args)
+
+
+def is_loopback(host):
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+class HubServer:
+    # Anyone who can reach the hub can punch for anyone, so it serves only
+    # this machine unless it has a token to check
+    def __init__(self, hub, port=HUB_PORT, host=HUB_HOST, token=None):
+        if not token and not is_loopback(host):
+            raise ValueError(f"Refusing to listen on {host} without a token; set {HUB_TOKEN_ENV} or pass --token")
+        handler = type("BoundHubRequestHandler", (HubRequestHandler,), {"hub": hub, "token": token or None})
+        self.hub = hub
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+
+    def serve_forever(self):
+        log.info("Hub listening on %s:%s", *self.server.server_address[:2])
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+
+
+class HubClient(StorageBackend):
+    # Storage backend for kiosks that go through a hub. Punches are handed to
+    # the hub, which owns every write; reads come from its shared view.
+    def __init__(self, url, token=None):
+        self.url = url.rstrip("/")
+        self.token = token
+
+    def _request(self, path, params=None, body=None, timeout=REQUEST_TIMEOUT):
+        url = f"{self.url}{path}"
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(url, data=data, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"Hub returned {e.code} for {path}: {e.read()[:200]!r}") from e
+
+    def get_names_from_schedule(self, spreadsheet_id):
+        return self._request("/roster", {"spreadsheet_id": spreadsheet_id})["names"]
+
+    def _edit_log(self, spreadsheet_id, method, operator_name, fields=None):
+        body = {"spreadsheet_id": spreadsheet_id, "method": method, "operator": operator_name, "fields": fields}
+        return self._request("/log", body=body, timeout=60)["result"]
+
+    def find_or_create_operator_log_row(self, spreadsheet_id, operator_name):
+        return self._edit_log(spreadsheet_id, "find_or_create_operator_log_row", operator_name)
+
+    def update_operator_fields(self, spreadsheet_id, operator_name, fields):
+        return self._edit_log(spreadsheet_id, "update_operator_fields", operator_name, fields)
+
+    def finalize_shift(self, spreadsheet_id, operator_name):
+        self._edit_log(spreadsheet_id, "finalize_shift", operator_name)
+
+    def open_shifts(self, spreadsheet_id):
+        return self._request("/open", {"spreadsheet_id": spreadsheet_id}, timeout=60)["open_shifts"]
+
+    def apply_punches(self, spreadsheet_id, punches):
+        # Once the hub has them they are in its journal, so the kiosk can
+        # mark them applied
+        punches = [dict(punch, spreadsheet_id=spreadsheet_id) for punch in punches]
+        self._request("/punches", body={"punches": punches})
+        return len(punches)
+
+    def active_shifts(self, spreadsheet_id, today=None):
+        version, active_shifts = self.wait_active(spreadsheet_id, since=-1, timeout=0)
+        if version == 0:
+            # An empty view would read as everyone clocked out
+            raise RuntimeError("Hub has not read the sheet yet")
+        return active_shifts
+
+    def wait_active(self, spreadsheet_id, since, timeout=LONG_POLL_SECONDS):
+        # (version, active_shifts), returning once the hub's view moves past
+        # `since` or the timeout runs out
+        params = {"spreadsheet_id": spreadsheet_id, "since": since, "timeout": timeout}
+        result = self._request("/active", params, timeout=timeout + REQUEST_TIMEOUT)
+        return result["version"], result["active_shifts"]
+
+    def close_stale_shifts(self, spreadsheet_id, policy="close", now=None, grace=None, ends=None):
+        return 0  # The hub sweeps the log itself
+
+    def read_shifts(self, spreadsheet_id, start_date, end_date):
+        params = {"spreadsheet_id": spreadsheet_id, "start": start_date.isoformat(), "end": end_date.isoformat()}
+        return self._request("/shifts", params, timeout=60)["rows"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregation hub that owns all Sheets writes for a site's kiosks")
+    parser.add_argument("--port", type=int, default=HUB_PORT)
+    parser.add_argument("--host", default=HUB_HOST, help="interface to listen on; any but loopback needs a token")
+    parser.add_argument("--token", default=os.environ.get(HUB_TOKEN_ENV),
+                        help=f"shared secret kiosks must send (default: ${HUB_TOKEN_ENV})")
+    parser.add_argument("--backend", choices=[kind for kind in BACKENDS if kind != "hub"], default="sheets")
+    parser.add_argument("--credentials", default="gsheet-credentials.json", help="service account file")
+    parser.add_argument("--journal", default=HUB_JOURNAL_FILE)
+    parser.add_argument("--archive-period", choices=["week", "month", "none"], default="month")
+    parser.add_argument("--sweep-policy", choices=list(SWEEP_POLICIES) + ["none"], default="close",
+                        help="what to do with shifts left open past their end")
+    parser.add_argument("--sweep-hours", type=int, nargs="+", default=list(SHIFT_ENDS),
+                        help="hours the shifts end; each is swept an hour later")
+    parser.add_argument("--metrics-port", type=int, help="also serve /metrics on this port")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.metrics_port:
+        metrics.MetricsServer(args.metrics_port).start()
+    backend = open_backend(args.backend, args.credentials)
+    archive_period = None if args.archive_period == "none" else args.archive_period
+    sweep_policy = None if args.sweep_policy == "none" else args.sweep_policy
+    hub = Hub(backend, args.journal, archive_period, sweep_policy, sorted(args.sweep_hours)).start()
+    try:
+        HubServer(hub, args.port, args.host, args.token).serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        hub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import threading
+import uuid
+
+log = logging.getLogger(__name__)
+
+
+class PunchJournal:
+    # Append-only JSONL write-ahead log. Every punch line is fsynced before any
+    # Sheets call is attempted, and an {"applied": id} line is added once the
+    # punch is in the sheet. Whatever is not marked applied is replayed.
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = self._load()
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return []
+        punches = []
+        applied = set()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write; it was never acknowledged
+                    log.warning("Ignoring unreadable journal line: %s", line[:80])
+                    continue
+                if "applied" in record:
+                    applied.add(record["applied"])
+                else:
+                    punches.append(record)
+        return [punch for punch in punches if punch["id"] not in applied]
+
+    def _write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def record(self, spreadsheet_id, action, operator_name, time):
+        punch = {
+            "id": uuid.uuid4().hex,
+            "spreadsheet_id": spreadsheet_id,
+            "action": action,
+            "operator": operator_name,
+            "time": time
+        }
+        self.record_punches([punch])
+        return punch
+
+    def record_punches(self, punches):
+        # Punches handed over from another journal keep their ids, so a
+        # resend of one still pending is dropped. Returns the new ones.
+        with self.lock:
+            known = {punch["id"] for punch in self.pending}
+            new = [punch for punch in punches if punch["id"] not in known]
+            if new:
+                self._write(new)
+                self.pending.extend(new)
+        return new
+
+    def pending_punches(self, limit=None):
+        with self.lock:
+            return list(self.pending[:limit])
+
+    def mark_applied(self, punches):
+        ids = {punch["id"] for punch in punches}
+        with self.lock:
+            self._write([{"applied": punch_id} for punch_id in ids])
+            self.pending = [punch for punch in self.pending if punch["id"] not in ids]
+            if not self.pending:
+                # Everything is in the sheet, start the journal over
+                self.file.seek(0)
+                self.file.truncate()
+                self.file.flush()
+                os.fsync(self.file.fileno())
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class JournalReplayer:
+    # Drains the journal to the sheet in order, a batch at a time. A batch
+    # only covers consecutive punches for the same spreadsheet so ordering
+    # across sheets is kept too.
+    def __init__(self, journal, drive_handler, batch_size=50):
+        self.journal = journal
+        self.drive_handler = drive_handler
+        self.batch_size = batch_size
+
+    def drain(self):
+        written = 0
+        while True:
+            punches = self.journal.pending_punches(self.batch_size)
+            if not punches:
+                return written
+            spreadsheet_id = punches[0]["spreadsheet_id"]
+            batch = []
+            for punch in punches:
+                if punch["spreadsheet_id"] != spreadsheet_id:
+                    break
+                batch.append(punch)
+            written += self.drive_handler.apply_punches(spreadsheet_id, batch)
+            self.journal.mark_applied(batch)
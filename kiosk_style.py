@@ -0,0 +1,50 @@
+from functools import lru_cache
+
+from PyQt5.QtGui import QFont
+
+FONT_FAMILY = "Monospace"
+
+# One stylesheet for the whole application, set before any widget exists so
+# nothing is re-polished. Widgets pick their rules through the "role" property
+# instead of carrying a stylesheet each.
+STYLESHEET = """
+QWidget {
+    background-color: rgb(248, 248, 248);
+}
+QPushButton[role="action"] {
+    background-color: rgb(133, 191, 157);
+    color: white;
+    font-weight: bold;
+    border: none;
+    border-radius: 10px;
+    padding: 10px;
+}
+QPushButton[role="key"] {
+    background-color: rgb(238, 238, 238);
+    font-family: Monospace;
+    font-size: 24px;
+    border: none;
+    border-radius: 10px;
+    padding: 10px;
+}
+QComboBox[role="input"], QComboBox[role="input"] QWidget, QLineEdit[role="input"] {
+    background-color: rgb(214, 209, 199);
+    font-size: 24px;
+    border: none;
+    border-radius: 10px;
+    padding: 10px;
+}
+"""
+
+
+@lru_cache(maxsize=None)
+def font(size, bold=False):
+    # Shared instances; setFont copies are cheap, building and resolving a new QFont per widget is not
+    return QFont(FONT_FAMILY, size, QFont.Bold if bold else QFont.Normal)
+
+
+def apply_style(app):
+    if app.property("kiosk_styled"):
+        return
+    app.setStyleSheet(STYLESHEET)
+    app.setProperty("kiosk_styled", True)
@@ -0,0 +1,198 @@
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+# Seconds; Sheets round trips sit around 0.1-1s, UI stalls should stay under 0.05s
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    # Counters, histograms and gauges kept in process and rendered in the
+    # Prometheus text format. Updates are a dict lookup under one lock, cheap
+    # enough for every Sheets request and every UI event.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help = {}
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name, read, help_text="", **labels):
+        # read() is called at scrape time, so queue depths are always current
+        with self.lock:
+            self.gauges.setdefault(name, {})[_label_key(labels)] = read
+            if help_text:
+                self.help[name] = help_text
+
+    def describe(self, name, help_text):
+        with self.lock:
+            self.help[name] = help_text
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name, **labels):
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def render(self):
+        with self.lock:
+            counters = {name: dict(series) for name, series in self.counters.items()}
+            histograms = {
+                name: {key: (list(h.counts), h.sum, h.count, h.buckets) for key, h in series.items()}
+                for name, series in self.histograms.items()
+            }
+            gauges = {name: dict(series) for name, series in self.gauges.items()}
+            help_texts = dict(self.help)
+
+        lines = []
+
+        def header(name, kind):
+            if name in help_texts:
+                lines.append(f"# HELP {name} {help_texts[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, series in sorted(counters.items()):
+            header(name, "counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(gauges.items()):
+            header(name, "gauge")
+            for key, read in sorted(series.items()):
+                try:
+                    value = read()
+                except Exception:
+                    log.exception("Gauge %s failed", name)
+                    continue
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(histograms.items()):
+            header(name, "histogram")
+            for key, (counts, total, count, buckets) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+gauge = REGISTRY.gauge
+timer = REGISTRY.timer
+timed = REGISTRY.timed
+
+REGISTRY.describe("storage_call_seconds", "Time spent in each storage backend method")
+REGISTRY.describe("sheets_request_seconds", "Time per Sheets API request, retries included")
+REGISTRY.describe("ui_stall_seconds", "How late the UI thread ran its heartbeat")
+
+
+def instrument(name, **labels):
+    # Class decorator: time every public method into histogram `name`,
+    # labelled with the method. Nested calls are timed separately.
+    def decorate(cls):
+        for attr, value in inspect.getmembers(cls):
+            if attr.startswith("_"):
+                continue
+            if not inspect.isfunction(inspect.getattr_static(cls, attr)):
+                continue  # staticmethods, classmethods and plain attributes like clock
+            setattr(cls, attr, REGISTRY.timed(name, method=attr, **labels)(value))
+        return cls
+    return decorate
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("metrics %s - " + format, self.client_address[0], *args)
+
+
+class MetricsServer:
+    # Serves /metrics on a daemon thread. Binds to localhost by default; the
+    # kiosk should not expose it beyond the machine unless asked to.
+    def __init__(self, port, host="127.0.0.1", registry=REGISTRY):
+        handler = type("MetricsRequestHandler", (_MetricsRequestHandler,), {"registry": registry})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        log.info("Serving metrics on http://%s:%s/metrics", *self.server.server_address[:2])
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
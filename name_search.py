@@ -0,0 +1,136 @@
+import bisect
+import heapq
+from collections import defaultdict
+
+# Ranking tiers, best first
+WHOLE_PREFIX = 0   # "jo" -> "John Smith"
+WORD_PREFIX = 1    # "smi" / "j smi" -> "John Smith"
+SUBSTRING = 2      # "ohn sm" -> "John Smith"
+FUZZY = 3          # "jhon smtih" -> "John Smith"
+
+MIN_SIMILARITY = 0.35  # Trigram Dice score that counts as a match on its own
+MIN_SHARED = 2  # Trigrams a name must share with the query before edit distance is checked
+FUZZY_CANDIDATES = 50  # Names, by shared trigrams, that get the edit distance check
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+def trigrams(text):
+    # Padded per word so the start of each word weighs in, which is where
+    # people are least likely to mistype
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def allowed_typos(query):
+    return 1 if len(query) <= 5 else 2 if len(query) <= 10 else 3
+
+
+def prefix_typos(query, text, limit):
+    # Fewest edits (adjacent swaps count as one) turning query into some
+    # prefix of text, or limit + 1 once every alignment is worse than limit.
+    # One optimal string alignment table; its last row covers every prefix.
+    text = text[:len(query) + limit]
+    previous2, previous = None, list(range(len(text) + 1))
+    for i in range(1, len(query) + 1):
+        current = [i] + [0] * len(text)
+        for j in range(1, len(text) + 1):
+            cost = query[i - 1] != text[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and query[i - 1] == text[j - 2] and query[i - 2] == text[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous)
+
+
+class NameIndex:
+    # Search over a roster of a few thousand names. Word prefixes are looked
+    # up by bisecting a sorted word list, which gives the same contiguous
+    # prefix ranges as a trie in a fraction of the memory; a trigram index
+    # finds substrings and typos. Pure Python so it can be timed without Qt.
+    def __init__(self, names=()):
+        self.build(names)
+
+    def build(self, names):
+        self.names = list(dict.fromkeys(name for name in names if name.strip()))
+        self.normalized = [normalize(name) for name in self.names]
+        # Where each word starts, so a typo'd surname still lines up
+        self.word_starts = [
+            [0] + [i + 1 for i, char in enumerate(text) if char == " "] for text in self.normalized
+        ]
+        words = []
+        self.postings = defaultdict(list)
+        self.gram_counts = []
+        for name_id, text in enumerate(self.normalized):
+            for word in set(text.split()):
+                words.append((word, name_id))
+            grams = trigrams(text)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.postings[gram].append(name_id)
+        words.sort()
+        self.words = [word for word, _ in words]
+        self.word_ids = [name_id for _, name_id in words]
+
+    def __len__(self):
+        return len(self.names)
+
+    def _prefixed(self, prefix):
+        # Ids of names with a word starting with prefix
+        start = bisect.bisect_left(self.words, prefix)
+        end = bisect.bisect_left(self.words, prefix + "￿", start)
+        return set(self.word_ids[start:end])
+
+    def search(self, query, limit=20):
+        query = normalize(query)
+        if not query:
+            return self.names[:limit]
+        scored = {}
+
+        # Every query word has to start a word of the name, in any order
+        query_words = query.split()
+        candidates = None
+        for word in sorted(query_words, key=len, reverse=True):
+            ids = self._prefixed(word)
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                break
+        for name_id in candidates or ():
+            tier = WHOLE_PREFIX if self.normalized[name_id].startswith(query) else WORD_PREFIX
+            scored[name_id] = (tier, 0.0)
+
+        # Prefix matches rank first, so a full page of them ends the search
+        if len(scored) < limit and len(query) >= 3:
+            query_grams = trigrams(query)
+            shared = defaultdict(int)
+            for gram in query_grams:
+                for name_id in self.postings.get(gram, ()):
+                    shared[name_id] += 1
+            limit_typos = allowed_typos(query)
+            # Each typo breaks at most four trigrams (an adjacent swap)
+            min_shared = max(MIN_SHARED, len(query_grams) - 4 * limit_typos)
+            fuzzy = []
+            for name_id, count in shared.items():
+                if name_id in scored:
+                    continue
+                if query in self.normalized[name_id]:
+                    similarity = 2 * count / (len(query_grams) + self.gram_counts[name_id])
+                    scored[name_id] = (SUBSTRING, -similarity)
+                elif count >= min_shared:
+                    fuzzy.append(name_id)
+            for name_id in heapq.nlargest(FUZZY_CANDIDATES, fuzzy, key=shared.__getitem__):
+                text = self.normalized[name_id]
+                similarity = 2 * shared[name_id] / (len(query_grams) + self.gram_counts[name_id])
+                typos = min(prefix_typos(query, text[start:], limit_typos) for start in self.word_starts[name_id])
+                if typos <= limit_typos or similarity >= MIN_SIMILARITY:
+                    scored[name_id] = (FUZZY, typos - similarity)
+
+        ranked = sorted(scored, key=lambda name_id: (*scored[name_id], self.normalized[name_id]))
+        return [self.names[name_id] for name_id in ranked[:limit]]
@@ -0,0 +1,158 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import gspread
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+REQUESTS_PER_MINUTE = 60  # Sheets API per-user quota
+BURST = 10                # Requests allowed back to back before throttling
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0        # Seconds; doubled on every retry, then jittered
+BACKOFF_MAX = 32.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# A 5xx can come back after the write went through, so these are retried on
+# 429 only; a punch that fails is replayed from the journal, which skips
+# what already landed
+NOT_IDEMPOTENT = ("append_row", "append_rows", "insert_row", "insert_rows", "add_worksheet", "delete_rows")
+
+USER = 0        # Punches and anything an operator is waiting on
+BACKGROUND = 1  # Scans, resyncs, roster refreshes, archiving
+
+
+def error_status(error):
+    if isinstance(error, gspread.exceptions.APIError):
+        code = getattr(error, "code", None)
+        if code is None and getattr(error, "response", None) is not None:
+            code = error.response.status_code
+        return code
+    return None
+
+
+class QuotaGovernor:
+    # Token bucket shared by every Sheets request the handler makes. Background
+    # callers wait while a user-facing request is queued for a token, and
+    # 429/5xx responses are retried with jittered exponential backoff (only
+    # 429 for writes that are not safe to repeat).
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, burst=BURST,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cond = threading.Condition()
+        self.waiting = {USER: 0, BACKGROUND: 0}
+        self.local = threading.local()
+        self.stats = {"requests": 0, "throttled": 0, "retried": 0, "failed": 0}
+        metrics.gauge("sheets_quota_tokens", lambda: self.tokens, "Tokens left in the quota bucket")
+        metrics.gauge("sheets_quota_waiting", lambda: self.waiting[USER], "Callers waiting for a token", priority="user")
+        metrics.gauge("sheets_quota_waiting", lambda: self.waiting[BACKGROUND], priority="background")
+
+    @contextmanager
+    def priority(self, level):
+        previous = getattr(self.local, "priority", USER)
+        self.local.priority = level
+        try:
+            yield
+        finally:
+            self.local.priority = previous
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority):
+        started = time.perf_counter()
+        with self.cond:
+            self.waiting[priority] += 1
+            throttled = False
+            try:
+                while True:
+                    self._refill()
+                    if self.tokens >= 1 and (priority == USER or self.waiting[USER] == 0):
+                        self.tokens -= 1
+                        break
+                    throttled = True
+                    self.cond.wait(max((1 - self.tokens) / self.rate, 0.01))
+            finally:
+                self.waiting[priority] -= 1
+            if throttled:
+                self.stats["throttled"] += 1
+            self.cond.notify_all()
+        if throttled:
+            metrics.inc("sheets_throttled_total")
+            metrics.observe("sheets_quota_wait_seconds", time.perf_counter() - started)
+
+    def call(self, func, *args, **kwargs):
+        return self.call_as(getattr(func, "__name__", "request"), func, *args, **kwargs)
+
+    def call_as(self, method, func, *args, **kwargs):
+        priority = getattr(self.local, "priority", USER)
+        retry_statuses = (429,) if method in NOT_IDEMPOTENT else RETRY_STATUSES
+        attempt = 0
+        started = time.perf_counter()
+        while True:
+            self.acquire(priority)
+            with self.cond:
+                self.stats["requests"] += 1
+            metrics.inc("sheets_requests_total", method=method)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                status = error_status(e)
+                if status not in retry_statuses or attempt >= self.max_retries:
+                    with self.cond:
+                        self.stats["failed"] += 1
+                    metrics.inc("sheets_failures_total", method=method)
+                    raise
+                attempt += 1
+                metrics.inc("sheets_retries_total", status=status)
+                with self.cond:
+                    self.stats["retried"] += 1
+                    if status == 429:
+                        # The server says we are over quota; slow every caller down
+                        self.tokens = min(self.tokens, 0.0)
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+                log.warning("Sheets returned %s, retry %d/%d in %.1fs", status, attempt, self.max_retries, delay)
+                time.sleep(delay)
+            else:
+                metrics.observe("sheets_request_seconds", time.perf_counter() - started, method=method)
+                return result
+
+    def wrap(self, target):
+        return Governed(target, self)
+
+    def snapshot(self):
+        with self.cond:
+            stats = dict(self.stats)
+            stats["tokens"] = self.tokens
+            stats["waiting_user"] = self.waiting[USER]
+            stats["waiting_background"] = self.waiting[BACKGROUND]
+        return stats
+
+
+class Governed:
+    # Proxy that sends every method call on a gspread Spreadsheet or
+    # Worksheet through the governor; attributes pass straight through.
+    def __init__(self, target, governor):
+        self._target = target
+        self._governor = governor
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def governed(*args, **kwargs):
+            return self._governor.call_as(name, attr, *args, **kwargs)
+        return governed
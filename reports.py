@@ -0,0 +1,219 @@
+import argparse
+import csv
+import logging
+import os
+import sys
+import time
+from datetime import date, datetime
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # Optional; the pure-Python path gives the same numbers
+    np = None
+
+from storage import open_backend, BACKENDS
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+SHIFT_STARTS = (7 * 3600, 15 * 3600)  # Seconds after midnight, same as calculate_late; for rows with no late value
+WEEKLY_OVERTIME_HOURS = 40
+DAY = 24 * 3600
+
+REPORT_COLUMNS = ["operator", "shifts", "hours", "lunch_hours", "overtime_hours",
+                  "late_shifts", "late_minutes", "no_lunch_shifts", "open_shifts"]
+
+
+@lru_cache(maxsize=None)
+def seconds_of_day(value):
+    # "7:05:00" / "07:05:00" -> 25500, None if blank or unreadable. Cached: a
+    # year of punches only ever holds a few thousand distinct times.
+    try:
+        hours, minutes, seconds = value.strip().split(":")
+        return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+    except (AttributeError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=None)
+def day_ordinal(value):
+    try:
+        return datetime.strptime(value, "%m/%d/%Y").toordinal()
+    except ValueError:
+        return None
+
+
+def stored_late(row):
+    # Minutes late as the kiosk recorded them, in seconds; None if blank
+    try:
+        return int(row[7]) * 60 if len(row) > 7 and row[7].strip() else None
+    except ValueError:
+        return None
+
+
+def parse_rows(rows, schedule=None):
+    # Log rows -> operator list plus parallel columns of ints (-1 for blank).
+    # Lateness is the stored value; rows without one are judged against the
+    # schedule, then the fixed shift starts. Rows without a dated time in are
+    # skipped.
+    operators, days, time_in, time_out, lunch_start, lunch_end, late = [], [], [], [], [], [], []
+    for row in rows:
+        day_text, _, clock_text = (row[2] if len(row) > 2 else "").strip().partition(" ")
+        day = day_ordinal(day_text) if clock_text else None
+        start = seconds_of_day(clock_text) if day is not None else None
+        if start is None:
+            continue
+        operators.append(row[0].strip())
+        days.append(day)
+        time_in.append(start)
+        for column, index in ((time_out, 3), (lunch_start, 4), (lunch_end, 5)):
+            value = seconds_of_day(row[index]) if len(row) > index and row[index] else None
+            column.append(-1 if value is None else value)
+        seconds = stored_late(row)
+        if seconds is None and schedule is not None:
+            deviations = schedule.deviations(operators[-1], row[2].strip())
+            seconds = deviations["late"] * 60 if deviations else None
+        late.append(late_seconds(start) if seconds is None else seconds)
+    return operators, days, time_in, time_out, lunch_start, lunch_end, late
+
+
+def late_seconds(start):
+    scheduled = SHIFT_STARTS[0] if start < SHIFT_STARTS[1] else SHIFT_STARTS[1]
+    return max(0, start - scheduled)
+
+
+def summarize_python(operators, days, time_in, time_out, lunch_start, lunch_end, late_column):
+    totals = {}
+    weekly = {}
+    for operator, day, start, end, l_start, l_end, late in zip(operators, days, time_in, time_out, lunch_start,
+                                                                lunch_end, late_column):
+        entry = totals.setdefault(operator, dict.fromkeys(REPORT_COLUMNS[1:], 0))
+        entry["shifts"] += 1
+        entry["late_minutes"] += late // 60
+        entry["late_shifts"] += late >= 60
+        if end < 0:
+            entry["open_shifts"] += 1
+            continue
+        worked = (end - start) % DAY  # A time out before the time in is after midnight
+        lunch = (l_end - l_start) % DAY if l_start >= 0 and l_end >= 0 else 0
+        entry["no_lunch_shifts"] += lunch == 0
+        entry["hours"] += worked - lunch
+        entry["lunch_hours"] += lunch
+        week = (operator, (day - 1) // 7)  # Ordinal 1 is a Monday, so weeks run Monday-Sunday
+        weekly[week] = weekly.get(week, 0) + worked - lunch
+    for (operator, _), seconds in weekly.items():
+        totals[operator]["overtime_hours"] += max(0, seconds - WEEKLY_OVERTIME_HOURS * 3600)
+    return totals
+
+
+def summarize_numpy(operators, days, time_in, time_out, lunch_start, lunch_end, late_column):
+    names, operator_ids = np.unique(np.array(operators, dtype=object), return_inverse=True)
+    count = len(names)
+    days = np.asarray(days, dtype=np.int64)
+    start = np.asarray(time_in, dtype=np.int64)
+    end = np.asarray(time_out, dtype=np.int64)
+    l_start = np.asarray(lunch_start, dtype=np.int64)
+    l_end = np.asarray(lunch_end, dtype=np.int64)
+
+    late = np.asarray(late_column, dtype=np.int64)
+    closed = end >= 0
+    has_lunch = (l_start >= 0) & (l_end >= 0)
+    worked = np.where(closed, (end - start) % DAY, 0)
+    lunch = np.where(closed & has_lunch, (l_end - l_start) % DAY, 0)
+    net = worked - lunch
+
+    def per_operator(values):
+        return np.bincount(operator_ids, weights=values, minlength=count)
+
+    weeks = (days - 1) // 7
+    week_keys, week_ids = np.unique(operator_ids * (weeks.max() + 1) + weeks, return_inverse=True)
+    week_totals = np.bincount(week_ids, weights=net)
+    overtime = np.bincount(week_keys // (weeks.max() + 1),
+                           weights=np.maximum(0, week_totals - WEEKLY_OVERTIME_HOURS * 3600), minlength=count)
+
+    columns = {
+        "shifts": per_operator(np.ones_like(start)),
+        "hours": per_operator(net),
+        "lunch_hours": per_operator(lunch),
+        "overtime_hours": overtime,
+        "late_shifts": per_operator(late >= 60),
+        "late_minutes": per_operator(late // 60),
+        "no_lunch_shifts": per_operator(closed & (lunch == 0)),
+        "open_shifts": per_operator(~closed),
+    }
+    return {
+        str(name): {column: int(values[index]) for column, values in columns.items()}
+        for index, name in enumerate(names)
+    }
+
+
+def summarize(rows, use_numpy=None, schedule=None):
+    # [{column: value}] per operator, sorted by name; durations in hours
+    columns = parse_rows(rows, schedule)
+    if not columns[0]:
+        return []
+    if use_numpy is None:
+        use_numpy = np is not None
+    totals = (summarize_numpy if use_numpy else summarize_python)(*columns)
+    report = []
+    for operator in sorted(totals):
+        entry = {"operator": operator, **totals[operator]}
+        for column in ("hours", "lunch_hours", "overtime_hours"):
+            entry[column] = round(entry[column] / 3600, 2)
+        report.append(entry)
+    return report
+
+
+def write_csv(report, out):
+    writer = csv.DictWriter(out, fieldnames=REPORT_COLUMNS)
+    writer.writeheader()
+    writer.writerows(report)
+
+
+def report_table(report):
+    return [REPORT_COLUMNS] + [[entry[column] for column in REPORT_COLUMNS] for entry in report]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-operator hours, lunch, lateness and overtime for a date range")
+    parser.add_argument("start", type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    parser.add_argument("end", type=date.fromisoformat, help="last day, YYYY-MM-DD")
+    parser.add_argument("--spreadsheet", default="1Nw9K1pKDbNihWuVhc-nhx7SjWnqKfNpXXSjt7OVOZtE")
+    parser.add_argument("--backend", choices=BACKENDS, default="sheets")
+    parser.add_argument("--credentials", default="gsheet-credentials.json", help="service account file")
+    parser.add_argument("--hub-url", help="read through a hub instead, with --backend hub")
+    parser.add_argument("--hub-token", default=os.environ.get("HUB_TOKEN"), help="the hub's shared secret")
+    parser.add_argument("--csv", help="write the report to this file ('-' for stdout)")
+    parser.add_argument("--sheet", help="write the report to this worksheet of the spreadsheet")
+    parser.add_argument("--pure-python", action="store_true", help="skip NumPy even when it is installed")
+    args = parser.parse_args(argv)
+    if args.sheet and args.backend not in ("sheets", "async", "fake"):
+        parser.error("--sheet needs the sheets backend")
+
+    logging.basicConfig(level="INFO", format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    backend = open_backend(args.backend, args.credentials, url=args.hub_url, token=args.hub_token)
+    backend.authenticate()
+    started = time.perf_counter()
+    rows = backend.read_shifts(args.spreadsheet, args.start, args.end)
+    schedule = None
+    if any(stored_late(row) is None for row in rows):
+        # Rows from before lateness was stored; the roster read also loads the schedule
+        backend.get_names_from_schedule(args.spreadsheet)
+        schedule = backend.schedule_index(args.spreadsheet)
+    read_at = time.perf_counter()
+    report = summarize(rows, use_numpy=False if args.pure_python else None, schedule=schedule)
+    log.info("Read %d rows in %.2fs, summarized %d operators in %.3fs",
+             len(rows), read_at - started, len(report), time.perf_counter() - read_at)
+
+    if args.sheet:
+        backend.write_table(args.spreadsheet, args.sheet, report_table(report))
+    if args.csv == "-" or not (args.csv or args.sheet):
+        write_csv(report, sys.stdout)
+    elif args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            write_csv(report, f)
+
+
+if __name__ == "__main__":
+    main()
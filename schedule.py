@@ -0,0 +1,137 @@
+import logging
+import re
+from datetime import datetime, timedelta
+
+from storage import clock_time, parse_log_time
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+AVAILABILITY_SHEET = "Operator Availability vNew"
+HEADER_ROW = 10       # Day names (Mon, Tuesday, ...) above the day columns
+FIRST_NAME_ROW = 11
+NAME_COLUMN = 2       # B
+END_MARKER = "YOUR NAME HERE"
+SHIFT_LABELS = {"1st": ("7:00", "15:00"), "2nd": ("15:00", "23:00"), "3rd": ("23:00", "7:00")}  # Cells may name a shift instead of its hours
+SHIFT_CHANGE_HOURS = (7, 15, 23)  # Where the labelled shifts start and end; "3" and "11" mean 15:00 and 23:00
+OPENING_HOUR = 6  # Other bare hours before this are PM: "8-4:30" ends at 16:30
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+CLOCK = re.compile(r"^(\d{1,2})(?::(\d{2}))?\s*(?:([ap])\.?m?\.?)?$", re.IGNORECASE)
+RANGE_SEPARATOR = re.compile(r"\s*(?:-|–|\bto\b)\s*", re.IGNORECASE)
+
+
+def roster_from_grid(values):
+    # Names in column B from row 11 up to the "YOUR NAME HERE" placeholder
+    names = []
+    for row in values[FIRST_NAME_ROW - 1:]:
+        name = row[NAME_COLUMN - 1].strip() if len(row) >= NAME_COLUMN else ""
+        if name.upper() == END_MARKER:
+            break
+        if name:
+            names.append(name)
+    return names
+
+
+def parse_clock(text):
+    # "7", "7:30", "3pm", "3:30 PM", "15:00" -> (minutes after midnight, has am/pm)
+    match = CLOCK.match(text.strip())
+    if not match:
+        return None, False
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), (match.group(3) or "").lower()
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem == "p" else 0)
+    if hour > 23 or minute > 59:
+        return None, False
+    return hour * 60 + minute, bool(meridiem)
+
+
+def shop_hours(minutes, has_meridiem):
+    # A bare hour from 1 to 11 as the shop means it: the PM hour when that
+    # is a shift change and the AM one is not, or when the AM one is before
+    # the shop opens. Hours with am/pm or past noon are taken as written.
+    hour = minutes // 60
+    if has_meridiem or not 1 <= hour <= 11 or hour in SHIFT_CHANGE_HOURS:
+        return minutes
+    if hour + 12 in SHIFT_CHANGE_HOURS or hour < OPENING_HOUR:
+        return minutes + 12 * 60
+    return minutes
+
+
+def parse_shift(cell):
+    # A grid cell as (start, end) in minutes after midnight, or None for a
+    # day off. An end past midnight is over 24 * 60. Without am/pm both ends
+    # go through shop_hours, so "7-3", "3-11" and "11-7" read as the 1st,
+    # 2nd and 3rd shifts, the way people fill in the sheet.
+    text = cell.strip().lower()
+    if text in SHIFT_LABELS:
+        text = "-".join(SHIFT_LABELS[text])
+    parts = RANGE_SEPARATOR.split(text)
+    if len(parts) != 2:
+        return None
+    (start, start_meridiem), (end, end_meridiem) = parse_clock(parts[0]), parse_clock(parts[1])
+    if start is None or end is None:
+        return None
+    start, end = shop_hours(start, start_meridiem), shop_hours(end, end_meridiem)
+    if end <= start:
+        end += 12 * 60 if not end_meridiem and end + 12 * 60 > start else 24 * 60
+    return start, end
+
+
+class ScheduleIndex:
+    # Scheduled hours per operator and weekday, built from one read of the
+    # availability grid. Lookups are a single dict access, so punches never
+    # wait on the sheet for them.
+    def __init__(self, shifts=None):
+        self.shifts = shifts or {}  # {(operator, weekday): (start, end)}
+
+    def __len__(self):
+        return len(self.shifts)
+
+    @classmethod
+    def from_grid(cls, values):
+        header = values[HEADER_ROW - 1] if len(values) >= HEADER_ROW else []
+        day_columns = {}
+        for col, cell in enumerate(header):
+            day = cell.strip().lower()[:3]
+            if col != NAME_COLUMN - 1 and day in WEEKDAYS and cell.strip().replace(".", "").isalpha():
+                day_columns[col] = WEEKDAYS.index(day)
+        shifts = {}
+        for row in values[FIRST_NAME_ROW - 1:]:
+            name = row[NAME_COLUMN - 1].strip() if len(row) >= NAME_COLUMN else ""
+            if name.upper() == END_MARKER:
+                break
+            if not name:
+                continue
+            for col, weekday in day_columns.items():
+                shift = parse_shift(row[col]) if col < len(row) and row[col] else None
+                if shift is not None:
+                    shifts[(name, weekday)] = shift
+        log.debug("Schedule index: %d shifts over %d day columns", len(shifts), len(day_columns))
+        return cls(shifts)
+
+    def shift_for(self, operator, day):
+        # (start, end) datetimes of the operator's shift on `day`, or None
+        shift = self.shifts.get((operator, day.weekday()))
+        if shift is None:
+            return None
+        midnight = datetime(day.year, day.month, day.day)
+        return midnight + timedelta(minutes=shift[0]), midnight + timedelta(minutes=shift[1])
+
+    def deviations(self, operator, time_in, time_out=None):
+        # {"late", "early_out", "overtime"} in whole minutes against the
+        # scheduled shift for the day of a dated time in; None when the
+        # operator has no shift that day or the row carries no date
+        started = parse_log_time(time_in) if "/" in (time_in or "") else None
+        shift = self.shift_for(operator, started) if started else None
+        if shift is None:
+            return None
+        start, end = shift
+        fields = {"late": max(0, int((started - start).total_seconds() // 60))}
+        if time_out:
+            out = datetime.combine(started.date(), clock_time(time_out).time())
+            if out < started:
+                out += timedelta(days=1)  # Clocked out after midnight
+            fields["early_out"] = max(0, int((end - out).total_seconds() // 60))
+            fields["overtime"] = max(0, int((out - end).total_seconds() // 60))
+        return fields
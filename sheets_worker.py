@@ -0,0 +1,85 @@
+import logging
+import queue
+import threading
+import time
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+
+class SheetsWorker(QThread):
+    # Runs Sheets calls off the GUI thread, one job at a time in submit order,
+    # so a clock out queued after a clock in always lands after it.
+    job_done = pyqtSignal(str, str, object)      # action, operator, result
+    job_failed = pyqtSignal(str, str, str)       # action, operator, error
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.jobs = queue.Queue()
+
+    def submit(self, action, operator, func, *args):
+        self.jobs.put((action, operator, func, args, time.perf_counter()))
+
+    def pending(self):
+        return self.jobs.qsize()
+
+    def stop(self):
+        # Jobs already queued still run before the thread exits
+        self.jobs.put(None)
+        self.wait()
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                action, operator, func, args, queued_at = job
+                started = time.perf_counter()
+                metrics.observe("worker_queue_wait_seconds", started - queued_at, action=action)
+                try:
+                    result = func(*args)
+                except Exception as e:
+                    log.error("%s failed for %s: %s", action, operator or "kiosk", e)
+                    metrics.inc("worker_jobs_failed_total", action=action)
+                    self.job_failed.emit(action, operator, str(e))
+                else:
+                    self.job_done.emit(action, operator, result)
+                finally:
+                    metrics.observe("worker_job_seconds", time.perf_counter() - started, action=action)
+            finally:
+                self.jobs.task_done()
+
+
+class ActiveShiftsWatcher(QObject):
+    # Long-polls a backend that can push active shift changes (the hub) and
+    # emits each new view on the GUI thread. A daemon thread, so quitting
+    # never waits on an open poll.
+    changed = pyqtSignal(object)   # active_shifts
+
+    RETRY_SECONDS = 5
+
+    def __init__(self, backend, spreadsheet_id, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        self.spreadsheet_id = spreadsheet_id
+        self.thread = threading.Thread(target=self.run, name="active-watcher", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        version = -1
+        while True:
+            try:
+                new_version, active_shifts = self.backend.wait_active(self.spreadsheet_id, version)
+            except Exception as e:
+                log.warning("Lost the active shift feed, retrying: %s", e)
+                time.sleep(self.RETRY_SECONDS)
+                continue
+            if new_version > version and new_version > 0:
+                version = new_version
+                self.changed.emit(active_shifts)
@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+import threading
+
+log = logging.getLogger(__name__)
+
+OFF = "off"
+WORKING = "working"
+AT_LUNCH = "at_lunch"
+
+# (state, punch) -> next state; anything else is not a legal punch
+TRANSITIONS = {
+    (OFF, "clock_in"): WORKING,
+    (WORKING, "lunch_start"): AT_LUNCH,
+    (AT_LUNCH, "lunch_end"): WORKING,
+    (WORKING, "clock_out"): OFF,
+    (AT_LUNCH, "clock_out"): OFF,
+}
+COMPACT_EVERY = 500  # Events appended before the log is rewritten as one snapshot
+
+
+def state_of(shift):
+    return OFF if shift is None else shift["state"]
+
+
+def shift_from_log(info):
+    # A row from active_shifts as a stored shift
+    shift = {field: info.get(field) or None for field in ("time_in", "lunch_start", "lunch_end")}
+    shift["state"] = AT_LUNCH if shift["lunch_start"] and not shift["lunch_end"] else WORKING
+    return shift
+
+
+class ShiftStore:
+    # The kiosk's view of who is on shift. Operators who are off have no
+    # entry, so lookups are one dict access. Changes are appended to a JSONL
+    # event log and fsynced; the log is compacted into a single snapshot line
+    # every COMPACT_EVERY events and on startup.
+    def __init__(self, path, compact_every=COMPACT_EVERY):
+        self.path = path
+        self.compact_every = compact_every
+        self.lock = threading.Lock()
+        self.shifts = {}
+        self.events = 0
+        self.listeners = []
+        self._load()
+        self.file = None
+        self.compact()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    log.warning("Ignoring unreadable shift event: %s", line[:80])
+                    continue
+                self._apply(event)
+
+    def _apply(self, event):
+        if "snapshot" in event:
+            self.shifts = event["snapshot"]
+        elif event["shift"] is None:
+            self.shifts.pop(event["operator"], None)
+        else:
+            self.shifts[event["operator"]] = event["shift"]
+
+    def _append(self, events):
+        for event in events:
+            self._apply(event)
+            self.file.write(json.dumps(event) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.events += len(events)
+        if self.events >= self.compact_every:
+            self._compact()
+
+    def _compact(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"snapshot": self.shifts}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self.file is not None:
+            self.file.close()
+        os.replace(temp_path, self.path)
+        directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        except OSError:
+            pass  # Not every filesystem can sync a directory
+        finally:
+            os.close(directory)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.events = 0
+
+    def compact(self):
+        with self.lock:
+            self._compact()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def subscribe(self, listener):
+        # listener(operator, shift) after every change, shift None once they
+        # are off. Called on the changing thread, outside the lock.
+        self.listeners.append(listener)
+
+    def _notify(self, events):
+        for event in events:
+            shift = event["shift"]
+            for listener in self.listeners:
+                listener(event["operator"], None if shift is None else dict(shift))
+
+    # --- Reads ---
+
+    def state(self, operator_name):
+        with self.lock:
+            return state_of(self.shifts.get(operator_name))
+
+    def current(self):
+        # {operator: shift} for everyone on shift, state included
+        with self.lock:
+            return {operator: dict(shift) for operator, shift in self.shifts.items()}
+
+    def active(self):
+        # {operator: {'row', 'time_in', 'lunch_start', 'lunch_end'}}, the same
+        # shape the storage backends' active_shifts returns
+        with self.lock:
+            return {
+                operator: {'row': None, 'time_in': shift["time_in"], 'lunch_start': shift["lunch_start"],
+                           'lunch_end': shift["lunch_end"]}
+                for operator, shift in self.shifts.items()
+            }
+
+    # --- Changes ---
+
+    def punch(self, action, operator_name, time):
+        # Returns the new state, or None when the punch is not legal from
+        # the current one (e.g. a lunch start while off)
+        with self.lock:
+            shift = self.shifts.get(operator_name)
+            next_state = TRANSITIONS.get((state_of(shift), action))
+            if next_state is None:
+                return None
+            if action == "clock_in":
+                shift = {"state": next_state, "time_in": time, "lunch_start": None, "lunch_end": None}
+            elif action == "clock_out":
+                shift = None
+            else:
+                shift = dict(shift, state=next_state, **{action: time})
+            events = [{"operator": operator_name, "shift": shift}]
+            self._append(events)
+        self._notify(events)
+        return next_state
+
+    def reconcile(self, active_shifts):
+        # Adopt what the log says is open today, e.g. punches from another
+        # kiosk or shifts left open yesterday. Only differences are logged.
+        with self.lock:
+            events = []
+            for operator, shift in self.shifts.items():
+                if operator not in active_shifts:
+                    events.append({"operator": operator, "shift": None})
+            for operator, info in active_shifts.items():
+                shift = shift_from_log(info)
+                if self.shifts.get(operator) != shift:
+                    events.append({"operator": operator, "shift": shift})
+            if events:
+                self._append(events)
+        self._notify(events)
+        return len(events)
+
+    def migrate_states(self, states):
+        # Import the old shift_states.json ({operator: "working"/"at_lunch"/...}).
+        # It held no times, so those are left for the next reconcile to fill in.
+        with self.lock:
+            events = []
+            for operator, state in states.items():
+                if state in (WORKING, AT_LUNCH) and operator not in self.shifts:
+                    events.append({"operator": operator,
+                                   "shift": {"state": state, "time_in": None, "lunch_start": None, "lunch_end": None}})
+            if events:
+                self._append(events)
+        self._notify(events)
+        return len(events)
@@ -1,21 +1,59 @@
+import time
+STARTED_AT = time.perf_counter()  # Taken before the Qt imports for --profile-startup
+
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox, QGridLayout, QApplication,
     QMessageBox, QHBoxLayout, QStackedWidget, QSpacerItem, QSizePolicy, QCompleter
 )
-from PyQt5.QtCore import Qt, QTimer, QTime
-from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt, QTimer, QTime, QStringListModel
 import json
+import logging
 import os
-from datetime import datetime
-
-from googleAccess import GoogleDriveHandler
+from datetime import datetime, timedelta
+
+import metrics
+from kiosk_style import apply_style, font
+from ui_profiler import UIProfiler
+from storage import TIME_FORMAT, open_backend, overlay_punch, last_sweep_boundary
+from journal import PunchJournal, JournalReplayer
+from name_search import NameIndex
+from snapshot import load_snapshot, save_snapshot
+from shift_store import ShiftStore, OFF, WORKING, AT_LUNCH
+from sheets_worker import SheetsWorker, ActiveShiftsWatcher
+from badge_reader import BadgeReader, load_badges
+from dashboard import ActiveShiftsModel, ActiveShiftsDashboard
 
 # --- CONFIGURATION ---
 SERVICE_ACCOUNT_PATH = "gsheet-credentials.json"
+STORAGE_BACKEND = "sheets"  # "sheets", "async" (Sheets, many sites per process), "sqlite" (local kiosk.db), "hub" (HUB_URL) or "fake" (in-memory, for demos)
+HUB_URL = "http://localhost:8765"  # Only used with STORAGE_BACKEND = "hub"; see hub.py
+HUB_TOKEN = os.environ.get("HUB_TOKEN")  # The hub's shared secret, needed once it serves other machines
 SPREADSHEET_ID = "1Nw9K1pKDbNihWuVhc-nhx7SjWnqKfNpXXSjt7OVOZtE"
-TIME_FORMAT = "%m/%d/%Y %H:%M:%S"
 PIN_FILE = "pins.json"
-SHIFT_STATE_FILE = "shift_states.json"
+BADGE_FILE = "badges.json"  # {badge or barcode: operator name}
+SHIFT_STATE_FILE = "shift_states.json"  # Old per-operator states, migrated once into SHIFT_STORE_FILE
+SHIFT_STORE_FILE = "shift_events.jsonl"
+JOURNAL_FILE = "punch_journal.jsonl"
+SNAPSHOT_FILE = "kiosk_snapshot.json"  # Roster to start from before the sheet answers
+JOURNAL_RETRY_MS = 30000  # How often to retry sending punches while offline
+ARCHIVE_PERIOD = None  # "week" or "month" on one kiosk per sheet, or leave it to the hub; archiving deletes log rows
+ARCHIVE_CHECK_MS = 30 * 60 * 1000
+SWEEP_POLICY = "close"  # Forgotten clock-outs: "close" at shift end, "flag" for review, or None when another kiosk or the hub sweeps
+SWEEP_HOURS = (14, 21)  # Hours the shifts end: rows are judged stale by them and swept an hour (storage.SWEEP_GRACE) later
+SWEEP_CHECK_MS = 60 * 1000
+LOG_LEVEL = "INFO"  # "DEBUG" adds per-row update and total time details
+METRICS_PORT = None  # e.g. 9108 to serve http://127.0.0.1:9108/metrics
+UI_HEARTBEAT_MS = 100  # How often to check the UI thread is responsive
+ROSTER_REFRESH_MS = 5 * 60 * 1000  # How often to look for roster changes on the schedule sheet
+ACTIVE_REFRESH_MS = 2 * 60 * 1000  # How often to pick up punches made at other kiosks
+NAME_SEARCH_DEBOUNCE_MS = 40  # Wait for a pause in typing before searching
+NAME_SUGGESTIONS = 8
+RUSH_MODE = "auto"  # "auto" during RUSH_WINDOWS, "on" or "off"
+RUSH_WINDOWS = [("06:45", "07:15"), ("14:45", "15:15")]  # A badge scan punches in one step
+RUSH_MESSAGE_MS = 2000  # How long a rush punch confirmation stays up; input is never locked
+RUSH_REPEAT_SECONDS = 60  # A rush scan this soon after the same operator's last one is a double scan, not a punch
+
+log = logging.getLogger(__name__)
 
 class VirtualKeyboard(QWidget):
     def __init__(self, target_lineedit, keyboard_type="number"):
@@ -24,14 +62,6 @@ class VirtualKeyboard(QWidget):
         self.keyboard_type = keyboard_type
         layout = QGridLayout()
 
-        button_style = """
-            background-color: rgb(238, 238, 238);
-            font-size: 24px;
-            border: none;
-            border-radius: 10px;
-            padding: 10px;
-        """
-
         if self.keyboard_type == "qwerty":
             keys = [
                 ("QWERTYUIOP", 0, 0),
@@ -40,29 +70,10 @@ class VirtualKeyboard(QWidget):
             ]
             for row_keys, row, col_offset in keys:
                 for col, char in enumerate(row_keys):
-                    button = QPushButton(char)
-                    button.setFont(QFont("Monospace", 24))
-                    button.setStyleSheet(button_style)
-                    button.clicked.connect(self.button_clicked)
-                    layout.addWidget(button, row, col + col_offset)
-
-            space_button = QPushButton("Space")
-            space_button.setFont(QFont("Monospace", 24))
-            space_button.setStyleSheet(button_style)
-            space_button.clicked.connect(self.button_clicked)
-            layout.addWidget(space_button, 3, 1, 1, 4)
-
-            del_button = QPushButton("Del")
-            del_button.setFont(QFont("Monospace", 24))
-            del_button.setStyleSheet(button_style)
-            del_button.clicked.connect(self.button_clicked)
-            layout.addWidget(del_button, 3, 5)
-
-            clear_button = QPushButton("Clear")
-            clear_button.setFont(QFont("Monospace", 24))
-            clear_button.setStyleSheet(button_style)
-            clear_button.clicked.connect(self.button_clicked)
-            layout.addWidget(clear_button, 3, 6)
+                    layout.addWidget(self.key(char), row, col + col_offset)
+            layout.addWidget(self.key("Space"), 3, 1, 1, 4)
+            layout.addWidget(self.key("Del"), 3, 5)
+            layout.addWidget(self.key("Clear"), 3, 6)
 
         else:
             buttons = [
@@ -74,14 +85,19 @@ class VirtualKeyboard(QWidget):
 
             for row_idx, row in enumerate(buttons):
                 for col_idx, char in enumerate(row):
-                    button = QPushButton(char)
-                    button.setFont(QFont("Monospace", 24))
-                    button.setStyleSheet(button_style)
-                    button.clicked.connect(self.button_clicked)
-                    layout.addWidget(button, row_idx, col_idx)
+                    layout.addWidget(self.key(char), row_idx, col_idx)
 
         self.setLayout(layout)
 
+    def key(self, text):
+        # Styled by the application stylesheet; no per-button font or stylesheet.
+        # Keys never take focus, so typing leaves the cursor in the target field.
+        button = QPushButton(text)
+        button.setProperty("role", "key")
+        button.setFocusPolicy(Qt.NoFocus)
+        button.clicked.connect(self.button_clicked)
+        return button
+
     def button_clicked(self):
         sender = self.sender()
         if sender.text() == 'Del':
@@ -93,109 +109,201 @@ class VirtualKeyboard(QWidget):
         else:
             self.target_lineedit.setText(self.target_lineedit.text() + sender.text())
 
+class NameCompleter(QCompleter):
+    # Suggestions come from a NameIndex instead of QCompleter's linear
+    # MatchContains scan. The model only ever holds the current results.
+    def __init__(self, names, parent=None):
+        super().__init__(parent)
+        self.index = NameIndex(names)
+        self.results = QStringListModel(self)
+        self.setModel(self.results)
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.setMaxVisibleItems(NAME_SUGGESTIONS)
+        self.query = ""
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(NAME_SEARCH_DEBOUNCE_MS)
+        self.debounce.timeout.connect(self.run_search)
+
+    def set_names(self, names):
+        self.index.build(names)
+
+    def search_later(self, text):
+        self.query = text
+        self.debounce.start()
+
+    def run_search(self):
+        query = self.query.strip()
+        if not query or query in self.index.names:
+            self.popup().hide()
+            return
+        with metrics.timer("name_search_seconds"):
+            results = self.index.search(query, NAME_SUGGESTIONS)
+        self.results.setStringList(results)
+        if results:
+            self.complete()
+        else:
+            self.popup().hide()
+
 class SignInPage(QWidget):
-    def __init__(self, service_account_path, spreadsheet_id):
+    def __init__(self, service_account_path, spreadsheet_id, drive_handler=None, clock=datetime.now,
+                 profile_startup=False, profile_ui=False, archive_period=ARCHIVE_PERIOD):
         super().__init__()
         self.spreadsheet_id = spreadsheet_id
         self.setWindowTitle("Sign In")
-        self.drive_handler = GoogleDriveHandler(service_account_path)
-        self.drive_handler.authenticate()
-        self.operator_names = self.drive_handler.get_names_from_schedule(spreadsheet_id)
+        self.clock = clock
+        self.profile_startup = profile_startup
+        self.profiler = UIProfiler(QApplication.instance()) if profile_ui else None
+        self.startup_phases = []
+        self.drive_handler = drive_handler or open_backend(STORAGE_BACKEND, service_account_path, url=HUB_URL,
+                                                           token=HUB_TOKEN)
+        self.drive_handler.clock = clock
+        self.backend_ready = False  # Set once authenticate() has run on the worker
         self.pins = self.load_pins()
-        self.active_shifts = {}
-        self.shift_states = {}
-
+        self.badges = load_badges(BADGE_FILE)
+        self.active_user = None
+        self.punch_generation = 0
+        self.journal = PunchJournal(JOURNAL_FILE)
+        self.shifts = ShiftStore(SHIFT_STORE_FILE)
+        self.migrate_shift_states()
+        self.replayer = JournalReplayer(self.journal, self.drive_handler)
+        self.sync_queued = False
+        self.archive_period = archive_period
+        self.archived_on = None
+        self.swept_through = None
+        self.roster_version = None
+        self.roster_digest = None
+        self.roster_queued = False
+        self.pending_roster = None
+        self.dashboard = None  # Built the first time it is opened
+        self.rush_punches = {}  # operator -> (time, text) of their last rush punch
+
+        # Start from the last run's roster; the sheet is read in the background
+        started = time.perf_counter()
+        self.operator_names = self.load_snapshot()
+        self.record_startup("snapshot", time.perf_counter() - started)
+
+        self.worker = SheetsWorker(self)
+        self.worker.job_done.connect(self.on_job_done)
+        self.worker.job_failed.connect(self.on_job_failed)
+        self.worker.start()
+
+        started = time.perf_counter()
         self.init_ui()
-        self.scan_active_shifts_today()
+        built = time.perf_counter() - started
+        self.record_startup("widgets", built)
+        self.record_ui("sign_in_page", built)
+        self.start_backend()
+
+        self.sync_timer = QTimer(self)
+        self.sync_timer.timeout.connect(self.sync_journal)
+        self.sync_timer.start(JOURNAL_RETRY_MS)
+
+        self.archive_timer = QTimer(self)
+        self.archive_timer.timeout.connect(self.archive_if_due)
+        self.archive_timer.start(ARCHIVE_CHECK_MS)
+
+        self.sweep_timer = QTimer(self)
+        self.sweep_timer.timeout.connect(self.sweep_if_due)
+        self.sweep_timer.start(SWEEP_CHECK_MS)
+
+        self.active_timer = QTimer(self)
+        self.active_timer.timeout.connect(self.scan_active_shifts_today)
+        self.active_timer.start(ACTIVE_REFRESH_MS)
+
+        self.roster_timer = QTimer(self)
+        self.roster_timer.timeout.connect(self.refresh_roster)
+        self.roster_timer.start(ROSTER_REFRESH_MS)
+
+        # A heartbeat that fires late means something held the UI thread
+        self.heartbeat_at = time.perf_counter()
+        self.heartbeat = QTimer(self)
+        self.heartbeat.timeout.connect(self.measure_stall)
+        self.heartbeat.start(UI_HEARTBEAT_MS)
+        metrics.gauge("worker_queue_depth", self.worker.pending, "Jobs waiting for the Sheets worker")
+        metrics.gauge("journal_pending_punches", lambda: len(self.journal.pending_punches()),
+                      "Punches recorded but not yet in the sheet")
         QApplication.instance().focusChanged.connect(self.on_focus_changed)
 
+        self.badge_reader = BadgeReader(self)
+        self.badge_reader.scanned.connect(self.handle_badge_scan)
+        QApplication.instance().installEventFilter(self.badge_reader)
+        self.flash_timer = QTimer(self)
+        self.flash_timer.setSingleShot(True)
+        self.flash_timer.timeout.connect(lambda: self.message_label.setVisible(False))
+        QApplication.instance().aboutToQuit.connect(self.worker.stop)
+
     def init_ui(self):
+        apply_style(QApplication.instance())  # Colors and borders live in kiosk_style.STYLESHEET
         main_layout = QVBoxLayout()
-        self.setStyleSheet("background-color: rgb(248, 248, 248);")
         main_layout.setAlignment(Qt.AlignCenter)
 
         main_layout.addSpacerItem(QSpacerItem(20, 150, QSizePolicy.Minimum, QSizePolicy.Expanding))
 
-        button_style = """
-            background-color: rgb(133, 191, 157);
-            color: white;
-            font-weight: bold;
-            border: none;
-            border-radius: 10px;
-            padding: 10px;
-        """
-
-        input_style = """
-            background-color: rgb(214, 209, 199);
-            font-size: 24px;
-            border: none;
-            border-radius: 10px;
-            padding: 10px;
-        """
-
         # --- Title ---
         self.sign_in_label = QLabel("Please Sign In")
-        self.sign_in_label.setFont(QFont("Monospace", 36, QFont.Bold))
+        self.sign_in_label.setFont(font(36, bold=True))
         self.sign_in_label.setAlignment(Qt.AlignCenter)
 
         # --- Clock ---
-        self.clock_label = QLabel()
-        self.clock_label.setFont(QFont("Monospace", 64, QFont.Bold))
+        self.clock_label = QLabel("00:00:00")
+        self.clock_label.setFont(font(64, bold=True))
         self.clock_label.setAlignment(Qt.AlignCenter)
+        # Fixed size: the text changes every second, the layout never has to
+        self.clock_label.setFixedSize(self.clock_label.sizeHint())
 
-        timer = QTimer(self)
-        timer.timeout.connect(self.update_clock)
-        timer.start(1000)
+        self.clock_timer = QTimer(self)
+        self.clock_timer.timeout.connect(self.update_clock)
+        self.clock_timer.start(1000)
 
         # --- Instructions ---
         self.instructions_label = QLabel("")
-        self.instructions_label.setFont(QFont("Monospace", 24))
+        self.instructions_label.setFont(font(24))
         self.instructions_label.setAlignment(Qt.AlignCenter)
         self.instructions_label.setVisible(True)
 
         # --- Name Input ---
         self.name_label = QLabel("Select Your Name")
-        self.name_label.setFont(QFont("Monospace", 28, QFont.Bold))
+        self.name_label.setFont(font(28, bold=True))
         self.name_label.setAlignment(Qt.AlignCenter)
 
         self.name_combo = QComboBox()
         self.name_combo.setEditable(True)
         self.name_combo.setInsertPolicy(QComboBox.NoInsert)
-        self.name_combo.setStyleSheet(input_style)
+        self.name_combo.setProperty("role", "input")
         self.name_combo.setFixedWidth(1000)
         self.name_combo.setFixedHeight(100)
         self.name_combo.lineEdit().setPlaceholderText("Type your name...")
-        self.name_combo.lineEdit().setFont(QFont("Monospace", 36))
+        self.name_combo.lineEdit().setFont(font(36))
         self.name_combo.lineEdit().setAlignment(Qt.AlignCenter)
         self.name_combo.addItem("")
         self.name_combo.addItems(self.operator_names)
         self.name_combo.currentTextChanged.connect(self.check_pin_status)
 
 
-        completer = QCompleter(self.operator_names)
-        completer.setFilterMode(Qt.MatchContains)
-        completer.setCompletionMode(QCompleter.PopupCompletion)
-        self.name_combo.setCompleter(completer)
+        self.completer = NameCompleter(self.operator_names, self)
+        self.name_combo.setCompleter(self.completer)
+        self.name_combo.lineEdit().textChanged.connect(self.completer.search_later)
 
         # --- PIN Input ---
         self.pin_label = QLabel("Enter Your PIN")
-        self.pin_label.setFont(QFont("Monospace", 28, QFont.Bold))
+        self.pin_label.setFont(font(28, bold=True))
         self.pin_label.setAlignment(Qt.AlignCenter)
 
         self.pin_input = QLineEdit()
         self.pin_input.setEchoMode(QLineEdit.Password)
         self.pin_input.setPlaceholderText("Enter 4-digit PIN")
-        self.pin_input.setFont(QFont("Monospace", 24))
+        self.pin_input.setFont(font(24))
         self.pin_input.setMaxLength(4)
         self.pin_input.setMaximumWidth(400)
-        self.pin_input.setStyleSheet(input_style)
+        self.pin_input.setProperty("role", "input")
 
         # --- Sign In Button ---
         self.signin_button = QPushButton("Sign In")
-        self.signin_button.setFont(QFont("Monospace", 28))
+        self.signin_button.setFont(font(28))
         self.signin_button.setMaximumWidth(300)
         self.signin_button.setFixedHeight(70)
-        self.signin_button.setStyleSheet(button_style)
+        self.signin_button.setProperty("role", "action")
         self.signin_button.clicked.connect(self.handle_signin)
 
         # --- Shift Action Buttons ---
@@ -208,9 +316,9 @@ class SignInPage(QWidget):
         self.clock_out_button = QPushButton("Clock Out")
 
         for button in (self.clock_in_button, self.lunch_button, self.clock_out_button):
-            button.setFont(QFont("Monospace", 24))
+            button.setFont(font(24))
             button.setVisible(False)
-            button.setStyleSheet(button_style)
+            button.setProperty("role", "action")
             button.setFixedHeight(70)
             button.setMinimumWidth(250)
             self.shift_buttons_layout.addWidget(button)
@@ -221,31 +329,27 @@ class SignInPage(QWidget):
 
         # --- View Active Shifts ---
         self.view_active_button = QPushButton("Currently Clocked In")
-        self.view_active_button.setFont(QFont("Monospace", 24))
-        self.view_active_button.setStyleSheet(button_style)
+        self.view_active_button.setFont(font(24))
+        self.view_active_button.setProperty("role", "action")
         self.view_active_button.setMaximumWidth(300)
         self.view_active_button.setFixedHeight(70)
         self.view_active_button.clicked.connect(self.view_active_shifts)
 
         # --- Message Label ---
         self.message_label = QLabel("")
-        self.message_label.setFont(QFont("Monospace", 28, QFont.Bold))
+        self.message_label.setFont(font(28, bold=True))
         self.message_label.setAlignment(Qt.AlignCenter)
         self.message_label.setVisible(False)
 
         # --- Keyboards ---
+        # Space is reserved now; each keyboard is built on first focus (show_keyboard)
         self.keyboard_area = QStackedWidget()
         self.keyboard_area.setFixedHeight(400)
-
-        self.qwerty_keyboard = VirtualKeyboard(self.name_combo.lineEdit(), keyboard_type="qwerty")
-        self.number_keyboard = VirtualKeyboard(self.pin_input, keyboard_type="number")
-        self.keyboard_area.addWidget(self.qwerty_keyboard)
-        self.keyboard_area.addWidget(self.number_keyboard)
-        self.keyboard_area.setCurrentIndex(-1)
+        self.keyboards = {}
 
         # --- Layout Assembly ---
         main_layout.addWidget(self.sign_in_label)
-        main_layout.addWidget(self.clock_label)
+        main_layout.addWidget(self.clock_label, alignment=Qt.AlignCenter)
         main_layout.addWidget(self.instructions_label)
         main_layout.addSpacerItem(QSpacerItem(20, 100, QSizePolicy.Minimum, QSizePolicy.Expanding))
         main_layout.addWidget(self.name_label)
@@ -270,7 +374,23 @@ class SignInPage(QWidget):
 
     def update_clock(self):
         current_time = QTime.currentTime().toString('hh:mm:ss')
-        self.clock_label.setText(current_time)
+        if current_time != self.clock_label.text():  # A late tick must not repaint the same second
+            self.clock_label.setText(current_time)
+
+    def show_keyboard(self, keyboard_type):
+        keyboard = self.keyboards.get(keyboard_type)
+        if keyboard is None:
+            started = time.perf_counter()
+            target = self.name_combo.lineEdit() if keyboard_type == "qwerty" else self.pin_input
+            keyboard = self.keyboards[keyboard_type] = VirtualKeyboard(target, keyboard_type=keyboard_type)
+            self.keyboard_area.addWidget(keyboard)
+            self.record_ui(f"build_{keyboard_type}_keyboard", time.perf_counter() - started)
+        self.keyboard_area.setCurrentWidget(keyboard)
+
+    def record_ui(self, name, seconds):
+        metrics.observe("ui_build_seconds", seconds, widget=name)
+        if self.profiler is not None:
+            self.profiler.record(name, seconds)
 
     def load_pins(self):
         if os.path.exists(PIN_FILE):
@@ -282,44 +402,190 @@ class SignInPage(QWidget):
         with open(PIN_FILE, 'w') as f:
             json.dump(self.pins, f, indent=4)
 
-    
+    def load_snapshot(self):
+        snapshot = load_snapshot(SNAPSHOT_FILE, self.spreadsheet_id)
+        return snapshot["roster"] if snapshot else []
+
+    def save_snapshot(self):
+        save_snapshot(SNAPSHOT_FILE, self.spreadsheet_id, self.operator_names, self.clock())
+
+    def migrate_shift_states(self):
+        if not os.path.exists(SHIFT_STATE_FILE):
+            return
+        with open(SHIFT_STATE_FILE, 'r') as f:
+            migrated = self.shifts.migrate_states(json.load(f))
+        os.replace(SHIFT_STATE_FILE, SHIFT_STATE_FILE + ".migrated")
+        log.info("Migrated %d shift states from %s", migrated, SHIFT_STATE_FILE)
+
+    def record_startup(self, phase, seconds):
+        self.startup_phases.append((phase, seconds))
+        metrics.observe("startup_phase_seconds", seconds, phase=phase)
+
+    def report_startup(self):
+        if not self.profile_startup:
+            return
+        self.profile_startup = False
+        self.record_startup("until_fresh_data", time.perf_counter() - STARTED_AT)
+        print("Startup profile (seconds):")
+        for phase, seconds in self.startup_phases:
+            print(f"  {phase:<18} {seconds:8.3f}")
+
+    def start_backend(self):
+        self.worker.submit("startup", "", self.load_fresh_state, self.punch_generation)
+
+    def load_fresh_state(self, generation):
+        # Runs on the worker: auth, roster and active shifts in one job
+        timings = []
+        started = time.perf_counter()
+        self.drive_handler.authenticate()
+        timings.append(("auth", time.perf_counter() - started))
+        started = time.perf_counter()
+        roster = self.drive_handler.changed_roster(self.spreadsheet_id)
+        timings.append(("roster", time.perf_counter() - started))
+        started = time.perf_counter()
+        active_shifts = self.drive_handler.active_shifts(self.spreadsheet_id)
+        timings.append(("active_shifts", time.perf_counter() - started))
+        return generation, roster, active_shifts, timings
+
+    def refresh_roster(self):
+        if not self.backend_ready or self.roster_queued:
+            return
+        self.roster_queued = True
+        self.worker.submit("roster", "", self.drive_handler.changed_roster,
+                           self.spreadsheet_id, self.roster_version, self.roster_digest)
+
+    def apply_roster(self, roster):
+        self.roster_version, self.roster_digest, names = roster
+        if names is None:
+            return
+        log.info("Roster changed, now %d names", len(names))
+        if self.completer.popup().isVisible():
+            self.pending_roster = names  # Don't pull the list out from under someone picking a name
+            return
+        self.set_roster(names)
+        self.save_snapshot()
+
+    def set_roster(self, names):
+        # Swap the names in place without losing what the operator has typed
+        if names == self.operator_names:
+            return
+        self.operator_names = names
+        text = self.name_combo.currentText()
+        self.name_combo.blockSignals(True)
+        self.name_combo.clear()
+        self.name_combo.addItem("")
+        self.name_combo.addItems(names)
+        self.name_combo.setEditText(text)
+        self.name_combo.blockSignals(False)
+        self.completer.set_names(names)
+
+    def apply_active_shifts(self, generation, active_shifts):
+        # A punch queued after the read started makes its result stale
+        if generation != self.punch_generation:
+            return
+        self.shifts.reconcile(self.overlay_pending_punches(active_shifts))
+        if self.active_user and self.shift_buttons_container.isVisible():
+            self.show_shift_buttons(self.active_user)
+
     def scan_active_shifts_today(self):
-        self.active_shifts = {}
-        sheet = self.drive_handler.get_log_sheet(self.spreadsheet_id)
-        data = sheet.get_all_values()
-
-        today_str = datetime.now().strftime("%m/%d/%Y")
-
-        for idx, row in enumerate(data[1:], start=2):
-            operator = row[0]
-            time_in = row[2]  # Assume time in column
-            time_out = row[3]
-
-            if operator and time_in and not time_out:
-                # Try parsing
-                try:
-                    if "/" in time_in:
-                        # full date and time format
-                        time_in_datetime = datetime.strptime(time_in, TIME_FORMAT)
-                        if time_in_datetime.strftime("%m/%d/%Y") != today_str:
-                            continue  # Skip if not today
-                    else:
-                        # Only time, assume it's today (legacy behavior)
-                        pass
-                except Exception as e:
-                    print(f"Skipping bad time_in format for row {idx}: {time_in} ({e})")
-                    continue
-
-                self.active_shifts[operator] = {
-                    'row': idx,
-                    'time_in': time_in,
-                    'lunch_start': row[4] if len(row) > 4 and row[4] else None,
-                    'lunch_end': row[5] if len(row) > 5 and row[5] else None
-                }
+        # The scan runs on the worker; the result is applied in on_job_done
+        if not self.backend_ready:
+            return
+        self.worker.submit("scan", "", self.read_active_shifts, self.punch_generation)
+
+    def read_active_shifts(self, generation):
+        active_shifts = self.drive_handler.active_shifts(self.spreadsheet_id)
+        return generation, active_shifts
+
+    def overlay_pending_punches(self, active_shifts):
+        # Punches still waiting in the journal are not in the sheet yet
+        for punch in self.journal.pending_punches():
+            if punch["spreadsheet_id"] == self.spreadsheet_id:
+                overlay_punch(active_shifts, punch)
+        return active_shifts
+
+    def on_job_done(self, action, operator, result):
+        if action == "startup":
+            generation, roster, active_shifts, timings = result
+            for phase, seconds in timings:
+                self.record_startup(phase, seconds)
+            self.backend_ready = True
+            self.apply_roster(roster)
+            self.apply_active_shifts(generation, active_shifts)
+            if hasattr(self.drive_handler, "wait_active"):
+                # The hub pushes changes, so other kiosks' punches show up at once
+                self.watcher = ActiveShiftsWatcher(self.drive_handler, self.spreadsheet_id, self)
+                self.watcher.changed.connect(lambda shifts: self.apply_active_shifts(self.punch_generation, shifts))
+                self.watcher.start()
+            self.report_startup()
+            self.sync_journal()
+        elif action == "roster":
+            self.roster_queued = False
+            self.apply_roster(result)
+        elif action == "sync":
+            self.sync_queued = False
+            self.sync_journal()  # pick up punches recorded while this drain finished
+        elif action == "sweep":
+            if result:
+                self.scan_active_shifts_today()
+        elif action == "scan":
+            generation, active_shifts = result
+            self.apply_active_shifts(generation, active_shifts)
+
+    def on_job_failed(self, action, operator, error):
+        if action == "startup":
+            # Keep running on the snapshot and try the sheet again later
+            log.warning("Could not reach the sheet at startup, running from the snapshot: %s", error)
+            self.report_startup()
+            QTimer.singleShot(JOURNAL_RETRY_MS, self.start_backend)
+        elif action == "roster":
+            self.roster_queued = False  # The timer tries again
+        elif action == "sync":
+            # Punches stay in the journal; the retry timer sends them later
+            self.sync_queued = False
+            log.warning("%d punches waiting to be sent", len(self.journal.pending_punches()))
+        elif action == "sweep":
+            self.swept_through = None  # The timer tries again
+
+    def measure_stall(self):
+        now = time.perf_counter()
+        stall = max(0.0, now - self.heartbeat_at - UI_HEARTBEAT_MS / 1000)
+        metrics.observe("ui_stall_seconds", stall)
+        if self.profiler is not None:
+            self.profiler.record("event_loop_lag", stall)
+        self.heartbeat_at = now
+
+    def archive_if_due(self):
+        # Once a night, outside the shift windows, move old closed shifts out of "log"
+        today = self.clock().date()
+        if not self.backend_ready or not self.archive_period or self.is_in_shift_window() or self.archived_on == today:
+            return
+        self.archived_on = today
+        self.worker.submit("archive", "", self.drive_handler.archive_closed_shifts, self.spreadsheet_id,
+                           self.archive_period)
+
+    def sweep_if_due(self):
+        # Once per shift end, an hour after it, close (or flag) the rows of
+        # operators who forgot to clock out. Only the sweep timer calls this:
+        # the sweep re-reads the whole log, which a punch must never wait on.
+        boundary = last_sweep_boundary(self.clock(), SWEEP_HOURS)
+        if not self.backend_ready or not SWEEP_POLICY or self.swept_through == boundary:
+            return
+        if self.journal.pending_punches(1):
+            return  # A clock-out still in the journal must land before its row is swept
+        self.swept_through = boundary
+        self.worker.submit("sweep", "", lambda: self.drive_handler.close_stale_shifts(
+            self.spreadsheet_id, SWEEP_POLICY, ends=SWEEP_HOURS))
+
+    def sync_journal(self):
+        if not self.backend_ready or self.sync_queued or not self.journal.pending_punches(1):
+            return
+        self.sync_queued = True
+        self.worker.submit("sync", "", self.replayer.drain)
 
 
     def is_in_shift_window(self):
-        now = datetime.now()
+        now = self.clock()
         hour = now.hour
 
         if 6 <= hour < 14:  # First shift window 6:00am-1:59pm
@@ -334,9 +600,9 @@ class SignInPage(QWidget):
         if new_widget is None:
             return
         if new_widget == self.name_combo or new_widget == self.name_combo.lineEdit():
-            self.keyboard_area.setCurrentWidget(self.qwerty_keyboard)
+            self.show_keyboard("qwerty")
         elif new_widget == self.pin_input:
-            self.keyboard_area.setCurrentWidget(self.number_keyboard)
+            self.show_keyboard("number")
 
 
     def check_pin_status(self, name):
@@ -352,6 +618,7 @@ class SignInPage(QWidget):
             self.instructions_label.setText("")
             self.signin_button.setText("Sign In")
             
+    @metrics.timed("ui_handler_seconds", handler="sign_in")
     def handle_signin(self):
         name = self.name_combo.currentText().strip()  # ✅ fix: pull name properly
         pin = self.pin_input.text().strip()
@@ -371,89 +638,132 @@ class SignInPage(QWidget):
             return
 
         if self.pins[name] == pin:
-            self.signin_button.setVisible(False)
-            self.instructions_label.setText("Press Clock In to log your time")
-            self.active_user = name
-            
-            if not self.is_in_shift_window():
-                QMessageBox.warning(self, "Error", "Not within allowed clock-in hours.")
-                return
-            
-            self.load_shift_state()
-            self.scan_active_shifts_today()
+            self.begin_session(name)
+        else:
+            QMessageBox.warning(self, "Error", "Incorrect PIN.")
 
-            if name in self.active_shifts:
-                self.clock_in_button.setVisible(False)
-                self.lunch_button.setVisible(True)
-                self.clock_out_button.setVisible(True)
-            else:
-                self.clock_in_button.setVisible(True)
-                self.lunch_button.setVisible(False)
-                self.clock_out_button.setVisible(False)
+    def begin_session(self, name):
+        self.signin_button.setVisible(False)
+        self.instructions_label.setText("Press Clock In to log your time")
+        self.active_user = name
+
+        if not self.is_in_shift_window() and self.shifts.state(name) == OFF:
+            # Only clocking in is bound to the windows; a shift that runs
+            # past them can still take lunch and clock out
+            QMessageBox.warning(self, "Error", "Not within allowed clock-in hours.")
+            return
 
-            self.shift_buttons_container.setVisible(True)
+        self.show_shift_buttons(name)
+        self.shift_buttons_container.setVisible(True)
+
+    def in_rush(self):
+        if RUSH_MODE != "auto":
+            return RUSH_MODE == "on"
+        now = self.clock().strftime("%H:%M")
+        return any(start <= now < end for start, end in RUSH_WINDOWS)
+
+    @metrics.timed("ui_handler_seconds", handler="badge")
+    def handle_badge_scan(self, code):
+        # The scanner typed into whatever had focus before its Enter
+        self.name_combo.setEditText("")
+        self.pin_input.clear()
+        name = self.badges.get(code.strip())
+        if name is None:
+            metrics.inc("badge_scans_total", result="unknown")
+            self.flash_message("Badge not recognized, please sign in with your name")
+            return
+        if not self.in_rush():
+            # A badge stands in for name and PIN; the buttons work as usual
+            metrics.inc("badge_scans_total", result="sign_in")
+            self.begin_session(name)
+            return
+        if not self.is_in_shift_window() and self.shifts.state(name) == OFF:
+            self.flash_message("Not within allowed clock-in hours.")
+            return
+
+        # Rush: punch straight away and be ready for the next scan. The
+        # journal and worker batch the writes behind the scenes.
+        now = self.clock()
+        last = self.rush_punches.get(name)
+        if last is not None and timedelta(0) <= now - last[0] < timedelta(seconds=RUSH_REPEAT_SECONDS):
+            # The scan toggles, so a second pass of the badge would undo the first
+            metrics.inc("badge_scans_total", result="repeat")
+            self.flash_message(f"Already done: {last[1]}")
+            return
+        self.active_user = name
+        if self.shifts.state(name) == OFF:
+            punched = self.submit_punch("clock_in", now.strftime(TIME_FORMAT))
+            text = f"{name} clocked in at {now.strftime('%H:%M')}"
         else:
-            QMessageBox.warning(self, "Error", "Incorrect PIN.")
+            punched = self.submit_punch("clock_out", now.strftime("%H:%M:%S"))
+            text = f"{name} clocked out at {now.strftime('%H:%M')}"
+        self.active_user = None
+        metrics.inc("badge_scans_total", result="punch" if punched else "rejected")
+        if punched:
+            self.rush_punches[name] = (now, text)
+            log.info("%s", text)
+        self.flash_message(text if punched else f"Could not punch {name}, please sign in")
+
+    def flash_message(self, text):
+        # Like show_message, but leaves every input live
+        self.shift_buttons_container.setVisible(False)
+        self.signin_button.setVisible(True)
+        self.message_label.setText(text)
+        self.message_label.setVisible(True)
+        self.flash_timer.start(RUSH_MESSAGE_MS)
+
+    def show_shift_buttons(self, name):
+        state = self.shifts.state(name)
+        self.clock_in_button.setVisible(state == OFF)
+        self.lunch_button.setVisible(state != OFF)
+        self.lunch_button.setText("End Lunch" if state == AT_LUNCH else "Start Lunch")
+        self.clock_out_button.setVisible(state != OFF)
+
+    def submit_punch(self, action, now_time):
+        # The state change and journal write are local and fsynced; the sheet
+        # catches up in the background. False if the punch is not legal now.
+        if self.shifts.punch(action, self.active_user, now_time) is None:
+            log.warning("Ignoring %s for %s, who is %s", action, self.active_user, self.shifts.state(self.active_user))
+            return False
+        self.punch_generation += 1
+        self.journal.record(self.spreadsheet_id, action, self.active_user, now_time)
+        self.sync_journal()
+        return True
 
+    @metrics.timed("ui_handler_seconds", handler="shift")
     def update_shift_state(self, action):
-        now_time = datetime.now().strftime("%H:%M:%S")
+        now = self.clock()
+        now_time = now.strftime("%H:%M:%S")
 
         if action == "clock_in":
-            print(f"[ACTION] {self.active_user} clocked in at {now_time}")
-            self.drive_handler.save_clock_in(self.spreadsheet_id, self.active_user, now_time)
-            self.scan_active_shifts_today()
+            # Time in carries the date so scans can tell today's rows apart
+            if not self.submit_punch("clock_in", now.strftime(TIME_FORMAT)):
+                self.show_shift_buttons(self.active_user)
+                return
+            log.info("%s clocked in at %s", self.active_user, now_time)
 
         elif action == "clock_out":
-            print(f"[ACTION] {self.active_user} clocked out at {now_time}")
-            self.finish_lunch_if_needed(now_time)
-            self.drive_handler.save_clock_out(self.spreadsheet_id, self.active_user, now_time)
-            self.drive_handler.finalize_shift(self.spreadsheet_id, self.active_user)
-            if self.active_user in self.active_shifts:
-                del self.active_shifts[self.active_user]
-            self.scan_active_shifts_today()
+            if not self.submit_punch("clock_out", now_time):
+                self.show_shift_buttons(self.active_user)
+                return
+            log.info("%s clocked out at %s", self.active_user, now_time)
 
         self.shift_buttons_container.setVisible(False)
         self.show_message("Thank you! See you soon!")
 
+    @metrics.timed("ui_handler_seconds", handler="lunch")
     def handle_lunch_button(self):
-        user_state = self.shift_states.get(self.active_user, "needs_clock_in")
-        now_time = QTime.currentTime().toString('hh:mm:ss')
+        user_state = self.shifts.state(self.active_user)
+        now_time = self.clock().strftime("%H:%M:%S")
 
-        if user_state == "working":
-            print(f"[ACTION] {self.active_user} started lunch at {now_time}")
-            self.shift_states[self.active_user] = "at_lunch"
-            self.drive_handler.save_lunch_start(self.spreadsheet_id, self.active_user, now_time)
+        if user_state == WORKING and self.submit_punch("lunch_start", now_time):
+            log.info("%s started lunch at %s", self.active_user, now_time)
             self.show_message("Enjoy your lunch!")
 
-        elif user_state == "at_lunch":
-            print(f"[ACTION] {self.active_user} ended lunch at {now_time}")
-            self.shift_states[self.active_user] = "working"
-            self.drive_handler.save_lunch_end(self.spreadsheet_id, self.active_user, now_time)
+        elif user_state == AT_LUNCH and self.submit_punch("lunch_end", now_time):
+            log.info("%s ended lunch at %s", self.active_user, now_time)
             self.show_message("Back to work!")
 
-        self.save_shift_states()
-
-    def finish_lunch_if_needed(self, now_time):
-        sheet = self.drive_handler.get_log_sheet(self.spreadsheet_id)
-        row = self.drive_handler.find_or_create_operator_log_row(self.spreadsheet_id, self.active_user)
-        lunch_start = sheet.cell(row, 5).value
-        lunch_end = sheet.cell(row, 6).value
-
-        if lunch_start and not lunch_end:
-            print(f"[ACTION] {self.active_user} auto-ended lunch at {now_time}")
-            self.drive_handler.save_lunch_end(self.spreadsheet_id, self.active_user, now_time)
-
-    def load_shift_state(self):
-        if os.path.exists(SHIFT_STATE_FILE):
-            with open(SHIFT_STATE_FILE, 'r') as f:
-                self.shift_states = json.load(f)
-        else:
-            self.shift_states = {}
-
-    def save_shift_states(self):
-        with open(SHIFT_STATE_FILE, 'w') as f:
-            json.dump(self.shift_states, f, indent=4)
-
     def show_message(self, text):
         self.name_combo.setEnabled(False)
         self.pin_input.setEnabled(False)
@@ -472,25 +782,47 @@ class SignInPage(QWidget):
         self.pin_input.clear()
         self.shift_buttons_container.setVisible(False)
         self.keyboard_area.setCurrentIndex(-1)
+        if self.pending_roster is not None:
+            self.set_roster(self.pending_roster)
+            self.pending_roster = None
+            self.save_snapshot()
 
     def view_active_shifts(self):
-        self.scan_active_shifts_today()
-        if not self.active_shifts:
-            QMessageBox.information(self, "Currently Clocked In", "No operators are currently clocked in.")
-            return
-
-        message = "Current Shift Status:\n\n"
-        for operator, info in self.active_shifts.items():
-            message += f"{operator}\n"
-            message += f"- Time In: {info['time_in']}\n"
-            message += f"- Lunch Start: {info['lunch_start'] or 'None'}\n"
-            message += f"- Lunch End: {info['lunch_end'] or 'None'}\n\n"
-
-        QMessageBox.information(self, "Currently Clocked In", message)
+        # Shown straight from the shift store, which punches and background
+        # syncs keep current; opening it makes no Sheets calls
+        if self.dashboard is None:
+            started = time.perf_counter()
+            model = ActiveShiftsModel(self.shifts, self.clock, self.late_minutes, self)
+            self.dashboard = ActiveShiftsDashboard(model, self)
+            self.record_ui("build_dashboard", time.perf_counter() - started)
+        self.dashboard.showFullScreen()
+
+    def late_minutes(self, operator, time_in):
+        # From the cached schedule index when the backend has one, else the fixed starts
+        schedule = self.drive_handler.schedule_index(self.spreadsheet_id)
+        deviations = schedule.deviations(operator, time_in) if schedule is not None else None
+        return deviations["late"] if deviations else self.drive_handler.calculate_late(time_in)
 
 if __name__ == "__main__":
+    import argparse
     import sys
-    app = QApplication(sys.argv)
-    window = SignInPage(SERVICE_ACCOUNT_PATH, SPREADSHEET_ID)
+    parser = argparse.ArgumentParser(description="Shop floor sign-in kiosk")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long imports, auth, fetches and widgets took at startup")
+    parser.add_argument("--profile-ui", action="store_true",
+                        help="log widget build times, input latency and event loop lag, with a summary at exit")
+    parser.add_argument("--archive-period", choices=["week", "month"], default=ARCHIVE_PERIOD,
+                        help="make this kiosk the one that rolls old shifts into archive tabs; one kiosk per sheet")
+    args, qt_args = parser.parse_known_args()
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if METRICS_PORT:
+        metrics.MetricsServer(METRICS_PORT).start()
+    app = QApplication(sys.argv[:1] + qt_args)
+    imported = time.perf_counter() - STARTED_AT
+    window = SignInPage(SERVICE_ACCOUNT_PATH, SPREADSHEET_ID, profile_startup=args.profile_startup,
+                        profile_ui=args.profile_ui, archive_period=args.archive_period)
+    window.record_startup("import", imported)
     window.show()
+    shown_at = time.perf_counter()
+    QTimer.singleShot(0, lambda: window.record_startup("first_paint", time.perf_counter() - shown_at))
     sys.exit(app.exec_())
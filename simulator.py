@@ -0,0 +1,335 @@
+import argparse
+import heapq
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication, QMessageBox
+
+import fake_sheets
+import signin
+from benchmark import BenchClock, wait_idle
+from fake_sheets import FakeClient, RequestRecorder, WEEKDAY_HEADER
+from googleAccess import GoogleDriveHandler
+from quota import QuotaGovernor
+from schedule import SHIFT_CHANGE_HOURS, SHIFT_LABELS
+from shift_store import TRANSITIONS
+from ui_profiler import percentile
+
+# Soak test: N SignInPages share one fake spreadsheet and replay weeks of
+# punch traffic on a simulated clock. Punches pile up at the shift changes,
+# most operators take lunch, a few come in hours late or forget to clock out
+# and are left to the sweeper. The kiosks' periodic jobs (journal sync,
+# active scans, roster checks, archiving, sweeps) run on simulated time
+# instead of their QTimers, so three weeks take minutes. Prints one line per
+# simulated day with punch latency, Sheets calls, log rows and kiosk memory.
+#
+#   python simulator.py --kiosks 3 --operators 80 --days 21
+
+SPREADSHEET_ID = "soak"
+START = datetime(2026, 10, 12)  # A Monday; three weeks cross a month end, so archiving runs too
+SHIFTS = ["1st", "2nd"]  # The shop's shifts, written into the schedule by label
+WORKDAYS = WEEKDAY_HEADER[:5]
+ATTENDANCE = 0.95
+SKIP_LUNCH = 0.1
+FORGET_CLOCK_OUT = 0.03
+LATE_ARRIVAL = 0.03  # Between one and six hours late, so some clock-ins land near the window's close
+ARRIVAL_SPREAD_MIN = 6    # Standard deviation around the shift start
+DEPARTURE_SPREAD_MIN = 8
+LUNCH_AFTER_HOURS = 4
+LUNCH_MINUTES = 30
+ARCHIVE_PERIOD = "month"  # Kiosk 0 archives, as one kiosk per sheet should
+
+# (signin constant, page method) driven by the simulated clock
+PERIODIC_JOBS = [
+    ("JOURNAL_RETRY_MS", "sync_journal"),
+    ("ACTIVE_REFRESH_MS", "scan_active_shifts_today"),
+    ("ROSTER_REFRESH_MS", "refresh_roster"),
+    ("ARCHIVE_CHECK_MS", "archive_if_due"),
+    ("SWEEP_CHECK_MS", "sweep_if_due"),
+]
+KIOSK_FILES = ["JOURNAL_FILE", "SHIFT_STORE_FILE", "SHIFT_STATE_FILE", "SNAPSHOT_FILE", "PIN_FILE", "BADGE_FILE"]
+
+
+def at(day, clock):
+    hour, minute = clock.split(":")
+    return day.replace(hour=int(hour), minute=int(minute), second=0, microsecond=0)
+
+
+def day_traffic(day, roster, rng):
+    # [(when, operator, action)] for one day. Half the roster works each
+    # shift; the kiosk turns away clock-ins outside its windows, as it
+    # would on the real floor.
+    if day.strftime("%a") not in WORKDAYS:
+        return []
+    punches = []
+    for number, operator in enumerate(roster):
+        if rng.random() > ATTENDANCE:
+            continue
+        start, end = (at(day, clock) for clock in SHIFT_LABELS[SHIFTS[number % len(SHIFTS)]])
+        clock_in = start + timedelta(minutes=rng.gauss(0, ARRIVAL_SPREAD_MIN))
+        if rng.random() < LATE_ARRIVAL:
+            clock_in = start + timedelta(hours=rng.uniform(1, 6))
+        punches.append((clock_in, operator, "clock_in"))
+        lunch = max(start, clock_in) + timedelta(hours=LUNCH_AFTER_HOURS, minutes=rng.gauss(0, 15))
+        if rng.random() > SKIP_LUNCH and lunch < end - timedelta(hours=1):
+            punches.append((lunch, operator, "lunch_start"))
+            punches.append((lunch + timedelta(minutes=rng.gauss(LUNCH_MINUTES, 4)), operator, "lunch_end"))
+        if rng.random() > FORGET_CLOCK_OUT:
+            punches.append((end + timedelta(minutes=rng.gauss(0, DEPARTURE_SPREAD_MIN)), operator, "clock_out"))
+    return punches
+
+
+def kiosk_page(index, workdir, handler, clock):
+    # Each kiosk keeps its own journal and shift store, as on separate machines
+    directory = os.path.join(workdir, f"kiosk-{index}")
+    os.makedirs(directory)
+    saved = {name: getattr(signin, name) for name in KIOSK_FILES}
+    try:
+        for name in KIOSK_FILES:
+            setattr(signin, name, os.path.join(directory, saved[name]))
+        page = signin.SignInPage("unused", SPREADSHEET_ID, drive_handler=handler, clock=clock)
+    finally:
+        for name, value in saved.items():
+            setattr(signin, name, value)
+    for timer in (page.sync_timer, page.archive_timer, page.sweep_timer, page.active_timer, page.roster_timer):
+        timer.stop()  # Driven on simulated time instead
+    return page, directory
+
+
+def kiosk_memory(snapshot):
+    # Python heap held by the kiosk code: the fakes play the Sheets servers
+    # and this file is the harness, so neither counts
+    ignore = [tracemalloc.Filter(False, fake_sheets.__file__), tracemalloc.Filter(False, __file__),
+              tracemalloc.Filter(False, tracemalloc.__file__)]
+    return snapshot.filter_traces(ignore)
+
+
+def directory_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+class Simulation:
+    def __init__(self, app, workdir, kiosks, operators, latency=0.0, seed=0):
+        self.app = app
+        self.rng = random.Random(seed)
+        self.roster = [f"Operator {i:03d}" for i in range(operators)]
+        schedule = {}
+        for number, operator in enumerate(self.roster):
+            schedule[operator] = {day: SHIFTS[number % len(SHIFTS)] for day in WORKDAYS}
+        # The kiosks sweep by the shop's shift ends for as long as this runs
+        self.sweep_hours = signin.SWEEP_HOURS
+        signin.SWEEP_HOURS = SHIFT_CHANGE_HOURS[1:]
+        self.recorder = RequestRecorder(latency)
+        self.client = FakeClient(recorder=self.recorder)
+        self.spreadsheet = self.client.add_kiosk_spreadsheet(SPREADSHEET_ID, self.roster, schedule=schedule)
+        self.clock = BenchClock(START)
+        self.events = []  # Heap of (when, order, kind, kiosk, detail)
+        self.order = 0
+        self.kiosks = []
+        for index in range(kiosks):
+            # One handler per kiosk, as in production: its own log mirror
+            # and caches over the same spreadsheet
+            governor = QuotaGovernor(requests_per_minute=60000, burst=1000)
+            handler = GoogleDriveHandler(None, governor=governor, client=self.client)
+            page, directory = kiosk_page(index, workdir, handler, self.clock)
+            if index == 0:
+                page.archive_period = ARCHIVE_PERIOD
+            wait_idle(app, page)
+            self.kiosks.append({"page": page, "handler": handler, "directory": directory})
+            for setting, method in PERIODIC_JOBS:
+                self.schedule(START, "job", index, (method, timedelta(milliseconds=getattr(signin, setting))))
+        self.day = None
+
+    def schedule(self, when, kind, kiosk, detail):
+        self.order += 1
+        heapq.heappush(self.events, (when, self.order, kind, kiosk, detail))
+
+    def new_day(self, day):
+        # Operators walk up to whichever kiosk is nearest
+        for when, operator, action in day_traffic(day, self.roster, self.rng):
+            self.schedule(when, "punch", self.rng.randrange(len(self.kiosks)), (operator, action))
+        self.day = {"date": day.date().isoformat(), "punches": 0, "rejected": {}, "latency_ms": [],
+                    "request_mark": self.recorder.mark()}
+
+    def punch(self, kiosk, operator, action):
+        page = kiosk["page"]
+        state = page.shifts.state(operator)
+        if action == "clock_in" and not page.is_in_shift_window():
+            return "outside window"
+        if TRANSITIONS.get((state, action)) is None:
+            return f"kiosk shows {state}"  # The button for it is not on screen
+        started = time.perf_counter()
+        page.begin_session(operator)
+        if action in ("clock_in", "clock_out"):
+            page.update_shift_state(action)
+        else:
+            page.handle_lunch_button()
+        wait_idle(self.app, page)  # Until the punch is in the sheet
+        self.day["latency_ms"].append((time.perf_counter() - started) * 1000)
+        page.reset_page()
+        if page.shifts.state(operator) == state:
+            return "not recorded"
+        return None
+
+    def run_until(self, end):
+        while self.events and self.events[0][0] < end:
+            when, _, kind, index, detail = heapq.heappop(self.events)
+            self.clock.now = max(self.clock.now, when)
+            kiosk = self.kiosks[index]
+            if kind == "job":
+                method, every = detail
+                getattr(kiosk["page"], method)()
+                wait_idle(self.app, kiosk["page"])
+                self.schedule(when + every, kind, index, detail)
+            else:
+                operator, action = detail
+                self.day["punches"] += 1
+                reason = self.punch(kiosk, operator, action)
+                if reason is not None:
+                    self.day["rejected"][reason] = self.day["rejected"].get(reason, 0) + 1
+        self.clock.now = end
+
+    def sample(self, memory):
+        day = self.day
+        requests, size, methods = self.recorder.since(day.pop("request_mark"))
+        latencies = day.pop("latency_ms")
+        sheets = self.spreadsheet.sheets
+        day.update({
+            "p50_ms": percentile(latencies, 0.5) if latencies else 0.0,
+            "p95_ms": percentile(latencies, 0.95) if latencies else 0.0,
+            "max_ms": max(latencies, default=0.0),
+            "requests": requests,
+            "bytes": size,
+            "methods": methods,
+            "log_rows": len(sheets["log"].rows) - 1,
+            "archived_rows": sum(len(sheet.rows) - 1 for title, sheet in sheets.items() if title.startswith("log-")),
+            "mirror_rows": sum(len(mirror.rows) for kiosk in self.kiosks
+                               for mirror in kiosk["handler"].log_mirrors.values()),
+            "kiosk_files_kb": sum(directory_size(kiosk["directory"]) for kiosk in self.kiosks) / 1024,
+            "memory_kb": sum(stat.size for stat in memory.statistics("filename")) / 1024,
+        })
+        return day
+
+    def run(self, days):
+        results = []
+        baseline = None
+        for offset in range(days):
+            day = START + timedelta(days=offset)
+            self.new_day(day)
+            self.run_until(day + timedelta(days=1))
+            memory = kiosk_memory(tracemalloc.take_snapshot())
+            if baseline is None:
+                baseline = memory  # Growth is measured from the end of day one, after the caches fill
+            results.append(self.sample(memory))
+        return results, memory.compare_to(baseline, "lineno")
+
+    def close(self):
+        signin.SWEEP_HOURS = self.sweep_hours
+        for kiosk in self.kiosks:
+            page = kiosk["page"]
+            page.worker.stop()
+            page.journal.close()
+            page.shifts.close()
+            page.deleteLater()
+
+
+def growth_per_day(results, field):
+    # Least-squares slope over the run, so one archive night doesn't decide it
+    values = [result[field] for result in results]
+    if len(values) < 2:
+        return 0.0
+    mean_x = (len(values) - 1) / 2
+    mean_y = sum(values) / len(values)
+    spread = sum((x - mean_x) ** 2 for x in range(len(values)))
+    return sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values)) / spread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Weeks of multi-kiosk punch traffic on a simulated clock")
+    parser.add_argument("--kiosks", type=int, default=2, help="kiosks sharing the spreadsheet")
+    parser.add_argument("--operators", type=int, default=60, help="roster size, split across the shifts")
+    parser.add_argument("--days", type=int, default=21, help="simulated days, starting on a Monday")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated latency per request")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the traffic, for repeatable runs")
+    parser.add_argument("--top", type=int, default=5, help="lines of kiosk code with the most memory growth to show")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    # Dialogs would block the headless run
+    QMessageBox.information = QMessageBox.warning = lambda *a, **k: QMessageBox.Ok
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)  # Pins and snapshots stay out of the checkout
+        try:
+            simulation = Simulation(app, workdir, args.kiosks, args.operators, args.latency_ms / 1000, args.seed)
+            try:
+                results, growth = simulation.run(args.days)
+            finally:
+                simulation.close()
+        finally:
+            os.chdir(cwd)
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+
+    methods = {}
+    for result in results:
+        for name, count in result.pop("methods").items():
+            methods[name] = methods.get(name, 0) + count
+    summary = {
+        "elapsed_seconds": elapsed,
+        "punches": sum(result["punches"] for result in results),
+        "rejected": sum(sum(result["rejected"].values()) for result in results),
+        "requests": sum(result["requests"] for result in results),
+        "methods": methods,
+        "growth_per_day": {field: growth_per_day(results, field)
+                           for field in ("memory_kb", "log_rows", "mirror_rows", "kiosk_files_kb", "requests")},
+        "top_growth": [(str(stat.traceback), stat.size_diff) for stat in growth[:args.top]],
+    }
+
+    if args.json:
+        print(json.dumps({"days": results, "summary": summary}, indent=2))
+        return 0
+
+    print(f"{args.kiosks} kiosks, {args.operators} operators, {args.days} days, "
+          f"{args.latency_ms:g} ms per request, {elapsed:.0f} s")
+    print(f"{'date':<10} {'punch':>5} {'rej':>4} {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7} {'requests':>8} "
+          f"{'log rows':>8} {'archived':>8} {'mirrored':>8} {'files KB':>8} {'mem KB':>8}")
+    for result in results:
+        print(f"{result['date']:<10} {result['punches']:>5} {sum(result['rejected'].values()):>4} "
+              f"{result['p50_ms']:>7.1f} {result['p95_ms']:>7.1f} {result['max_ms']:>7.1f} {result['requests']:>8} "
+              f"{result['log_rows']:>8} {result['archived_rows']:>8} {result['mirror_rows']:>8} "
+              f"{result['kiosk_files_kb']:>8.1f} {result['memory_kb']:>8.0f}")
+
+    rejected = {}
+    for result in results:
+        for reason, count in result["rejected"].items():
+            rejected[reason] = rejected.get(reason, 0) + count
+    print(f"\n{summary['punches']} punches, {summary['rejected']} rejected, {summary['requests']} Sheets requests")
+    for reason, count in sorted(rejected.items(), key=lambda item: -item[1]):
+        print(f"  rejected, {reason}: {count}")
+    for name, count in sorted(methods.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {name:<40} {count:>8}")
+    print("Growth per simulated day:")
+    for field, slope in summary["growth_per_day"].items():
+        print(f"  {field:<16} {slope:>+10.1f}")
+    if summary["top_growth"]:
+        print("Kiosk memory growth since day one, by line:")
+        for where, size in summary["top_growth"]:
+            print(f"  {size / 1024:>+8.1f} KB  {where}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+
+def load_snapshot(path, spreadsheet_id):
+    # Roster from the last run, or None if there is no usable snapshot for
+    # this spreadsheet. Shift state lives in the ShiftStore.
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable snapshot %s: %s", path, e)
+        return None
+    if snapshot.get("spreadsheet_id") != spreadsheet_id:
+        return None
+    return snapshot
+
+
+def save_snapshot(path, spreadsheet_id, roster, saved_at):
+    # Written to a temp file and renamed so a crash never leaves half a snapshot
+    snapshot = {
+        "spreadsheet_id": spreadsheet_id,
+        "saved_at": saved_at.isoformat(timespec="seconds"),
+        "roster": roster
+    }
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        log.warning("Could not save snapshot %s: %s", path, e)
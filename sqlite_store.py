@@ -0,0 +1,291 @@
+import argparse
+import logging
+import sqlite3
+import sys
+import threading
+
+import metrics
+from storage import StorageBackend, LOG_COLUMNS, SHIFT_ENDS, SWEEP_GRACE, log_date, open_backend, same_log_time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roster (
+    spreadsheet_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (spreadsheet_id, position)
+);
+CREATE TABLE IF NOT EXISTS log (
+    id INTEGER PRIMARY KEY,
+    spreadsheet_id TEXT NOT NULL,
+    operator TEXT NOT NULL,
+    total_time TEXT NOT NULL DEFAULT '',
+    time_in TEXT NOT NULL DEFAULT '',
+    time_out TEXT NOT NULL DEFAULT '',
+    lunch_start TEXT NOT NULL DEFAULT '',
+    lunch_end TEXT NOT NULL DEFAULT '',
+    total_lunch TEXT NOT NULL DEFAULT '',
+    late TEXT NOT NULL DEFAULT '',
+    early_out TEXT NOT NULL DEFAULT '',
+    overtime TEXT NOT NULL DEFAULT '',
+    day TEXT,
+    is_open INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS log_operator_open ON log (spreadsheet_id, operator, is_open);
+CREATE INDEX IF NOT EXISTS log_day ON log (spreadsheet_id, day);
+"""
+
+log = logging.getLogger(__name__)
+
+
+@metrics.instrument("storage_call_seconds", backend="sqlite")
+class SQLiteBackend(StorageBackend):
+    # Local log store. Each punch is one short WAL transaction, and open-row
+    # and per-day lookups hit indexes instead of walking the log. The
+    # spreadsheet id only partitions the data so several sites can share a file.
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        # Files from before a log column was added get it with an empty default
+        columns = {row["name"] for row in self.db.execute("PRAGMA table_info(log)")}
+        with self.db:
+            for column in LOG_COLUMNS:
+                if column not in columns:
+                    self.db.execute(f"ALTER TABLE log ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def set_roster(self, spreadsheet_id, names):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM roster WHERE spreadsheet_id = ?", (spreadsheet_id,))
+            self.db.executemany(
+                "INSERT INTO roster (spreadsheet_id, position, name) VALUES (?, ?, ?)",
+                [(spreadsheet_id, position, name) for position, name in enumerate(names)]
+            )
+
+    def sync_roster(self, spreadsheet_id, source):
+        # Copy the roster from another backend, e.g. the Sheets availability grid
+        names = source.get_names_from_schedule(spreadsheet_id)
+        self.set_roster(spreadsheet_id, names)
+        log.info("Imported %d names for %s", len(names), spreadsheet_id)
+        return names
+
+    def get_names_from_schedule(self, spreadsheet_id):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT name FROM roster WHERE spreadsheet_id = ? ORDER BY position", (spreadsheet_id,)
+            ).fetchall()
+        return [row["name"] for row in rows]
+
+    # --- Row helpers; callers hold the lock ---
+
+    def _open_row(self, spreadsheet_id, operator_name):
+        return self.db.execute(
+            "SELECT * FROM log WHERE spreadsheet_id = ? AND operator = ? AND is_open = 1 ORDER BY id LIMIT 1",
+            (spreadsheet_id, operator_name)
+        ).fetchone()
+
+    def _current_row(self, spreadsheet_id, operator_name):
+        row = self._open_row(spreadsheet_id, operator_name)
+        if row is None:
+            row = self.db.execute(
+                "SELECT * FROM log WHERE spreadsheet_id = ? AND operator = ? ORDER BY id DESC LIMIT 1",
+                (spreadsheet_id, operator_name)
+            ).fetchone()
+        return row
+
+    def _row_for(self, spreadsheet_id, operator_name):
+        row = self._open_row(spreadsheet_id, operator_name)
+        if row is None:
+            row = self._insert(spreadsheet_id, operator_name)
+        return row
+
+    def _shift_row(self, spreadsheet_id, operator_name, time_in):
+        day = log_date(time_in)
+        rows = self.db.execute(
+            "SELECT * FROM log WHERE spreadsheet_id = ? AND operator = ? AND day = ? ORDER BY id",
+            (spreadsheet_id, operator_name, day.isoformat() if day else None)
+        ).fetchall()
+        return next((row for row in rows if same_log_time(row["time_in"], time_in)), None)
+
+    def _insert(self, spreadsheet_id, operator_name):
+        cursor = self.db.execute(
+            "INSERT INTO log (spreadsheet_id, operator) VALUES (?, ?)", (spreadsheet_id, operator_name)
+        )
+        return self.db.execute("SELECT * FROM log WHERE id = ?", (cursor.lastrowid,)).fetchone()
+
+    def _update(self, row_id, fields):
+        fields = {field: "" if value is None else str(value) for field, value in fields.items()}
+        assignments = [f"{field} = :{field}" for field in fields if field in LOG_COLUMNS]
+        if "time_in" in fields:
+            day = log_date(fields["time_in"])
+            fields["day"] = day.isoformat() if day else None
+            assignments.append("day = :day")
+        if "time_out" in fields:
+            fields["is_open"] = 0 if fields["time_out"] else 1
+            assignments.append("is_open = :is_open")
+        fields["id"] = row_id
+        self.db.execute(f"UPDATE log SET {', '.join(assignments)} WHERE id = :id", fields)
+
+    @staticmethod
+    def _values(row):
+        return {field: row[field] for field in LOG_COLUMNS}
+
+    # --- StorageBackend ---
+
+    def find_or_create_operator_log_row(self, spreadsheet_id, operator_name):
+        with self.lock, self.db:
+            return self._row_for(spreadsheet_id, operator_name)["id"]
+
+    def update_operator_fields(self, spreadsheet_id, operator_name, fields):
+        with self.lock, self.db:
+            row = self._row_for(spreadsheet_id, operator_name)
+            self._update(row["id"], fields)
+            return row["id"]
+
+    def finalize_shift(self, spreadsheet_id, operator_name):
+        with self.lock, self.db:
+            row = self._current_row(spreadsheet_id, operator_name)
+            if row is None:
+                log.warning("No log row found, cannot finalize for %s", operator_name)
+                return
+            self._update(row["id"], self.finalized_fields(self._values(row), operator_name))
+
+    def apply_punches(self, spreadsheet_id, punches):
+        written = 0
+        with self.lock, self.db:
+            for punch in punches:
+                operator_name = punch["operator"]
+                if punch.get("shift"):
+                    written += self._apply_shift_punch(spreadsheet_id, punch)
+                    continue
+                current = self._current_row(spreadsheet_id, operator_name)
+                if self.punch_applied(self._values(current) if current else None, punch):
+                    log.info("Skipping %s for %s at %s, already logged", punch["action"], operator_name, punch["time"])
+                    continue
+                if punch["action"] == "clock_in":
+                    # Rows left open by an earlier shift are flagged; the clock-in gets its own
+                    row = self._open_row(spreadsheet_id, operator_name)
+                    while row is not None and row["time_in"]:
+                        self._update(row["id"], self.superseded_fields(self._values(row), operator_name,
+                                                                       punch["time"]))
+                        row = self._open_row(spreadsheet_id, operator_name)
+                elif self._open_row(spreadsheet_id, operator_name) is None:
+                    self.log_orphan_punch(punch)
+                    continue
+                row = self._row_for(spreadsheet_id, operator_name)
+                self._update(row["id"], self.punch_fields(self._values(row), punch))
+                written += 1
+        return written
+
+    def _apply_shift_punch(self, spreadsheet_id, punch):
+        # A backfilled punch goes on the row of the shift it names, not the open one
+        row = self._shift_row(spreadsheet_id, punch["operator"], punch["shift"])
+        if punch["action"] == "clock_in":
+            if row is not None:
+                log.info("Skipping clock_in for %s at %s, already logged", punch["operator"], punch["time"])
+                return False
+            row = self._insert(spreadsheet_id, punch["operator"])
+        elif row is None:
+            self.log_orphan_punch(punch)
+            return False
+        elif self.punch_applied(self._values(row), punch):
+            log.info("Skipping %s for %s at %s, already logged", punch["action"], punch["operator"], punch["time"])
+            return False
+        self._update(row["id"], self.punch_fields(self._values(row), punch))
+        return True
+
+    def open_shifts(self, spreadsheet_id):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT * FROM log WHERE spreadsheet_id = ? AND is_open = 1 ORDER BY id DESC", (spreadsheet_id,)
+            ).fetchall()
+        # Oldest last, so it wins: that is the row _open_row picks
+        return {
+            row["operator"]: {'row': row["id"], 'time_in': row["time_in"] or None,
+                              'lunch_start': row["lunch_start"] or None, 'lunch_end': row["lunch_end"] or None}
+            for row in rows
+        }
+
+    def active_shifts(self, spreadsheet_id, today=None):
+        today = today or self.clock().date()
+        with self.lock:
+            # Time-only legacy rows count as today only after the last row
+            # dated before today, the same watermark the Sheets log uses
+            rows = self.db.execute(
+                "SELECT * FROM log WHERE spreadsheet_id = :sheet AND is_open = 1 AND time_in != ''"
+                " AND (day = :day OR (day IS NULL AND id > (SELECT COALESCE(MAX(id), 0) FROM log"
+                " WHERE spreadsheet_id = :sheet AND day < :day))) ORDER BY id",
+                {"sheet": spreadsheet_id, "day": today.isoformat()}
+            ).fetchall()
+        active_shifts = {}
+        for row in rows:
+            active_shifts[row["operator"]] = {
+                'row': row["id"],
+                'time_in': row["time_in"],
+                'lunch_start': row["lunch_start"] or None,
+                'lunch_end': row["lunch_end"] or None
+            }
+        return active_shifts
+
+    def close_stale_shifts(self, spreadsheet_id, policy="close", now=None, grace=SWEEP_GRACE, ends=SHIFT_ENDS):
+        now = now or self.clock()
+        swept = 0
+        with self.lock, self.db:
+            rows = self.db.execute(
+                "SELECT * FROM log WHERE spreadsheet_id = ? AND is_open = 1 AND day <= ? ORDER BY id",
+                (spreadsheet_id, now.date().isoformat())
+            ).fetchall()
+            for row in rows:
+                fields = self.sweep_fields(self._values(row), row["operator"], policy, now, grace, ends=ends)
+                if fields:
+                    self._update(row["id"], fields)
+                    swept += 1
+        return swept
+
+    def read_shifts(self, spreadsheet_id, start_date, end_date):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT * FROM log WHERE spreadsheet_id = ? AND day BETWEEN ? AND ? ORDER BY id",
+                (spreadsheet_id, start_date.isoformat(), end_date.isoformat())
+            ).fetchall()
+        return [[row[field] for field in LOG_COLUMNS] for row in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import the roster into a SQLite kiosk database")
+    parser.add_argument("database", nargs="?", default="kiosk.db")
+    parser.add_argument("--spreadsheet", default="1Nw9K1pKDbNihWuVhc-nhx7SjWnqKfNpXXSjt7OVOZtE")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--from-sheets", action="store_true", help="read the names from the availability sheet")
+    source.add_argument("--names-file", help="one name per line; '-' reads stdin")
+    parser.add_argument("--credentials", default="gsheet-credentials.json", help="service account file")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    backend = SQLiteBackend(args.database)
+    try:
+        if args.from_sheets:
+            sheets = open_backend("sheets", args.credentials)
+            sheets.authenticate()
+            names = backend.sync_roster(args.spreadsheet, sheets)
+        else:
+            lines = sys.stdin if args.names_file == "-" else open(args.names_file, encoding="utf-8")
+            with lines:
+                names = [line.strip() for line in lines if line.strip()]
+            backend.set_roster(args.spreadsheet, names)
+    finally:
+        backend.close()
+    print(f"{len(names)} names in the roster")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+log = logging.getLogger(__name__)
+
+TIME_FORMAT = "%m/%d/%Y %H:%M:%S"
+CLOCK_FORMAT = "%H:%M:%S"
+LOG_COLUMNS = ["operator", "total_time", "time_in", "time_out", "lunch_start", "lunch_end", "total_lunch", "late",
+               "early_out", "overtime"]
+PUNCH_FIELDS = {
+    "clock_in": "time_in",
+    "lunch_start": "lunch_start",
+    "lunch_end": "lunch_end",
+    "clock_out": "time_out"
+}
+BACKENDS = ("sheets", "async", "sqlite", "fake", "hub")
+SHIFT_ENDS = (14, 21)  # Hours the shift windows close
+SWEEP_POLICIES = ("close", "flag")
+SWEEP_GRACE = timedelta(hours=1)  # A shift counts as forgotten this long after it ends
+EARLY_CLOCK_IN = timedelta(hours=1)  # Clock-ins this close to a shift end are early arrivals for the next shift
+REVIEW_MARK = "REVIEW"  # time_out of a flagged row; takes it out of the open set without inventing a time
+
+
+def parse_log_time(value):
+    # Cells hold "HH:MM:SS" or "MM/DD/YYYY HH:MM:SS"; Sheets may drop the
+    # leading zero of the hour when it hands formatted values back.
+    value = (value or "").strip()
+    try:
+        if "/" in value:
+            return datetime.strptime(value, TIME_FORMAT)
+        return datetime.strptime(value, CLOCK_FORMAT)
+    except ValueError:
+        return None
+
+
+def log_date(value):
+    parsed = parse_log_time(value) if value and "/" in value else None
+    return parsed.date() if parsed else None
+
+
+def clock_time(value):
+    # Time of day only, on strptime's default date, for shift arithmetic
+    parsed = parse_log_time(value)
+    if parsed is None:
+        raise ValueError(f"time data {value!r} is not a log time")
+    return parsed.replace(year=1900, month=1, day=1)
+
+
+def same_log_time(a, b):
+    parsed_a, parsed_b = parse_log_time(a), parse_log_time(b)
+    if parsed_a is None or parsed_b is None:
+        return (a or "").strip() == (b or "").strip()
+    if "/" in a and "/" in b:
+        return parsed_a == parsed_b
+    return parsed_a.time() == parsed_b.time()
+
+
+def overlay_punch(active_shifts, punch):
+    # Apply a punch that is not in the log yet to an active_shifts dict
+    operator = punch["operator"]
+    if punch["action"] == "clock_in":
+        active_shifts[operator] = {'row': None, 'time_in': punch["time"], 'lunch_start': None, 'lunch_end': None}
+    elif punch["action"] == "clock_out":
+        active_shifts.pop(operator, None)
+    elif operator in active_shifts:
+        active_shifts[operator][punch["action"]] = punch["time"]
+    return active_shifts
+
+
+def shift_end(time_in, ends=SHIFT_ENDS, early=EARLY_CLOCK_IN):
+    # End of the shift a dated time in belongs to. A clock-in at 13:52 is
+    # the next shift's operator arriving early, not the first shift's
+    # starting with minutes to go. The last shift of the day has no later
+    # one to arrive early for, so it takes clock-ins right up to its end;
+    # only those after it roll over to the first shift of the next day.
+    for number, hour in enumerate(ends):
+        end = time_in.replace(hour=hour, minute=0, second=0, microsecond=0)
+        if time_in < end - (early if number < len(ends) - 1 else timedelta(0)):
+            return end
+    return (time_in + timedelta(days=1)).replace(hour=ends[0], minute=0, second=0, microsecond=0)
+
+
+def last_shift_end(now, ends=SHIFT_ENDS):
+    past = [hour for hour in ends if hour <= now.hour]
+    day = now if past else now - timedelta(days=1)
+    return day.replace(hour=max(past or ends), minute=0, second=0, microsecond=0)
+
+
+def last_sweep_boundary(now, ends=SHIFT_ENDS, grace=SWEEP_GRACE):
+    # The latest shift end whose grace period is over. Sweeping when this
+    # changes, rather than at the shift end itself, finds that shift's rows
+    # already past shift_end + grace in sweep_fields.
+    return last_shift_end(now - grace, ends)
+
+
+def roster_digest(names):
+    return hashlib.sha1("\n".join(names).encode("utf-8")).hexdigest()
+
+
+class StorageBackend:
+    # Everything SignInPage and the journal replayer need from a log store.
+    # Rows are handed around as {field: value} dicts keyed by LOG_COLUMNS.
+    # Subclasses implement the storage methods; the shift arithmetic and
+    # the punch helpers below are shared so every engine logs the same values.
+    clock = datetime.now  # Swapped out by benchmarks and simulations
+
+    def authenticate(self):
+        pass
+
+    def get_names_from_schedule(self, spreadsheet_id):
+        raise NotImplementedError
+
+    def roster_version(self, spreadsheet_id):
+        return None  # Unknown; changed_roster then compares the names themselves
+
+    def changed_roster(self, spreadsheet_id, version=None, digest=None):
+        # (version, digest, names), with names None when the roster is unchanged.
+        # A matching version skips the read; otherwise the names are read and
+        # only reported when their digest differs. The first call has nothing
+        # to compare against, so it skips the version request altogether.
+        current = self.roster_version(spreadsheet_id) if digest is not None else None
+        if current is not None and current == version:
+            return version, digest, None
+        names = self.get_names_from_schedule(spreadsheet_id)
+        new_digest = roster_digest(names)
+        return current, new_digest, names if new_digest != digest else None
+
+    def schedule_index(self, spreadsheet_id):
+        return None  # Engines that read the availability grid return a schedule.ScheduleIndex
+
+    def find_or_create_operator_log_row(self, spreadsheet_id, operator_name):
+        raise NotImplementedError
+
+    def update_operator_fields(self, spreadsheet_id, operator_name, fields):
+        raise NotImplementedError
+
+    def finalize_shift(self, spreadsheet_id, operator_name):
+        raise NotImplementedError
+
+    def active_shifts(self, spreadsheet_id, today=None):
+        raise NotImplementedError
+
+    def open_shifts(self, spreadsheet_id):
+        # Like active_shifts, but every open row whatever its day: the row
+        # each operator's next punch lands on
+        raise NotImplementedError
+
+    def apply_punches(self, spreadsheet_id, punches):
+        # Punches are {"action", "operator", "time"}. Backfilled ones also
+        # carry "shift", the dated time in of the shift they belong to, and
+        # go on that shift's row instead of the operator's open one.
+        raise NotImplementedError
+
+    def read_shifts(self, spreadsheet_id, start_date, end_date):
+        raise NotImplementedError
+
+    def archive_closed_shifts(self, spreadsheet_id, period="month", today=None):
+        return 0  # Only engines that slow down with size need to partition
+
+    def close_stale_shifts(self, spreadsheet_id, policy="close", now=None, grace=SWEEP_GRACE, ends=SHIFT_ENDS):
+        # Sweep rows left open by forgotten clock-outs in one write. Returns
+        # the number of rows closed or flagged. `ends` are the site's shift
+        # end hours, the same ones its sweeps are timed by.
+        raise NotImplementedError
+
+    def update_operator_log(self, spreadsheet_id, operator_name, field, value):
+        self.update_operator_fields(spreadsheet_id, operator_name, {field: value})
+
+    def save_clock_in(self, spreadsheet_id, operator_name, clock_in_time):
+        self.apply_punches(spreadsheet_id, [{"action": "clock_in", "operator": operator_name, "time": clock_in_time}])
+
+    def save_lunch_start(self, spreadsheet_id, operator_name, lunch_start_time):
+        self.apply_punches(spreadsheet_id, [{"action": "lunch_start", "operator": operator_name, "time": lunch_start_time}])
+
+    def save_lunch_end(self, spreadsheet_id, operator_name, lunch_end_time):
+        self.apply_punches(spreadsheet_id, [{"action": "lunch_end", "operator": operator_name, "time": lunch_end_time}])
+
+    def save_clock_out(self, spreadsheet_id, operator_name, clock_out_time):
+        self.apply_punches(spreadsheet_id, [{"action": "clock_out", "operator": operator_name, "time": clock_out_time}])
+
+    def punch_applied(self, row, punch):
+        # Idempotency check for replays: a punch is already stored when the
+        # operator's current (or last closed) row holds the same time.
+        return row is not None and same_log_time(row[PUNCH_FIELDS[punch["action"]]], punch["time"])
+
+    def punch_fields(self, row, punch, schedule=None):
+        # Field changes for one punch against the operator's row
+        if punch["action"] == "clock_out":
+            return self.closing_fields(row, punch["operator"], punch["time"], schedule)
+        fields = {PUNCH_FIELDS[punch["action"]]: punch["time"]}
+        if punch["action"] == "clock_in" and schedule is not None:
+            # Lateness is known at once; it goes out with the same write
+            fields.update(schedule.deviations(punch["operator"], punch["time"]) or {})
+        return fields
+
+    def closing_fields(self, row, operator_name, clock_out_time, schedule=None):
+        fields = {}
+        if row["lunch_start"] and not row["lunch_end"]:
+            log.info("%s auto-ended lunch at %s", operator_name, clock_out_time)
+            fields["lunch_end"] = clock_out_time
+        fields["time_out"] = clock_out_time
+        fields.update(self.finalized_fields({**row, **fields}, operator_name, schedule))
+        return fields
+
+    def finalized_fields(self, row, operator_name, schedule=None):
+        # Lateness, early out and overtime follow the operator's schedule
+        # when there is one for the day, otherwise the fixed 7:00/15:00 starts
+        if row["time_in"] and row["time_out"]:
+            total_time, lunch_duration = self.calculate_total_time(
+                row["time_in"], row["time_out"], row["lunch_start"], row["lunch_end"]
+            )
+            log.info("Finalized shift for %s", operator_name)
+            fields = {"total_time": str(total_time), "late": self.calculate_late(row["time_in"])}
+            if schedule is not None:
+                fields.update(schedule.deviations(operator_name, row["time_in"], row["time_out"]) or {})
+            return fields
+        log.warning("Incomplete shift, cannot finalize for %s", operator_name)
+        return {}
+
+    def superseded_fields(self, row, operator_name, clock_in_time):
+        # A clock-in while the operator's last row is still open: that shift's
+        # clock-out never reached the log. Nobody knows when it really ended,
+        # so the row is flagged like the "flag" sweep policy does, and the new
+        # shift goes on a row of its own instead of overwriting this one.
+        log.warning("%s clocked in at %s with the shift from %s still open; flagged it for review",
+                    operator_name, clock_in_time, row["time_in"])
+        return {"time_out": REVIEW_MARK}
+
+    def log_orphan_punch(self, punch):
+        # A lunch or clock-out with no open row to land on, e.g. a clock-out
+        # after the sweeper closed the shift. Appending it would leave a row
+        # with no time in, so it is logged and dropped instead.
+        log.warning("Dropping %s for %s at %s, no open shift to record it on",
+                    punch["action"], punch["operator"], punch["time"])
+
+    def sweep_fields(self, row, operator_name, policy, now, grace=SWEEP_GRACE, schedule=None, ends=SHIFT_ENDS):
+        # Changes that take a forgotten row out of the open set, or None while
+        # its shift is still running. Time-only legacy rows carry no date, so
+        # there is no telling when their shift ended; they are left alone.
+        time_in = parse_log_time(row["time_in"]) if "/" in (row["time_in"] or "") else None
+        if time_in is None or shift_end(time_in, ends) + grace > now:
+            return None
+        end = shift_end(time_in, ends)
+        if policy == "flag":
+            log.info("Flagged %s's shift from %s for review", operator_name, row["time_in"])
+            return {"time_out": REVIEW_MARK}
+        log.info("Auto clock-out for %s at the %s shift end", operator_name, end.strftime("%H:%M"))
+        return self.closing_fields(row, operator_name, end.strftime(CLOCK_FORMAT), schedule)
+
+    def calculate_total_time(self, time_in_str, time_out_str, lunch_start_str, lunch_end_str):
+        time_in = clock_time(time_in_str)
+        time_out = clock_time(time_out_str)
+
+        total_time = time_out - time_in
+
+        log.debug("Calculating total time: in %s, out %s, lunch %s-%s",
+                  time_in_str, time_out_str, lunch_start_str, lunch_end_str)
+
+        if lunch_start_str and lunch_end_str:
+            lunch_start = clock_time(lunch_start_str)
+            lunch_end = clock_time(lunch_end_str)
+            lunch_duration = lunch_end - lunch_start
+            total_time -= lunch_duration
+            return total_time, lunch_duration
+        return total_time, None
+
+    def calculate_late(self, time_in_str):
+        time_in = clock_time(time_in_str)
+        if time_in.hour < 15:
+            scheduled_time = time_in.replace(hour=7, minute=0, second=0)
+        else:
+            scheduled_time = time_in.replace(hour=15, minute=0, second=0)
+        late = (time_in - scheduled_time).total_seconds() / 60
+        return max(0, int(late))
+
+
+def open_backend(kind, service_account_path=None, **options):
+    # Engines are imported on demand so the SQLite one runs without gspread
+    if kind == "sheets":
+        from googleAccess import GoogleDriveHandler
+        return GoogleDriveHandler(service_account_path)
+    if kind == "async":
+        from async_sheets import AsyncSheets, ASYNC_WORKERS
+        from googleAccess import GoogleDriveHandler
+        return AsyncSheets(GoogleDriveHandler(service_account_path, pool_size=ASYNC_WORKERS)).backend()
+    if kind == "sqlite":
+        from sqlite_store import SQLiteBackend
+        return SQLiteBackend(options.get("path", "kiosk.db"))
+    if kind == "fake":
+        from fake_sheets import FakeClient
+        from googleAccess import GoogleDriveHandler
+        client = options.get("client") or FakeClient()
+        return GoogleDriveHandler(service_account_path, client=client)
+    if kind == "hub":
+        from hub import HubClient
+        return HubClient(options["url"], options.get("token"))
+    raise ValueError(f"Unknown storage backend {kind!r}, expected one of {BACKENDS}")
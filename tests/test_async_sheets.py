@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from async_sheets import AsyncSheets
+
+
+class SlowHandler:
+    # Records each call as (site, argument, start, end) and tracks how many
+    # calls for one site run at the same time
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.calls = []
+        self.running = {}
+        self.most_at_once = {}
+
+    def apply_punches(self, spreadsheet_id, punches):
+        if punches == "fail":
+            raise RuntimeError("quota exceeded")
+        with self.lock:
+            self.running[spreadsheet_id] = self.running.get(spreadsheet_id, 0) + 1
+            self.most_at_once[spreadsheet_id] = max(self.most_at_once.get(spreadsheet_id, 0),
+                                                    self.running[spreadsheet_id])
+        started = time.monotonic()
+        time.sleep(self.delay)
+        with self.lock:
+            self.running[spreadsheet_id] -= 1
+            self.calls.append((spreadsheet_id, punches, started, time.monotonic()))
+        return punches
+
+
+@pytest.fixture
+def engine():
+    handler = SlowHandler()
+    engine = AsyncSheets(handler, workers=4)
+    yield engine
+    engine.close()
+
+
+def test_calls_for_one_site_run_one_at_a_time_in_order(engine):
+    backend = engine.backend()
+    threads = []
+    for index in range(5):
+        threads.append(threading.Thread(target=backend.apply_punches, args=("a", index)))
+        threads[-1].start()
+        time.sleep(0.005)  # Queued in this order
+    for thread in threads:
+        thread.join()
+    assert engine.handler.most_at_once["a"] == 1
+    assert [punches for _, punches, _, _ in engine.handler.calls] == [0, 1, 2, 3, 4]
+
+
+def test_calls_for_different_sites_overlap(engine):
+    results = engine.backend().run_all("apply_punches", ["a", "b", "c"], 1)
+    assert results == {"a": 1, "b": 1, "c": 1}
+    starts = [start for _, _, start, _ in engine.handler.calls]
+    ends = [end for _, _, _, end in engine.handler.calls]
+    assert max(starts) < min(ends)
+
+
+def test_errors_come_back_per_site_and_release_its_queue(engine):
+    results = engine.run(engine.gather("apply_punches", ["a", "b"], "fail"))
+    assert all(isinstance(result, RuntimeError) for result in results.values())
+    assert engine.backend().apply_punches("a", 2) == 2
+    assert engine.sites["a"].calls == 2
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from backfill import Backfill
+from fake_sheets import FakeClient
+from googleAccess import GoogleDriveHandler
+from quota import QuotaGovernor
+
+SHEET = "kiosk"
+
+
+def handler_for(client):
+    handler = GoogleDriveHandler(None, governor=QuotaGovernor(requests_per_minute=60000, burst=1000), client=client)
+    handler.clock = lambda: datetime(2026, 10, 14, 9, 5, 0)
+    return handler
+
+
+def test_backfilled_old_shift_does_not_hide_todays_open_shifts():
+    client = FakeClient()
+    client.add_kiosk_spreadsheet(SHEET, ["Alice", "Bob"])
+    kiosk = handler_for(client)
+    kiosk.save_clock_in(SHEET, "Alice", "10/14/2026 07:00:00")
+
+    backfill = Backfill(handler_for(client), SHEET)
+    backfill.load([(2, {"operator": "Bob", "action": "clock_in", "time": "10/07/2026 07:00:00"}),
+                   (3, {"operator": "Bob", "action": "clock_out", "time": "10/07/2026 15:00:00"})])
+    assert backfill.apply() == 2
+    assert client.spreadsheets[SHEET].sheets["log"].rows[-1][:4] == ["Bob", "8:00:00", "10/07/2026 07:00:00",
+                                                                     "15:00:00"]
+
+    for handler in (kiosk, handler_for(client)):  # Tail read and full resync
+        active = handler.active_shifts(SHEET)
+        assert list(active) == ["Alice"]
+        assert active["Alice"]["time_in"] == "10/14/2026 07:00:00"
+
+
+def test_past_shift_of_a_clocked_in_operator_gets_its_own_row():
+    client = FakeClient()
+    client.add_kiosk_spreadsheet(SHEET, ["Alice", "Bob"])
+    kiosk = handler_for(client)
+    kiosk.save_clock_in(SHEET, "Alice", "10/13/2026 07:00:00")  # Paper clock-out still to come
+    kiosk.save_clock_in(SHEET, "Alice", "10/14/2026 07:00:00")
+
+    backfill = Backfill(handler_for(client), SHEET)
+    backfill.load([(2, {"operator": "Alice", "action": "clock_in", "time": "10/07/2026 07:00:00"}),
+                   (3, {"operator": "Alice", "action": "lunch_start", "time": "10/07/2026 11:00:00"}),
+                   (4, {"operator": "Alice", "action": "clock_out", "time": "10/07/2026 15:00:00"}),
+                   (5, {"operator": "Alice", "action": "clock_out", "time": "10/13/2026 15:00:00"})])
+    assert backfill.count("error") == 0
+    assert backfill.apply() == 4
+
+    rows = {row[2]: row for row in client.spreadsheets[SHEET].sheets["log"].rows if row[0] == "Alice"}
+    assert rows["10/07/2026 07:00:00"][3:5] == ["15:00:00", "11:00:00"]
+    assert rows["10/13/2026 07:00:00"][3] == "15:00:00"  # Flagged REVIEW at the clock-in, then backfilled
+    assert rows["10/14/2026 07:00:00"][3:5] == ["", ""]
+    assert kiosk.active_shifts(SHEET)["Alice"]["time_in"] == "10/14/2026 07:00:00"
+
+    again = Backfill(handler_for(client), SHEET)
+    again.load([(2, {"operator": "Alice", "action": "clock_in", "time": "10/07/2026 07:00:00"}),
+                (3, {"operator": "Alice", "action": "clock_out", "time": "10/07/2026 15:00:00"})])
+    assert again.count("skip") == 2
+
+
+def test_punch_without_a_shift_is_an_error():
+    client = FakeClient()
+    client.add_kiosk_spreadsheet(SHEET, ["Alice", "Bob"])
+    backfill = Backfill(handler_for(client), SHEET)
+    backfill.load([(2, {"operator": "Bob", "action": "clock_out", "time": "10/07/2026 15:00:00"})])
+    assert backfill.count("error") == 1
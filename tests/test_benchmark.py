@@ -0,0 +1,10 @@
+import json
+
+import benchmark
+
+
+def test_actions_stay_within_their_request_budgets(capsys):
+    assert benchmark.main(["--rows", "100", "--json"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["over_budget"] == []
+    assert [result["action"] for result in report["results"]["100"]] == list(benchmark.REQUEST_BUDGET)
@@ -0,0 +1,77 @@
+import os
+from datetime import datetime, timedelta
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import pytest
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication
+
+from dashboard import LATE, LUNCH, ON_SHIFT, OPERATOR, SORT_ROLE, STATUS, TIME_IN, ActiveShiftsModel
+from shift_store import ShiftStore
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def store(tmp_path):
+    QApplication.instance() or QApplication([])
+    store = ShiftStore(str(tmp_path / "shifts.jsonl"))
+    yield store
+    store.close()
+
+
+def cells(model, row):
+    return [model.data(model.index(row, column)) for column in (OPERATOR, STATUS, TIME_IN, ON_SHIFT, LUNCH, LATE)]
+
+
+def test_rows_follow_the_shift_store(store):
+    clock = Clock(datetime(2026, 10, 14, 9, 0, 0))
+    store.punch("clock_in", "Bob", "10/14/2026 07:10:00")
+    model = ActiveShiftsModel(store, clock, late_for=lambda operator, time_in: 10)
+    assert cells(model, 0) == ["Bob", "Working", "07:10", "1:50", "", "10 min"]
+
+    inserted = []
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append(first))
+    store.punch("clock_in", "Alice", "10/14/2026 07:00:00")
+    assert inserted == [1] and model.rowCount() == 2
+
+    clock.now += timedelta(hours=2)  # 11:00
+    store.punch("lunch_start", "Bob", "10:30:00")
+    assert cells(model, 0)[1:5] == ["At lunch", "07:10", "3:50", "Out 0:30"]
+    store.punch("lunch_end", "Bob", "11:00:00")
+    assert cells(model, 0)[3:5] == ["3:20", "10:30-11:00"]
+
+    store.punch("clock_out", "Bob", "15:00:00")
+    assert model.rowCount() == 1 and cells(model, 0)[0] == "Alice"
+
+
+def test_tick_refreshes_only_the_elapsed_columns(store):
+    clock = Clock(datetime(2026, 10, 14, 9, 0, 0))
+    store.punch("clock_in", "Alice", "07:00:00")  # Legacy time-only value, taken as today
+    model = ActiveShiftsModel(store, clock)
+    changed = []
+    model.dataChanged.connect(lambda first, last, roles: changed.append((first.column(), last.column())))
+
+    clock.now += timedelta(minutes=5)
+    model.tick()
+    assert changed == [(ON_SHIFT, LUNCH)]
+    assert model.data(model.index(0, ON_SHIFT)) == "2:05"
+    assert model.data(model.index(0, ON_SHIFT), SORT_ROLE) == 7500.0
+    assert model.data(model.index(0, LATE)) == ""
+    assert model.headerData(OPERATOR, Qt.Horizontal) == "Operator"
+
+
+def test_unreadable_time_in_has_no_lateness(store):
+    def late_for(operator, time_in):
+        raise ValueError(time_in)
+
+    store.punch("clock_in", "Alice", "garbled")
+    model = ActiveShiftsModel(store, Clock(datetime(2026, 10, 14, 9, 0, 0)), late_for)
+    assert cells(model, 0) == ["Alice", "Working", "", "0:00", "", ""]
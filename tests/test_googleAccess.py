@@ -0,0 +1,264 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from fake_sheets import FakeClient, RequestRecorder
+from googleAccess import GoogleDriveHandler, LOG_RESYNC_SECONDS, PARTITION_CACHE, archive_title, partition_span
+from quota import QuotaGovernor
+from storage import last_sweep_boundary
+
+SHEET = "kiosk"
+ROSTER = ["Alice", "Bob", "Carol"]
+NOW = datetime(2026, 10, 14, 9, 0, 0)
+
+
+def closed_row(name, day):
+    return [name, "8:00:00", f"{day} 07:00:00", "15:00:00", "11:00:00", "11:30:00", "", "0"]
+
+
+def handler_for(client, now=NOW):
+    handler = GoogleDriveHandler(None, governor=QuotaGovernor(requests_per_minute=60000, burst=1000), client=client)
+    handler.clock = lambda: now
+    return handler
+
+
+@pytest.fixture
+def client():
+    client = FakeClient()
+    client.add_kiosk_spreadsheet(SHEET, ROSTER, [closed_row("Bob", "10/13/2026"), closed_row("Carol", "10/13/2026")])
+    return client
+
+
+def test_tail_read_on_a_full_grid(client):
+    log_sheet = client.spreadsheets[SHEET].sheets["log"]
+    handler = handler_for(client)
+    handler.active_shifts(SHEET)
+    assert len(log_sheet.rows) == log_sheet.row_count  # Nothing below the last row to read into
+
+    assert handler.active_shifts(SHEET) == {}
+
+    other = handler_for(client)
+    other.save_clock_in(SHEET, "Alice", "10/14/2026 08:55:00")
+    assert list(handler.active_shifts(SHEET)) == ["Alice"]
+
+
+def test_tail_read_after_rows_were_deleted_elsewhere(client):
+    handler = handler_for(client)
+    handler.save_clock_in(SHEET, "Alice", "10/14/2026 08:55:00")
+    log_sheet = client.spreadsheets[SHEET].sheets["log"]
+    log_sheet.delete_rows(2, 3)  # e.g. another kiosk archived the closed shifts
+
+    assert handler.active_shifts(SHEET)["Alice"]["row"] == 2
+    log_sheet.delete_rows(2)
+    assert handler.active_shifts(SHEET) == {}
+
+
+def test_write_table_grows_the_report_sheet(client):
+    handler = handler_for(client)
+    handler.write_table(SHEET, "report", [["a", "b"]] * 3)
+    handler.write_table(SHEET, "report", [["c", "d"]] * 10)
+    assert client.spreadsheets[SHEET].sheets["report"].get_all_values() == [["c", "d"]] * 10
+
+
+def test_second_shift_is_swept_once_its_grace_is_over(client):
+    handler = handler_for(client)
+    handler.save_clock_in(SHEET, "Alice", "10/14/2026 15:02:00")
+
+    # At the 21:00 shift end the row is not stale yet, so that is not a sweep point
+    assert last_sweep_boundary(datetime(2026, 10, 14, 21, 0, 30)) == datetime(2026, 10, 14, 14, 0)
+    now = datetime(2026, 10, 14, 22, 0, 30)
+    assert last_sweep_boundary(now) == datetime(2026, 10, 14, 21, 0)
+
+    assert handler.close_stale_shifts(SHEET, "close", now=now) == 1
+    assert handler.open_shifts(SHEET) == {}
+    row = client.spreadsheets[SHEET].sheets["log"].rows[-1]
+    assert row[0] == "Alice" and row[3] == "21:00:00"
+
+
+def test_first_shift_is_swept_an_hour_after_it_ends(client):
+    handler = handler_for(client)
+    handler.save_clock_in(SHEET, "Alice", "10/14/2026 07:02:00")
+    handler.save_clock_in(SHEET, "Bob", "10/14/2026 14:10:00")
+    handler.save_clock_in(SHEET, "Carol", "10/14/2026 13:52:00")  # Early for the second shift
+
+    now = datetime(2026, 10, 14, 15, 0, 30)
+    assert last_sweep_boundary(now) == datetime(2026, 10, 14, 14, 0)
+    assert handler.close_stale_shifts(SHEET, "close", now=now) == 1
+    assert sorted(handler.open_shifts(SHEET)) == ["Bob", "Carol"]
+
+
+def test_late_clock_in_belongs_to_the_last_shift_of_the_day(client):
+    handler = handler_for(client)
+    handler.save_clock_in(SHEET, "Alice", "10/14/2026 20:30:00")
+
+    now = datetime(2026, 10, 14, 22, 0, 30)
+    assert last_sweep_boundary(now) == datetime(2026, 10, 14, 21, 0)
+    assert handler.close_stale_shifts(SHEET, "close", now=now) == 1
+    row = client.spreadsheets[SHEET].sheets["log"].rows[-1]
+    assert row[0] == "Alice" and row[3] == "21:00:00"
+
+
+def test_mirror_resyncs_on_the_handlers_clock(client):
+    now = [NOW]
+    handler = handler_for(client)
+    handler.clock = lambda: now[0]
+    other = handler_for(client)
+    handler.save_clock_in(SHEET, "Alice", "10/14/2026 07:00:00")
+    handler.active_shifts(SHEET)
+    other.save_lunch_start(SHEET, "Alice", "11:00:00")  # An in-place edit; tail reads can't see it
+
+    assert handler.active_shifts(SHEET)["Alice"]["lunch_start"] is None
+    now[0] += timedelta(seconds=LOG_RESYNC_SECONDS + 1)
+    assert handler.active_shifts(SHEET)["Alice"]["lunch_start"] == "11:00:00"
+
+
+def test_periodic_refresh_reads_only_todays_and_open_rows():
+    client = FakeClient(recorder=RequestRecorder())
+    old_rows = [closed_row("Bob", "10/13/2026")] * 50 + [["Carol", "", "10/13/2026 07:00:00"]]
+    client.add_kiosk_spreadsheet(SHEET, ROSTER, old_rows)
+    now = [NOW]
+    handler = handler_for(client)
+    handler.clock = lambda: now[0]
+    other = handler_for(client)
+    handler.save_clock_in(SHEET, "Alice", "10/14/2026 07:00:00")
+    other.save_clock_in(SHEET, "Bob", "10/14/2026 07:01:00")
+    other.save_lunch_start(SHEET, "Alice", "11:00:00")
+    other.update_operator_fields(SHEET, "Carol", {"time_out": "REVIEW"})
+
+    now[0] += timedelta(seconds=LOG_RESYNC_SECONDS + 1)
+    mark = client.recorder.mark()
+    shifts = handler.active_shifts(SHEET)
+    count, _, methods = client.recorder.since(mark)
+    assert methods == {"FakeWorksheet.batch_get": 1}
+    assert sorted(shifts) == ["Alice", "Bob"] and shifts["Alice"]["lunch_start"] == "11:00:00"
+    assert handler.open_shifts(SHEET).keys() == {"Alice", "Bob"}
+
+
+def test_punch_on_an_old_mirror_does_not_read_the_log():
+    client = FakeClient(recorder=RequestRecorder())
+    client.add_kiosk_spreadsheet(SHEET, ROSTER, [closed_row("Bob", "10/13/2026")])
+    now = [NOW]
+    handler = handler_for(client)
+    handler.clock = lambda: now[0]
+    handler.save_clock_in(SHEET, "Alice", "10/14/2026 07:00:00")
+
+    now[0] += timedelta(seconds=LOG_RESYNC_SECONDS + 1)
+    mark = client.recorder.mark()
+    handler.save_lunch_start(SHEET, "Alice", "11:00:00")
+    _, _, methods = client.recorder.since(mark)
+    assert methods == {"FakeWorksheet.batch_update": 1}
+
+
+def test_rows_appended_by_another_kiosk_are_read_back_in_place(client):
+    handler = handler_for(client)
+    other = handler_for(client)
+    handler.active_shifts(SHEET)
+    other.save_clock_in(SHEET, "Bob", "10/14/2026 07:01:00")
+    handler.save_clock_in(SHEET, "Alice", "10/14/2026 07:02:00")  # Lands below Bob's row
+
+    handler.save_lunch_start(SHEET, "Alice", "11:00:00")
+    rows = client.spreadsheets[SHEET].sheets["log"].rows
+    assert [(row[0], row[4]) for row in rows[-2:]] == [("Bob", ""), ("Alice", "11:00:00")]
+    assert sorted(handler.active_shifts(SHEET)) == ["Alice", "Bob"]
+
+
+def test_clock_in_on_a_row_left_open_yesterday_starts_a_new_row(client):
+    handler = handler_for(client)
+    handler.apply_punches(SHEET, [{"action": "clock_in", "operator": "Alice", "time": "10/13/2026 07:00:00"}])
+    handler.apply_punches(SHEET, [{"action": "clock_in", "operator": "Alice", "time": "10/14/2026 07:00:00"}])
+
+    rows = [row for row in client.spreadsheets[SHEET].sheets["log"].rows if row[0] == "Alice"]
+    assert [(row[2], row[3]) for row in rows] == [("10/13/2026 07:00:00", "REVIEW"), ("10/14/2026 07:00:00", "")]
+    assert handler.open_shifts(SHEET)["Alice"]["time_in"] == "10/14/2026 07:00:00"
+
+
+def test_clock_out_after_the_sweep_is_dropped(client):
+    handler = handler_for(client)
+    handler.apply_punches(SHEET, [{"action": "clock_in", "operator": "Alice", "time": "10/14/2026 07:02:00"}])
+    assert handler.close_stale_shifts(SHEET, "close", now=datetime(2026, 10, 14, 15, 0, 30)) == 1
+
+    log_rows = client.spreadsheets[SHEET].sheets["log"].rows
+    count = len(log_rows)
+    assert handler.apply_punches(SHEET, [{"action": "clock_out", "operator": "Alice", "time": "15:03:00"},
+                                         {"action": "lunch_start", "operator": "Bob", "time": "15:04:00"}]) == 0
+    assert len(log_rows) == count
+    assert log_rows[-1][:4] == ["Alice", "6:58:00", "10/14/2026 07:02:00", "14:00:00"]
+
+
+def test_sweep_follows_the_configured_shift_ends(client):
+    handler = handler_for(client)
+    handler.apply_punches(SHEET, [{"action": "clock_in", "operator": "Alice", "time": "10/14/2026 15:02:00"}])
+    ends = (15, 23)
+
+    assert handler.close_stale_shifts(SHEET, "close", now=datetime(2026, 10, 14, 22, 0, 30), ends=ends) == 0
+    now = datetime(2026, 10, 15, 0, 0, 30)
+    assert last_sweep_boundary(now, ends) == datetime(2026, 10, 14, 23, 0)
+    assert handler.close_stale_shifts(SHEET, "close", now=now, ends=ends) == 1
+    assert client.spreadsheets[SHEET].sheets["log"].rows[-1][3] == "23:00:00"
+
+
+def test_save_clock_in_records_lateness_like_a_journaled_punch():
+    client = FakeClient()
+    client.add_kiosk_spreadsheet(SHEET, ROSTER, schedule={"Alice": {"Wed": "7-3"}, "Bob": {"Wed": "7-3"}})
+    handler = handler_for(client)
+    handler.get_names_from_schedule(SHEET)  # Builds the schedule index, as the kiosk's roster read does
+
+    handler.save_clock_in(SHEET, "Alice", "10/14/2026 07:12:00")
+    handler.apply_punches(SHEET, [{"action": "clock_in", "operator": "Bob", "time": "10/14/2026 07:12:00"}])
+    rows = client.spreadsheets[SHEET].sheets["log"].rows
+    assert [(row[0], row[7]) for row in rows[1:]] == [("Alice", "12"), ("Bob", "12")]
+
+
+def test_archived_partitions_are_not_kept_in_memory():
+    client = FakeClient()
+    rows = [closed_row("Bob", f"{month:02d}/10/2026") for month in range(1, 10)]
+    client.add_kiosk_spreadsheet(SHEET, ROSTER, rows)
+    handler = handler_for(client)
+
+    assert handler.archive_closed_shifts(SHEET, "month", today=NOW.date()) == 9
+    assert not handler.partition_rows
+    shifts = handler.read_shifts(SHEET, datetime(2026, 1, 1).date(), datetime(2026, 10, 31).date())
+    assert len(shifts) == 9
+    assert len(handler.partition_rows) == PARTITION_CACHE
+
+
+@pytest.mark.parametrize("day, period, title", [
+    (date(2026, 10, 14), "month", "log-2026-10"),
+    (date(2026, 1, 2), "month", "log-2026-01"),
+    (date(2026, 10, 14), "week", "log-2026-W42"),
+    (date(2027, 1, 1), "week", "log-2026-W53"),  # ISO weeks belong to the year of their Thursday
+])
+def test_archive_titles_round_trip_through_their_spans(day, period, title):
+    assert archive_title(day, period) == title
+    start, end = partition_span(title)
+    assert start <= day <= end
+
+
+def test_partition_span_ignores_other_worksheets():
+    assert partition_span("log") is None
+    assert partition_span("report") is None
+    assert partition_span("log-notes") is None
+    assert partition_span("log-2026-13") is None
+
+
+def test_archive_rolls_closed_shifts_of_past_months_over():
+    client = FakeClient()
+    rows = [["=== Shift starting at 7AM ==="],
+            closed_row("Bob", "09/29/2026"),
+            ["Carol", "", "09/30/2026 07:00:00"],  # Still open, stays
+            closed_row("Bob", "10/01/2026")]
+    client.add_kiosk_spreadsheet(SHEET, ROSTER, rows)
+    handler = handler_for(client)
+
+    assert handler.archive_closed_shifts(SHEET, "month", today=NOW.date()) == 2
+    sheets = client.spreadsheets[SHEET].sheets
+    assert [row[0] for row in sheets["log-2026-09"].rows] == ["Operator", "=== Shift starting at 7AM ===", "Bob"]
+    assert [row[2] for row in sheets["log"].rows[1:]] == ["09/30/2026 07:00:00", "10/01/2026 07:00:00"]
+    assert handler.archive_closed_shifts(SHEET, "month", today=NOW.date()) == 0
+
+    # A later run adds to the existing partition, and reports read across both
+    handler.update_operator_fields(SHEET, "Carol", {"time_out": "15:00:00"})
+    assert handler.archive_closed_shifts(SHEET, "month", today=NOW.date()) == 1
+    assert [row[0] for row in sheets["log-2026-09"].rows[2:]] == ["Bob", "Carol"]
+    shifts = handler.read_shifts(SHEET, date(2026, 9, 1), date(2026, 10, 31))
+    assert [row[0] for row in shifts] == ["Bob", "Carol", "Bob"]
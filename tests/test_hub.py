@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+import pytest
+
+from fake_sheets import FakeClient
+from hub import Hub, HubClient, HubServer
+from storage import open_backend
+
+SHEET = "kiosk"
+TOKEN = "s3cret"
+NOW = datetime(2026, 10, 14, 9, 0, 0)
+
+
+def clock_in(operator, punch_id="1"):
+    return {"id": punch_id, "action": "clock_in", "operator": operator, "time": "10/14/2026 07:00:00"}
+
+
+@pytest.fixture
+def client():
+    client = FakeClient()
+    client.add_kiosk_spreadsheet(SHEET, ["Alice", "Bob"])
+    return client
+
+
+@pytest.fixture
+def hub(tmp_path, client):
+    backend = open_backend("fake", client=client)
+    backend.clock = lambda: NOW
+    hub = Hub(backend, str(tmp_path / "hub.jsonl"), archive_period=None, sweep_policy=None).start()
+    server = HubServer(hub, port=0, token=TOKEN)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield hub, "http://127.0.0.1:%d" % server.server.server_address[1]
+    server.server.shutdown()
+    thread.join()
+    hub.stop()
+
+
+def test_requests_without_the_token_are_refused(hub):
+    _, url = hub
+    with pytest.raises(RuntimeError, match="401"):
+        HubClient(url).apply_punches(SHEET, [{"id": "1", "action": "clock_in", "operator": "Alice",
+                                              "time": "10/14/2026 08:55:00"}])
+    with pytest.raises(RuntimeError, match="401"):
+        HubClient(url, "wrong").get_names_from_schedule(SHEET)
+    assert HubClient(url, TOKEN).get_names_from_schedule(SHEET) == ["Alice", "Bob"]
+
+
+def test_hub_serves_other_machines_only_with_a_token(hub):
+    hub_, _ = hub
+    with pytest.raises(ValueError):
+        HubServer(hub_, port=0, host="0.0.0.0")
+
+
+def test_log_edits_are_forwarded_after_pending_punches(hub, client):
+    _, url = hub
+    kiosk = HubClient(url, TOKEN)
+    kiosk.apply_punches(SHEET, [{"id": "1", "action": "clock_in", "operator": "Alice", "time": "10/14/2026 07:00:00"}])
+
+    row = kiosk.update_operator_fields(SHEET, "Alice", {"lunch_start": "11:00:00"})
+    assert row == 2
+    assert kiosk.find_or_create_operator_log_row(SHEET, "Alice") == 2
+    assert kiosk.open_shifts(SHEET)["Alice"]["lunch_start"] == "11:00:00"
+
+    kiosk.update_operator_fields(SHEET, "Alice", {"lunch_end": "11:30:00", "time_out": "15:00:00"})
+    assert kiosk.open_shifts(SHEET) == {}
+    kiosk.finalize_shift(SHEET, "Alice")
+    log_row = client.spreadsheets[SHEET].sheets["log"].rows[-1]
+    assert log_row[:4] == ["Alice", "7:30:00", "10/14/2026 07:00:00", "15:00:00"]
+
+
+def test_duplicate_punches_are_accepted_once(hub, client):
+    _, url = hub
+    kiosk = HubClient(url, TOKEN)
+    kiosk.apply_punches(SHEET, [clock_in("Alice")])
+    kiosk.apply_punches(SHEET, [clock_in("Alice")])  # Retried after a lost response
+    assert list(kiosk.open_shifts(SHEET)) == ["Alice"]
+    assert [row[0] for row in client.spreadsheets[SHEET].sheets["log"].rows[1:] if row and row[0]] == ["Alice"]
+
+
+def test_long_poll_waits_for_the_next_punch(hub):
+    _, url = hub
+    kiosk = HubClient(url, TOKEN)
+    version, active_shifts = kiosk.wait_active(SHEET, since=-1, timeout=5)
+    assert version >= 1 and active_shifts == {}
+
+    started = time.monotonic()
+    assert kiosk.wait_active(SHEET, since=version, timeout=0.2)[0] == version
+    assert time.monotonic() - started >= 0.2
+
+    result = {}
+    waiter = threading.Thread(target=lambda: result.update(view=kiosk.wait_active(SHEET, since=version, timeout=5)))
+    waiter.start()
+    time.sleep(0.1)
+    kiosk.apply_punches(SHEET, [clock_in("Bob")])
+    waiter.join()
+    assert result["view"][0] > version
+    assert result["view"][1]["Bob"]["time_in"] == "10/14/2026 07:00:00"
+
+
+@pytest.mark.parametrize("body", [
+    b"not json",
+    b'{"punches": [{"id": "1", "action": "clock_in", "operator": "Alice"}]}',
+    b'{"spreadsheet_id": "kiosk", "method": "delete_rows", "operator": "Alice"}',
+])
+def test_malformed_posts_are_rejected(hub, body):
+    _, url = hub
+    path = "/log" if b"method" in body else "/punches"
+    request = urllib.request.Request(url + path, data=body, headers={"Authorization": f"Bearer {TOKEN}"})
+    with pytest.raises(urllib.error.HTTPError) as e:
+        urllib.request.urlopen(request, timeout=5)
+    assert e.value.code == 400
+    assert "bad request" in json.loads(e.value.read())["error"]
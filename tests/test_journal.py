@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import pytest
+
+from fake_sheets import FakeClient
+from googleAccess import GoogleDriveHandler
+from journal import JournalReplayer, PunchJournal
+from quota import QuotaGovernor
+
+SHEET = "kiosk"
+
+
+@pytest.fixture
+def client():
+    client = FakeClient()
+    client.add_kiosk_spreadsheet(SHEET, ["Alice", "Bob"])
+    return client
+
+
+def handler_for(client):
+    handler = GoogleDriveHandler(None, governor=QuotaGovernor(requests_per_minute=60000, burst=1000), client=client)
+    handler.clock = lambda: datetime(2026, 10, 14, 9, 0, 0)
+    return handler
+
+
+def log_rows(client):
+    return [row[:6] for row in client.spreadsheets[SHEET].sheets["log"].rows[1:]]
+
+
+def test_unapplied_punches_survive_a_crash(tmp_path, client):
+    path = str(tmp_path / "journal.jsonl")
+    journal = PunchJournal(path)
+    journal.record(SHEET, "clock_in", "Alice", "10/14/2026 07:00:00")
+    journal.record(SHEET, "lunch_start", "Alice", "11:00:00")
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"id": "torn", "spreadsh')  # Power lost mid-write
+
+    journal = PunchJournal(path)
+    assert [punch["action"] for punch in journal.pending_punches()] == ["clock_in", "lunch_start"]
+    assert JournalReplayer(journal, handler_for(client)).drain() == 2
+    assert journal.pending_punches() == []
+    assert log_rows(client) == [["Alice", "", "10/14/2026 07:00:00", "", "11:00:00", ""]]
+    journal.close()
+    assert PunchJournal(path).pending_punches() == []
+
+
+def test_replay_after_a_crash_between_write_and_mark_is_skipped(tmp_path, client):
+    path = str(tmp_path / "journal.jsonl")
+    journal = PunchJournal(path)
+    journal.record(SHEET, "clock_in", "Alice", "10/14/2026 07:00:00")
+    journal.record(SHEET, "clock_in", "Bob", "10/14/2026 07:01:00")
+    handler_for(client).apply_punches(SHEET, journal.pending_punches())  # In the sheet, never marked
+    journal.close()
+
+    journal = PunchJournal(path)
+    assert JournalReplayer(journal, handler_for(client)).drain() == 0
+    assert journal.pending_punches() == []
+    assert [row[0] for row in log_rows(client)] == ["Alice", "Bob"]
+    journal.close()
+
+
+def test_resent_punches_keep_their_ids_and_are_recorded_once(tmp_path):
+    journal = PunchJournal(str(tmp_path / "hub.jsonl"))
+    punch = {"id": "abc", "spreadsheet_id": SHEET, "action": "clock_in", "operator": "Alice",
+             "time": "10/14/2026 07:00:00"}
+    assert journal.record_punches([punch]) == [punch]
+    assert journal.record_punches([punch]) == []
+    assert journal.pending_punches() == [punch]
+    journal.close()
+
+
+def test_batches_do_not_mix_spreadsheets(tmp_path):
+    class Recording:
+        def __init__(self):
+            self.calls = []
+
+        def apply_punches(self, spreadsheet_id, punches):
+            self.calls.append((spreadsheet_id, [punch["operator"] for punch in punches]))
+            return len(punches)
+
+    journal = PunchJournal(str(tmp_path / "journal.jsonl"))
+    for spreadsheet_id, operator in [("a", "Alice"), ("a", "Bob"), ("b", "Carol"), ("a", "Dave")]:
+        journal.record(spreadsheet_id, "clock_in", operator, "10/14/2026 07:00:00")
+    backend = Recording()
+    assert JournalReplayer(journal, backend).drain() == 4
+    assert backend.calls == [("a", ["Alice", "Bob"]), ("b", ["Carol"]), ("a", ["Dave"])]
+    journal.close()
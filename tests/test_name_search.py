@@ -0,0 +1,46 @@
+import pytest
+
+from name_search import NameIndex, prefix_typos
+
+ROSTER = ["John Smith", "Johanna Reyes", "Mary Johnson", "Smitty Werben", "Ann O'Hara", "Bo Li"]
+
+
+@pytest.fixture
+def index():
+    return NameIndex(ROSTER)
+
+
+def test_whole_name_prefixes_rank_before_word_prefixes(index):
+    assert index.search("jo") == ["Johanna Reyes", "John Smith", "Mary Johnson"]
+    assert index.search("smi") == ["Smitty Werben", "John Smith"]
+
+
+def test_words_match_in_any_order(index):
+    assert index.search("smith j")[0] == "John Smith"
+    assert index.search("j smi") == ["John Smith"]
+
+
+def test_substrings_follow_prefixes(index):
+    assert index.search("ohn") == ["John Smith", "Mary Johnson"]
+
+
+@pytest.mark.parametrize("query", ["jonh smith", "jhon smtih", "smtih", "jhon smith"])
+def test_typos_still_find_the_name(index, query):
+    assert index.search(query)[0] == "John Smith"
+
+
+def test_short_queries_are_not_fuzzy(index):
+    assert index.search("bx") == []
+    assert index.search("bo") == ["Bo Li"]
+
+
+def test_blank_query_lists_the_roster_and_duplicates_are_dropped():
+    index = NameIndex(ROSTER + ["John Smith", "  "])
+    assert len(index) == len(ROSTER)
+    assert index.search("  ", limit=3) == ROSTER[:3]
+
+
+def test_prefix_typos_counts_adjacent_swaps_once():
+    assert prefix_typos("jhon", "john smith", 2) == 1
+    assert prefix_typos("john", "john smith", 2) == 0
+    assert prefix_typos("xxxxx", "john smith", 1) == 2
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import gspread
+import pytest
+
+from fake_sheets import FakeErrorResponse
+from quota import BACKGROUND, USER, QuotaGovernor
+
+
+def api_error(code):
+    return gspread.exceptions.APIError(FakeErrorResponse(code, f"status {code}"))
+
+
+class Flaky:
+    # Fails with the given statuses, in order, then succeeds
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def append_rows(self, values):
+        return self.respond(values)
+
+    def batch_update(self, values):
+        return self.respond(values)
+
+    def respond(self, values):
+        self.calls += 1
+        if self.statuses:
+            raise api_error(self.statuses.pop(0))
+        return values
+
+
+@pytest.fixture
+def governor():
+    return QuotaGovernor(requests_per_minute=60000, burst=1000, backoff_base=0.001, backoff_max=0.001)
+
+
+def test_appends_are_retried_on_429_only(governor):
+    sheet = Flaky(429)
+    assert governor.wrap(sheet).append_rows([["a"]]) == [["a"]]
+    assert sheet.calls == 2
+
+    sheet = Flaky(503)
+    with pytest.raises(gspread.exceptions.APIError):
+        governor.wrap(sheet).append_rows([["a"]])
+    assert sheet.calls == 1
+    assert governor.snapshot()["failed"] == 1
+
+
+def test_updates_are_retried_on_5xx(governor):
+    sheet = Flaky(500, 503, 429)
+    assert governor.wrap(sheet).batch_update([["a"]]) == [["a"]]
+    assert sheet.calls == 4
+    assert governor.snapshot()["retried"] == 3
+
+
+def test_gives_up_after_max_retries():
+    governor = QuotaGovernor(requests_per_minute=60000, burst=1000, max_retries=2,
+                             backoff_base=0.001, backoff_max=0.001)
+    sheet = Flaky(503, 503, 503)
+    with pytest.raises(gspread.exceptions.APIError):
+        governor.wrap(sheet).batch_update([["a"]])
+    assert sheet.calls == 3
+
+
+def test_429_empties_the_bucket_for_every_caller():
+    governor = QuotaGovernor(requests_per_minute=600, burst=10, backoff_base=0.001, backoff_max=0.001)
+    governor.wrap(Flaky(429)).batch_update([["a"]])
+    snapshot = governor.snapshot()
+    assert snapshot["tokens"] < 1 and snapshot["throttled"] == 1  # The retry waited for a fresh token
+
+
+def test_user_requests_go_before_queued_background_ones():
+    governor = QuotaGovernor(requests_per_minute=600, burst=1)  # A token every 0.1s
+    governor.acquire(USER)
+    order = []
+
+    def take(priority):
+        governor.acquire(priority)
+        order.append(priority)
+
+    background = threading.Thread(target=take, args=(BACKGROUND,))
+    background.start()
+    time.sleep(0.03)  # Background is waiting for the next token
+    user = threading.Thread(target=take, args=(USER,))
+    user.start()
+    background.join()
+    user.join()
+    assert order == [USER, BACKGROUND]
+    assert governor.snapshot()["throttled"] == 2
+
+
+def test_priority_is_per_thread(governor):
+    seen = []
+    with governor.priority(BACKGROUND):
+        other = threading.Thread(target=lambda: seen.append(getattr(governor.local, "priority", USER)))
+        other.start()
+        other.join()
+        seen.append(governor.local.priority)
+    assert seen == [USER, BACKGROUND]
+    assert governor.local.priority == USER
@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+import reports
+from schedule import ScheduleIndex
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def schedule_for(shifts):
+    # The availability grid's layout: day names in row 10, names from row 11
+    grid = [[] for _ in range(9)] + [["", "Name"] + WEEKDAYS]
+    grid += [["", name] + [days.get(day[:3], "") for day in WEEKDAYS] for name, days in shifts.items()]
+    return ScheduleIndex.from_grid(grid)
+
+
+def row(name, time_in, time_out="15:00:00", late=""):
+    return [name, "", time_in, time_out, "11:00:00", "11:30:00", "", late]
+
+
+@pytest.mark.parametrize("use_numpy", [False, pytest.param(True, marks=pytest.mark.skipif(
+    reports.np is None, reason="NumPy not installed"))])
+def test_lateness_comes_from_the_log_then_the_schedule(use_numpy):
+    rows = [row("Alice", "10/14/2026 08:10:00", late="0"),   # Stored, e.g. excused by hand; 7:00 would say 70
+            row("Bob", "10/14/2026 09:10:00"),               # No stored value, scheduled 9-5
+            row("Carol", "10/14/2026 07:20:00")]             # Neither: the fixed 7:00 start
+    schedule = schedule_for({"Bob": {"Wed": "9-5"}})
+
+    report = {entry["operator"]: entry for entry in reports.summarize(rows, use_numpy, schedule)}
+    assert [report[name]["late_minutes"] for name in ("Alice", "Bob", "Carol")] == [0, 10, 20]
+    assert [report[name]["late_shifts"] for name in ("Alice", "Bob", "Carol")] == [0, 1, 1]
+
+
+def test_totals_overtime_and_open_shifts():
+    # Mon-Fri of one week, 9.5 h worked less a half-hour lunch, plus an
+    # overnight shift and one still open
+    rows = [row("Alice", f"10/{day}/2026 07:00:00", "16:30:00") for day in range(12, 17)]
+    rows += [row("Bob", "10/14/2026 23:00:00", "07:00:00", late="0"), row("Bob", "10/15/2026 23:00:00", "")]
+    rows.append(["", "", "", "", "", "", "", ""])  # Shift separator
+
+    alice, bob = reports.summarize(rows, use_numpy=False)
+    assert alice == {"operator": "Alice", "shifts": 5, "hours": 45.0, "lunch_hours": 2.5, "overtime_hours": 5.0,
+                     "late_shifts": 0, "late_minutes": 0, "no_lunch_shifts": 0, "open_shifts": 0}
+    assert (bob["shifts"], bob["hours"], bob["open_shifts"]) == (2, 7.5, 1)
+
+
+@pytest.mark.skipif(reports.np is None, reason="NumPy not installed")
+def test_numpy_and_pure_python_reports_agree():
+    rng = random.Random(7)
+    rows = []
+    for _ in range(2000):
+        day = f"{rng.randint(9, 12)}/{rng.randint(1, 28)}/2026"
+        start = rng.randint(5 * 3600, 23 * 3600)
+        end = rng.choice(["", "%d:%02d:00" % ((start // 3600 + rng.randint(4, 10)) % 24, rng.randint(0, 59))])
+        lunch = rng.choice([("", ""), ("11:00:00", "11:30:00"), ("23:50:00", "00:20:00")])
+        late = rng.choice(["", "", "0", str(rng.randint(1, 90))])
+        rows.append([rng.choice("ABCDEFGH"), "", "%s %d:%02d:00" % (day, start // 3600, start % 3600 // 60),
+                     end, *lunch, "", late])
+    assert reports.summarize(rows, use_numpy=True) == reports.summarize(rows, use_numpy=False)
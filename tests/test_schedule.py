@@ -0,0 +1,56 @@
+from datetime import date
+
+import pytest
+
+from schedule import SHIFT_LABELS, ScheduleIndex, parse_shift
+
+
+def hours(start, end):
+    return start * 60, end * 60
+
+
+@pytest.mark.parametrize("cell, expected", [
+    ("1st", hours(7, 15)),
+    ("2nd", hours(15, 23)),
+    ("3rd", hours(23, 31)),
+    ("7-3", hours(7, 15)),
+    ("3-11", hours(15, 23)),
+    ("11-7", hours(23, 31)),
+    ("7:00-15:00", hours(7, 15)),
+    ("15:00 - 23:00", hours(15, 23)),
+    ("7am to 3pm", hours(7, 15)),
+    ("3pm–11pm", hours(15, 23)),
+    ("11pm-7am", hours(23, 31)),
+    ("11am-7pm", hours(11, 19)),
+    ("8-4:30", (8 * 60, 16 * 60 + 30)),
+    ("9-5", hours(9, 17)),
+    ("12-8", hours(12, 20)),
+    ("6-2", hours(6, 14)),
+    ("5-1", hours(17, 25)),
+])
+def test_parse_shift(cell, expected):
+    assert parse_shift(cell) == expected
+
+
+@pytest.mark.parametrize("cell", ["", "off", "OFF", "7", "7-3-11", "25-3", "x-y"])
+def test_parse_shift_days_off_and_nonsense(cell):
+    assert parse_shift(cell) is None
+
+
+def test_every_label_matches_its_hours_written_out():
+    for label, (start, end) in SHIFT_LABELS.items():
+        assert parse_shift(label) == parse_shift(f"{start}-{end}")
+
+
+def test_second_shift_written_as_3_11_is_not_late_or_over():
+    wednesday = date(2026, 10, 14).weekday()
+    schedule = ScheduleIndex({("Alice", wednesday): parse_shift("3-11")})
+    assert schedule.deviations("Alice", "10/14/2026 14:58:00", "23:00:00") == {"late": 0, "early_out": 0,
+                                                                               "overtime": 0}
+
+
+def test_night_shift_clock_out_after_midnight():
+    wednesday = date(2026, 10, 14).weekday()
+    schedule = ScheduleIndex({("Bob", wednesday): parse_shift("11-7")})
+    assert schedule.deviations("Bob", "10/14/2026 23:10:00", "07:30:00") == {"late": 10, "early_out": 0,
+                                                                             "overtime": 30}
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from shift_store import AT_LUNCH, OFF, WORKING, ShiftStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "shifts.jsonl")
+
+
+def lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_punches_follow_the_state_machine(path):
+    store = ShiftStore(path)
+    assert store.punch("lunch_start", "Alice", "11:00:00") is None  # Not on shift
+    assert store.punch("clock_in", "Alice", "10/14/2026 07:00:00") == WORKING
+    assert store.punch("clock_in", "Alice", "10/14/2026 07:01:00") is None
+    assert store.punch("lunch_start", "Alice", "11:00:00") == AT_LUNCH
+    assert store.punch("lunch_start", "Alice", "11:01:00") is None
+    assert store.punch("lunch_end", "Alice", "11:30:00") == WORKING
+    assert store.current()["Alice"] == {"state": WORKING, "time_in": "10/14/2026 07:00:00",
+                                        "lunch_start": "11:00:00", "lunch_end": "11:30:00"}
+    assert store.punch("clock_out", "Alice", "15:00:00") == OFF
+    assert store.state("Alice") == OFF and store.current() == {}
+    store.close()
+
+
+def test_clock_out_from_lunch_ends_the_shift(path):
+    store = ShiftStore(path)
+    store.punch("clock_in", "Bob", "10/14/2026 07:00:00")
+    store.punch("lunch_start", "Bob", "11:00:00")
+    assert store.punch("clock_out", "Bob", "11:45:00") == OFF
+    store.close()
+
+
+def test_state_survives_a_restart_and_is_compacted(path):
+    store = ShiftStore(path, compact_every=3)
+    store.punch("clock_in", "Alice", "10/14/2026 07:00:00")
+    store.punch("clock_in", "Bob", "10/14/2026 07:01:00")
+    assert len(lines(path)) == 3  # The startup snapshot and two events
+    store.punch("lunch_start", "Alice", "11:00:00")
+    assert lines(path) == [{"snapshot": store.current()}]
+    store.punch("clock_out", "Bob", "15:00:00")
+    store.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"operator": "Carol", "sh')  # Torn by a crash
+
+    store = ShiftStore(path)
+    assert store.current() == {"Alice": {"state": AT_LUNCH, "time_in": "10/14/2026 07:00:00",
+                                         "lunch_start": "11:00:00", "lunch_end": None}}
+    assert len(lines(path)) == 1  # Compacted on startup
+    store.close()
+
+
+def test_reconcile_adopts_the_log_and_notifies_only_changes(path):
+    store = ShiftStore(path)
+    changes = []
+    store.subscribe(lambda operator, shift: changes.append((operator, shift and shift["state"])))
+    store.punch("clock_in", "Alice", "10/14/2026 07:00:00")
+    store.punch("clock_in", "Bob", "10/14/2026 07:00:00")
+    active = {"Alice": {"row": 2, "time_in": "10/14/2026 07:00:00", "lunch_start": "11:00:00", "lunch_end": None},
+              "Carol": {"row": 4, "time_in": "10/14/2026 07:05:00", "lunch_start": None, "lunch_end": None}}
+
+    assert store.reconcile(active) == 3
+    assert changes[2:] == [("Bob", None), ("Alice", AT_LUNCH), ("Carol", WORKING)]
+    assert store.reconcile(active) == 0
+    assert store.active() == {operator: dict(info, row=None) for operator, info in active.items()}
+    store.close()
+
+
+def test_old_state_file_is_migrated_without_times(path):
+    store = ShiftStore(path)
+    store.punch("clock_in", "Alice", "10/14/2026 07:00:00")
+    assert store.migrate_states({"Alice": "at_lunch", "Bob": "working", "Carol": "off"}) == 1
+    assert store.current()["Bob"] == {"state": WORKING, "time_in": None, "lunch_start": None, "lunch_end": None}
+    assert store.state("Alice") == WORKING
+    store.close()
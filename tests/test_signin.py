@@ -0,0 +1,78 @@
+import os
+from datetime import datetime, timedelta
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import pytest
+from PyQt5.QtWidgets import QApplication
+
+import signin
+from benchmark import BenchClock, wait_idle
+from fake_sheets import FakeClient
+from googleAccess import GoogleDriveHandler
+from quota import QuotaGovernor
+from shift_store import OFF, WORKING
+
+SHEET = "kiosk"
+
+
+@pytest.fixture
+def kiosk(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Pins, journal and shift store
+    app = QApplication.instance() or QApplication([])
+    client = FakeClient()
+    client.add_kiosk_spreadsheet(SHEET, ["Alice", "Bob"])
+    handler = GoogleDriveHandler(None, governor=QuotaGovernor(requests_per_minute=60000, burst=1000), client=client)
+    clock = BenchClock(datetime(2026, 10, 14, 7, 0, 0))
+    page = signin.SignInPage("unused", SHEET, drive_handler=handler, clock=clock)
+    page.badges = {"B-ALICE": "Alice"}
+    wait_idle(app, page)
+    yield app, page, clock, client
+    page.worker.stop()
+    page.journal.close()
+    page.shifts.close()
+    page.deleteLater()
+
+
+def test_rush_rescan_of_the_same_badge_is_ignored(kiosk, monkeypatch):
+    app, page, clock, client = kiosk
+    monkeypatch.setattr(signin, "RUSH_MODE", "on")
+
+    page.handle_badge_scan("B-ALICE")
+    wait_idle(app, page)
+    assert page.shifts.state("Alice") == WORKING
+
+    clock.now += timedelta(seconds=3)
+    page.handle_badge_scan("B-ALICE")
+    wait_idle(app, page)
+    assert page.shifts.state("Alice") == WORKING
+    assert page.message_label.text().startswith("Already done: Alice clocked in")
+    log_rows = client.spreadsheets[SHEET].sheets["log"].rows
+    assert log_rows[-1][0] == "Alice" and log_rows[-1][3] == ""
+
+    clock.now += timedelta(seconds=signin.RUSH_REPEAT_SECONDS)
+    page.handle_badge_scan("B-ALICE")
+    wait_idle(app, page)
+    assert page.shifts.state("Alice") == OFF
+
+
+def test_clock_out_after_the_clock_in_window_closes(kiosk, monkeypatch):
+    app, page, clock, client = kiosk
+    warnings = []
+    monkeypatch.setattr(signin.QMessageBox, "warning", lambda *args: warnings.append(args[-1]))
+    clock.now = datetime(2026, 10, 14, 15, 0, 0)
+    page.begin_session("Alice")
+    page.update_shift_state("clock_in")
+    wait_idle(app, page)
+    page.reset_page()
+
+    clock.now = datetime(2026, 10, 14, 23, 2, 0)
+    page.begin_session("Bob")
+    assert warnings == ["Not within allowed clock-in hours."]
+    page.reset_page()
+    page.begin_session("Alice")
+    assert page.clock_out_button.isVisibleTo(page)
+    page.update_shift_state("clock_out")
+    wait_idle(app, page)
+    assert page.shifts.state("Alice") == OFF
+    assert client.spreadsheets[SHEET].sheets["log"].rows[-1][3] == "23:02:00"
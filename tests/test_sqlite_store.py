@@ -0,0 +1,114 @@
+import sqlite3
+from datetime import date, datetime
+
+import pytest
+
+import sqlite_store
+from fake_sheets import FakeClient
+from googleAccess import GoogleDriveHandler
+from quota import QuotaGovernor
+from sqlite_store import SQLiteBackend
+
+SHEET = "kiosk"
+TODAY = date(2026, 10, 14)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "kiosk.db"))
+    backend.clock = lambda: datetime(2026, 10, 14, 9, 0, 0)
+    yield backend
+    backend.close()
+
+
+def test_roster_is_imported_from_the_availability_sheet(backend):
+    client = FakeClient()
+    client.add_kiosk_spreadsheet(SHEET, ["Alice", "Bob"])
+    sheets = GoogleDriveHandler(None, governor=QuotaGovernor(requests_per_minute=60000, burst=1000), client=client)
+
+    assert backend.sync_roster(SHEET, sheets) == ["Alice", "Bob"]
+    assert backend.get_names_from_schedule(SHEET) == ["Alice", "Bob"]
+
+
+def test_roster_cli_reads_a_names_file(tmp_path):
+    names = tmp_path / "names.txt"
+    names.write_text("Carol\n\nDave\n", encoding="utf-8")
+    database = str(tmp_path / "cli.db")
+
+    assert sqlite_store.main([database, "--spreadsheet", SHEET, "--names-file", str(names)]) == 0
+    backend = SQLiteBackend(database)
+    assert backend.get_names_from_schedule(SHEET) == ["Carol", "Dave"]
+    backend.close()
+
+
+def test_legacy_rows_count_as_today_only_after_yesterdays_rows(backend):
+    backend.update_operator_fields(SHEET, "Alice", {"time_in": "7:00:00"})  # Left open before the upgrade
+    backend.apply_punches(SHEET, [{"action": "clock_in", "operator": "Bob", "time": "10/13/2026 07:00:00"},
+                                  {"action": "clock_out", "operator": "Bob", "time": "15:00:00"}])
+    backend.update_operator_fields(SHEET, "Carol", {"time_in": "7:05:00"})
+
+    assert sorted(backend.active_shifts(SHEET, TODAY)) == ["Carol"]
+
+
+def test_backfilled_punches_land_on_their_own_shift(backend):
+    backend.apply_punches(SHEET, [{"action": "clock_in", "operator": "Alice", "time": "10/14/2026 07:00:00"}])
+    shift = "10/07/2026 07:00:00"
+    punches = [{"action": "clock_in", "operator": "Alice", "time": shift, "shift": shift},
+               {"action": "clock_out", "operator": "Alice", "time": "15:00:00", "shift": shift},
+               {"action": "lunch_start", "operator": "Alice", "time": "11:00:00", "shift": "10/08/2026 07:00:00"}]
+
+    assert backend.apply_punches(SHEET, punches) == 2
+    assert backend.apply_punches(SHEET, punches) == 0
+    assert [row[2:4] for row in backend.read_shifts(SHEET, date(2026, 10, 1), TODAY)] == [
+        ["10/14/2026 07:00:00", ""], [shift, "15:00:00"]]
+    assert backend.active_shifts(SHEET, TODAY)["Alice"]["time_in"] == "10/14/2026 07:00:00"
+
+
+def punch(action, operator, time):
+    return {"action": action, "operator": operator, "time": time}
+
+
+def test_a_shift_from_clock_in_to_clock_out(backend):
+    punches = [punch("clock_in", "Alice", "10/14/2026 07:10:00"), punch("lunch_start", "Alice", "11:00:00"),
+               punch("lunch_end", "Alice", "11:30:00"), punch("clock_out", "Alice", "15:00:00")]
+    assert backend.apply_punches(SHEET, punches[:2]) == 2
+    assert backend.active_shifts(SHEET, TODAY)["Alice"]["lunch_start"] == "11:00:00"
+
+    assert backend.apply_punches(SHEET, punches) == 2  # The first two are replays
+    assert backend.active_shifts(SHEET, TODAY) == {}
+    assert backend.read_shifts(SHEET, TODAY, TODAY) == [
+        ["Alice", "7:20:00", "10/14/2026 07:10:00", "15:00:00", "11:00:00", "11:30:00", "", "10", "", ""]]
+
+
+def test_clock_in_over_an_open_row_flags_it(backend):
+    backend.apply_punches(SHEET, [punch("clock_in", "Alice", "10/13/2026 07:00:00")])
+    backend.apply_punches(SHEET, [punch("clock_in", "Alice", "10/14/2026 07:00:00"),
+                                  punch("clock_out", "Bob", "15:00:00")])  # Bob has no open row: dropped
+
+    rows = backend.read_shifts(SHEET, date(2026, 10, 13), TODAY)
+    assert [(row[0], row[3]) for row in rows] == [("Alice", "REVIEW"), ("Alice", "")]
+    assert backend.open_shifts(SHEET)["Alice"]["time_in"] == "10/14/2026 07:00:00"
+
+
+def test_stale_rows_are_swept_by_the_shift_ends(backend):
+    backend.apply_punches(SHEET, [punch("clock_in", "Alice", "10/14/2026 07:00:00"),
+                                  punch("clock_in", "Bob", "10/14/2026 15:00:00")])
+    assert backend.close_stale_shifts(SHEET, "close", now=datetime(2026, 10, 14, 16, 0, 30), ends=(15, 23)) == 1
+    assert list(backend.open_shifts(SHEET)) == ["Bob"]
+    assert backend.close_stale_shifts(SHEET, "flag", now=datetime(2026, 10, 15, 0, 0, 30), ends=(15, 23)) == 1
+    assert [row[3] for row in backend.read_shifts(SHEET, TODAY, TODAY)] == ["15:00:00", "REVIEW"]
+
+
+def test_older_files_get_new_log_columns(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE log (id INTEGER PRIMARY KEY, spreadsheet_id TEXT NOT NULL, operator TEXT NOT NULL,"
+               " time_in TEXT NOT NULL DEFAULT '', time_out TEXT NOT NULL DEFAULT '', day TEXT,"
+               " is_open INTEGER NOT NULL DEFAULT 1)")
+    db.commit()
+    db.close()
+
+    backend = SQLiteBackend(path)
+    backend.apply_punches(SHEET, [punch("clock_in", "Alice", "10/14/2026 07:00:00")])
+    assert backend.read_shifts(SHEET, TODAY, TODAY)[0][2] == "10/14/2026 07:00:00"
+    backend.close()
@@ -0,0 +1,70 @@
+import logging
+import time
+from collections import deque
+
+from PyQt5.QtCore import QObject, QEvent, QTimer
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+PROFILE_SAMPLES = 10000  # Per measurement; older samples are dropped
+PROFILE_REPORT_MS = 60 * 1000
+
+INPUT_EVENTS = {QEvent.KeyPress: "key", QEvent.MouseButtonPress: "press", QEvent.MouseButtonRelease: "release"}
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class UIProfiler(QObject):
+    # --profile-ui. Input latency is the time from a key or mouse event
+    # reaching the application until the event loop has run its handlers
+    # and gets back to timers, i.e. what the operator waits for. Widget build
+    # times and event loop lag are fed in by the page.
+    def __init__(self, app, report_ms=PROFILE_REPORT_MS):
+        super().__init__(app)
+        self.samples = {}
+        self.input_started = None
+        self.input_kind = None
+        app.installEventFilter(self)
+        self.report_timer = QTimer(self)
+        self.report_timer.timeout.connect(self.log_report)
+        self.report_timer.start(report_ms)
+        app.aboutToQuit.connect(self.print_report)
+
+    def record(self, name, seconds):
+        self.samples.setdefault(name, deque(maxlen=PROFILE_SAMPLES)).append(seconds)
+
+    def eventFilter(self, obj, event):
+        kind = INPUT_EVENTS.get(event.type())
+        if kind is not None and self.input_started is None:
+            # Qt offers the event to each parent in turn; time it once
+            self.input_started = time.perf_counter()
+            self.input_kind = kind
+            QTimer.singleShot(0, self.input_done)
+        return False
+
+    def input_done(self):
+        seconds = time.perf_counter() - self.input_started
+        self.input_started = None
+        metrics.observe("ui_input_latency_seconds", seconds, kind=self.input_kind)
+        self.record(f"input_{self.input_kind}", seconds)
+
+    def report(self):
+        lines = [f"  {'measurement':<24} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"]
+        for name, samples in sorted(self.samples.items()):
+            lines.append(f"  {name:<24} {len(samples):>6} {percentile(samples, 0.5) * 1000:>8.1f} "
+                         f"{percentile(samples, 0.95) * 1000:>8.1f} {max(samples) * 1000:>8.1f}")
+        return "\n".join(lines)
+
+    def log_report(self):
+        if self.samples:
+            log.info("UI profile:\n%s", self.report())
+
+    def print_report(self):
+        print("UI profile:")
+        print(self.report())